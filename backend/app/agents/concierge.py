@@ -1,7 +1,7 @@
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from app.core.state import AgentState
 from app.core.llm import get_llm
-from app.agents.tools import search_products, get_product_details, list_categories
+from app.agents.tools import search_products, get_product_details, get_similar_products, list_categories
 import json
 
 def concierge_node(state: AgentState):
@@ -10,10 +10,10 @@ def concierge_node(state: AgentState):
     - Uses Local Tool calling loop to answer user queries about products.
     """
     messages = state["messages"]
-    llm = get_llm()
+    llm = get_llm("conversational")
     
     # Bind tools suitable for Concierge
-    tools = [search_products, get_product_details, list_categories]
+    tools = [search_products, get_product_details, get_similar_products, list_categories]
     llm_with_tools = llm.bind_tools(tools)
     
     # Simple ReAct Loop (Internal to node for now to keep graph simple)
@@ -37,6 +37,8 @@ def concierge_node(state: AgentState):
                 tool_result = search_products.invoke(tool_args)
             elif tool_name == "get_product_details":
                 tool_result = get_product_details.invoke(tool_args)
+            elif tool_name == "get_similar_products":
+                tool_result = get_similar_products.invoke(tool_args)
             elif tool_name == "list_categories":
                 tool_result = list_categories.invoke(tool_args)
                 
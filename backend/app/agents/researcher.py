@@ -1,6 +1,10 @@
+from contextlib import closing
+from langgraph.config import get_stream_writer
 from app.core.state import AgentState
 from app.core.llm import get_llm
-from app.agents.tools import web_search, search_products
+from app.core.json_stream import JsonStreamParser
+from app.agents.tools import web_search
+from app.services.retrieval_service import get_retrieval_service
 from langchain_core.messages import HumanMessage
 import json
 
@@ -22,6 +26,16 @@ def serialize_products(products) -> str:
         })
     return json.dumps(serialized, indent=2)
 
+def interleave_results(result_lists):
+    """Merges per-keyword results round-robin (best of each keyword first), dropping duplicates."""
+    merged, seen = [], set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results) and results[rank].id not in seen:
+                seen.add(results[rank].id)
+                merged.append(results[rank])
+    return merged
+
 def researcher_node(state: AgentState):
     """
     Expert Researcher Agent:
@@ -32,17 +46,21 @@ def researcher_node(state: AgentState):
     last_message = messages[-1]
     query = last_message.content
     
-    llm = get_llm()
+    # Keyword extraction is easy work for the small tier; the comparison needs the large one
+    extractor = get_llm("extractor")
+    llm = get_llm("synthesis")
     
     # 1. Extract search keywords from user query
     extraction_prompt = f"""From the user query: '{query}', extract 1-3 key product types or names to search.
-    Examples: "boots", "jacket parka", "trailblazer"
-    Output ONLY the keywords, no explanation."""
+    Examples: "boots", "jacket, parka", "trailblazer"
+    Output ONLY the keywords, comma-separated, no explanation."""
     
-    search_keywords = llm.invoke([HumanMessage(content=extraction_prompt)]).content.strip()
+    search_keywords = extractor.invoke([HumanMessage(content=extraction_prompt)]).content.strip()
     
-    # 2. Execute Internal Search FIRST
-    internal_products = search_products.invoke({"query": search_keywords})
+    # 2. Execute Internal Search FIRST: all keywords in one batch, merged in rank order
+    queries = [k.strip() for k in search_keywords.split(",") if k.strip()] or [search_keywords]
+    internal_products = interleave_results(get_retrieval_service().retrieve_batch(queries, limit=5))
+    search_keywords = " ".join(queries)
     internal_json = serialize_products(internal_products)
     
     # 3. Execute Web Search for competitors
@@ -63,7 +81,7 @@ USER QUERY: {query}
 STRICT RULES:
 1. For OUR products: Use ONLY the exact id, name, slug, and price from the inventory above. DO NOT make up products.
 2. If no internal products match, say "No matching internal product" but still show competitors.
-3. Extract 2-3 competitor products from the external data with real prices.
+3. Extract 2-3 competitor products from the external data with real prices. If there is no external market data, list no competitors.
 
 OUTPUT FORMAT (valid JSON only):
 {{
@@ -87,20 +105,31 @@ OUTPUT FORMAT (valid JSON only):
     ]
 }}"""
     
+    # Streamed: each carousel card goes out to /chat/stream as soon as it is complete
+    writer = get_stream_writer()
+    streamed = False
     try:
-        raw_response = llm.invoke([HumanMessage(content=comparison_prompt)]).content
-        
-        # Extract JSON from response
-        json_str = raw_response.strip()
-        if "```json" in json_str:
-            json_str = json_str.split("```json")[1].split("```")[0].strip()
-        elif "```" in json_str:
-            json_str = json_str.split("```")[1].split("```")[0].strip()
-            
-        data = json.loads(json_str)
-        return {"final_response": data}
+        parser = JsonStreamParser(stream_arrays=["data"])
+        with closing(llm.stream([HumanMessage(content=comparison_prompt)])) as stream:
+            for chunk in stream:
+                for kind, key, value in parser.feed(chunk.content):
+                    if kind == "item":
+                        writer({"type": "carousel_item", "item": value})
+                        streamed = True
+                    elif key == "content":
+                        writer({"type": "summary", "content": value})
+                        streamed = True
+                if parser.done:
+                    break  # ignore anything the model adds after the JSON
+        if not parser.done:
+            raise ValueError("Incomplete JSON in completion")
+        return {"final_response": parser.fields}
         
     except Exception as e:
+        print(f"Error in researcher synthesis: {e}")
+        if streamed:
+            # The cards and summary already sent belong to the failed answer, not the fallback below
+            writer({"type": "reset"})
         # Fallback with basic info
         return {
             "final_response": {
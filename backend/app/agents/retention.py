@@ -1,22 +1,29 @@
+from langchain_core.messages import AIMessage
+from app.core.config import get_settings
 from app.core.state import AgentState
+from app.services.data_service import get_data_service
 
 def retention_node(state: AgentState):
     """
     Retention Agent:
-    - Offers discounts if user seems hesitant.
-    - Triggered by specific routing logic.
+    - Offers a discount on the product the session keeps coming back to.
+    - The supervisor routes here once the session's views of one product cross
+      RETENTION_VIEW_THRESHOLD (see app/services/analytics.py).
     """
-    
-    # In a real app, we check state["history"] for repeated views
-    
+    settings = get_settings()
+    product = get_data_service().get_product_by_id(state.get("retention_product_id", ""))
+    name = product.name if product else "this item"
+
+    content = f"I noticed you're looking at the {name} again!"
     response = {
         "type": "offer_card",
-        "content": "I noticed you're looking at the Hiking Boots again!",
+        "content": content,
         "offer_details": {
-            "discount": "10%",
-            "code": "HIKE2026",
-            "expiry": "1 hour"
+            "discount": settings.RETENTION_OFFER_DISCOUNT,
+            "code": settings.RETENTION_OFFER_CODE,
+            "expiry": "1 hour",
+            "product_id": product.id if product else None,
         }
     }
-    
-    return {"final_response": response}
+
+    return {"messages": [AIMessage(content=content)], "final_response": response}
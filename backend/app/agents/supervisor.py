@@ -1,8 +1,12 @@
 from typing import Literal
 from langchain_core.messages import HumanMessage
 from pydantic import BaseModel, Field
+from langchain_core.runnables import RunnableConfig
+from app.core.config import get_settings
+from app.core.json_stream import stream_json
 from app.core.state import AgentState
 from app.core.llm import get_llm
+from app.services.analytics import get_analytics
 
 class RouteDecision(BaseModel):
     """Destination for the next step in the workflow."""
@@ -10,16 +14,15 @@ class RouteDecision(BaseModel):
         description="The next agent to route the user to based on their intent."
     )
 
-async def supervisor_node(state: AgentState):
+async def supervisor_node(state: AgentState, config: RunnableConfig):
     """
     Supervisor Node:
-    - Uses Structured Output to route the user.
+    - Routes the user with a streamed JSON decision.
+    - Hands browsing turns to retention when the session keeps viewing one product.
     """
     messages = state["messages"]
-    llm = get_llm()
-    
-    # We can use a lighter model for routing if available, but for now use the same
-    router = llm.with_structured_output(RouteDecision)
+    # Routing is a few tokens of JSON: the small, fast tier is enough
+    llm = get_llm("router")
     
     # Adding more explicit instructions and negative constraints
     system_prompt = """You are the Supervisor for a premium outdoor gear e-commerce store.
@@ -33,29 +36,27 @@ async def supervisor_node(state: AgentState):
     
     If unsure, route to 'concierge'.
     
-    IMPORTANT: You must output ONLY valid JSON matching the schema. Do not include any conversational filler like 'Sure' or 'Here is the decision'."""
+    IMPORTANT: You must output ONLY a JSON object of the form {"next_node": "<agent>"}. Do not include any conversational filler like 'Sure' or 'Here is the decision'."""
     
     prompt_messages = [HumanMessage(content=system_prompt)] + messages
     
+    next_node = "concierge"
     try:
-        # Attempt structured output
-        decision = router.invoke(prompt_messages)
-        next_node = decision.next_node
+        # Streamed in JSON mode: generation stops as soon as next_node is parsed,
+        # whatever the model writes around or after it
+        stream = llm.astream(prompt_messages, response_format={"type": "json_object"})
+        async for _, key, value in stream_json(stream, until=["next_node"]):
+            if key == "next_node":
+                next_node = RouteDecision(next_node=value).next_node
     except Exception as e:
-        print(f"Routing Structured Output Error: {e}. Attempting manual parse...")
-        try:
-            # Fallback to manual extraction if the model keeps talking
-            raw = llm.invoke(prompt_messages).content
-            import json
-            import re
-            # Find something that looks like JSON
-            match = re.search(r'\{.*\}', raw, re.DOTALL)
-            if match:
-                data = json.loads(match.group(0))
-                next_node = data.get("next_node", "concierge")
-            else:
-                next_node = "concierge"
-        except:
-            next_node = "concierge"
-        
-    return {"next_node": next_node}
+        print(f"Routing Error: {e}. Routing to concierge")
+
+    if next_node == "concierge":
+        # Counters only, no extra LLM call: the chat session id is the storefront's X-Session-Id
+        session_id = config.get("configurable", {}).get("thread_id")
+        candidate = get_analytics().retention_candidate(session_id, threshold=get_settings().RETENTION_VIEW_THRESHOLD) if session_id else None
+        if candidate:
+            return {"next_node": "retention", "retention_product_id": candidate[0]}
+
+    # A new turn: drop the previous turn's card so it isn't shown again
+    return {"next_node": next_node, "final_response": None}
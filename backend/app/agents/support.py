@@ -1,7 +1,7 @@
 from langchain_core.messages import HumanMessage, ToolMessage
 from app.core.state import AgentState
 from app.core.llm import get_llm
-from app.agents.tools import check_order_status
+from app.agents.tools import check_order_status, get_order_summary
 
 def support_node(state: AgentState):
     """
@@ -9,9 +9,9 @@ def support_node(state: AgentState):
     - Handles order status and returns.
     """
     messages = state["messages"]
-    llm = get_llm()
+    llm = get_llm("conversational")
     
-    tools = [check_order_status]
+    tools = [check_order_status, get_order_summary]
     llm_with_tools = llm.bind_tools(tools)
     
     response = llm_with_tools.invoke(messages)
@@ -19,13 +19,16 @@ def support_node(state: AgentState):
     if response.tool_calls:
         tool_messages = [response]
         for tool_call in response.tool_calls:
+            res = "Error: Tool not found"
             if tool_call["name"] == "check_order_status":
                 res = check_order_status.invoke(tool_call["args"])
-                tool_messages.append(ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    name=tool_call["name"],
-                    content=str(res)
-                ))
+            elif tool_call["name"] == "get_order_summary":
+                res = get_order_summary.invoke(tool_call["args"])
+            tool_messages.append(ToolMessage(
+                tool_call_id=tool_call["id"],
+                name=tool_call["name"],
+                content=str(res)
+            ))
         
         final_response = llm_with_tools.invoke(messages + tool_messages)
         return {"messages": [final_response]}
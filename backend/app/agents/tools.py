@@ -1,48 +1,59 @@
 from typing import List, Optional
 from langchain_core.tools import tool
-from app.services.data_service import data_service
-from app.core.models import Product, Order
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.services.data_service import get_data_service
+from app.services.retrieval_service import get_retrieval_service
+from app.core.models import Product, Order, OrderSummary
+
+# Related terms a query word also matches
+SYNONYMS = {
+    "boots": ["shoes", "footwear", "hiking"],
+    "shoes": ["boots", "footwear", "sneakers"],
+    "jacket": ["coat", "parka", "shell", "outerwear"],
+    "parka": ["jacket", "coat", "down"],
+    "shirt": ["top", "tee", "apparel"],
+    "pants": ["trousers", "bottoms"],
+    "backpack": ["pack", "bag", "rucksack"],
+}
+
+def search_catalog(data, query: str, category: Optional[str] = None, limit: int = 10, retrieval=get_retrieval_service) -> List[Product]:
+    """
+    What search_products returns, over the given data service (`retrieval` returns the
+    retrieval service, built only if some query word needs the typo-tolerant fallback).
+    """
+    if not query.strip():
+        return data.get_products(category_slug=category)
+
+    tokens = query.lower().split()
+    matched = set()
+
+    def match(p):
+        searchable = f"{p['name']} {p['description']} {p['slug']} {' '.join(p['features'])}".lower()
+        hits = {token for token in tokens if any(t in searchable for t in [token] + SYNONYMS.get(token, []))}
+        matched.update(hits)
+        return bool(hits)
+
+    # Matched on the catalog columns, so only the results are built into models
+    results = data.find_products(match, ("name", "description", "slug", "features"), category_slug=category)
+    unmatched = [token for token in tokens if token not in matched]
+    if unmatched:
+        # Keyword matches (with typo tolerance) fused with vector similarity, for the words nothing contained
+        seen = {p.id for p in results}
+        fuzzy = retrieval().retrieve(" ".join(unmatched), limit=limit, category=category)
+        results.extend(p for p in fuzzy if p.id not in seen)
+    return results
 
 @tool
-def search_products(query: str, category: Optional[str] = None) -> List[Product]:
+def search_products(query: str, category: Optional[str] = None, limit: int = 10) -> List[Product]:
     """
     Search for products by query text and optionally filter by category slug.
     Useful for finding products when a user asks for 'jackets', 'camping gear', etc.
-    Returns a list of matching Product objects with id, name, slug, price, description, and features.
-    """
-    all_products = data_service.get_products(category_slug=category)
-    if not query:
-        return all_products
-    
-    # Improved semantic search: tokenize query and match any word
-    query_tokens = set(query.lower().split())
-    
-    # Also add common synonyms/related terms
-    synonym_map = {
-        "boots": ["shoes", "footwear", "hiking"],
-        "shoes": ["boots", "footwear", "sneakers"],
-        "jacket": ["coat", "parka", "shell", "outerwear"],
-        "parka": ["jacket", "coat", "down"],
-        "shirt": ["top", "tee", "apparel"],
-        "pants": ["trousers", "bottoms"],
-        "backpack": ["pack", "bag", "rucksack"],
-    }
-    
-    expanded_tokens = set(query_tokens)
-    for token in query_tokens:
-        if token in synonym_map:
-            expanded_tokens.update(synonym_map[token])
-    
-    results = []
-    for p in all_products:
-        # Create searchable text from product attributes
-        searchable = f"{p.name} {p.description} {p.slug} {' '.join(p.features)}".lower()
-        
-        # Check if any query token matches
-        if any(token in searchable for token in expanded_tokens):
-            results.append(p)
-    
-    return results
+    Returns every product matching a query word (or a synonym) in its name, description, slug or features.
+    Words that match nothing are treated as typos ('hikng boots', 'parkka'): up to `limit` close
+    matches for them are added after the exact ones.
+    """
+    return search_catalog(get_data_service(), query, category=category, limit=limit)
 
 @tool
 def get_product_details(product_id: str) -> Optional[Product]:
@@ -50,7 +61,19 @@ def get_product_details(product_id: str) -> Optional[Product]:
     Get detailed information about a specific product by its ID.
     Useful when a user wants to know more about a specific item.
     """
-    return data_service.get_product_by_id(product_id)
+    return get_data_service().get_product_by_id(product_id)
+
+@tool
+def get_similar_products(product_id: str, limit: int = 5) -> List[Product]:
+    """
+    Get products similar to a given product ID (same kind of item, shared features, similar price).
+    Useful for 'show me alternatives', 'anything like this but cheaper?' or suggesting related items.
+    """
+    from app.services.similarity_service import get_similarity_service
+
+    data = get_data_service()
+    neighbours = get_similarity_service().similar(product_id, limit=limit)
+    return [p for p in (data.get_product_by_id(pid) for pid, _ in neighbours) if p]
 
 @tool
 def check_order_status(user_id: str) -> List[Order]:
@@ -58,14 +81,24 @@ def check_order_status(user_id: str) -> List[Order]:
     Check the status of orders for a specific user ID.
     Useful for support queries like 'where is my order?'.
     """
-    return data_service.get_orders(user_id)
+    return get_data_service().get_orders(user_id)
+
+@tool
+def get_order_summary(user_id: str) -> OrderSummary:
+    """
+    Get a compact summary of a user's orders: order count, total spent, counts by status,
+    the latest order and any open (pending/processing/shipped) orders with tracking numbers.
+    Prefer this over check_order_status for questions like 'how many orders do I have?'
+    or 'what's still on its way?'.
+    """
+    return get_data_service().get_order_summary(user_id)
 
 @tool
 def list_categories() -> List[str]:
     """
     List all available product categories.
     """
-    cats = data_service.get_categories()
+    cats = get_data_service().get_categories()
     return [c.slug for c in cats]
 
 @tool
@@ -74,9 +107,35 @@ def web_search(query: str) -> str:
     Search the web for real-time information, competitor prices, and product reviews.
     Use this for deep research and price comparisons.
     """
-    try:
-        from langchain_community.tools import DuckDuckGoSearchRun
-        search = DuckDuckGoSearchRun()
+    # Bounded by WEB_SEARCH_DEADLINE: hedged after the recent p95, cached, never raises
+    return get_web_search()(query)
+
+NO_WEB_RESULTS = (
+    "NO EXTERNAL MARKET DATA: web search did not answer in time. "
+    "Use only our internal inventory and do not invent competitor products."
+)
+
+# Built on the first research turn
+@lazy_singleton
+def get_web_search():
+    from app.core.hedging import HedgedCall
+
+    search = None
+
+    def run(query: str) -> str:
+        nonlocal search
+        if search is None:
+            from langchain_community.tools import DuckDuckGoSearchRun
+            search = DuckDuckGoSearchRun()
         return search.run(query)
-    except Exception as e:
-        return f"Web search failed: {str(e)}. Falling back to knowledge base."
+
+    settings = get_settings()
+    return HedgedCall(
+        "web_search",
+        run,
+        fallback=lambda query: NO_WEB_RESULTS,
+        deadline=settings.WEB_SEARCH_DEADLINE,
+        hedge_delay=settings.WEB_SEARCH_HEDGE_DELAY,
+        cache_ttl=settings.WEB_SEARCH_CACHE_TTL,
+        max_workers=settings.WEB_SEARCH_WORKERS,
+    )
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import chat, products, categories, orders, checkout
+from app.api.v1.endpoints import chat, products, categories, orders, checkout, diagnostics
 
 api_router = APIRouter()
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
@@ -7,4 +7,4 @@ api_router.include_router(products.router, prefix="/products", tags=["products"]
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
 api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(checkout.router, prefix="/checkout", tags=["checkout"])
-
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
@@ -1,7 +1,8 @@
 from typing import List
 from fastapi import APIRouter
 from app.core.models import Category
-from app.services.data_service import data_service
+from app.core.responses import model_response
+from app.services.data_service import get_data_service
 
 router = APIRouter()
 
@@ -10,4 +11,4 @@ def get_categories():
     """
     Get all categories.
     """
-    return data_service.get_categories()
+    return model_response(get_data_service().get_categories(), List[Category])
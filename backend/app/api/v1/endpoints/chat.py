@@ -1,9 +1,19 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Dict, Any, Optional
-from app.graph import app_graph
+from app.core.turns import TurnRejected, get_turn_scheduler
+from app.graph import get_app_graph
 
 router = APIRouter()
 
+DEFAULT_RESPONSE = {
+    "type": "text", 
+    "content": "I'm processing your request..."
+}
+
 @router.post("/clear")
 async def clear_chat(payload: Dict[str, Any]):
     """
@@ -11,35 +21,23 @@ async def clear_chat(payload: Dict[str, Any]):
     Accepts: { "session_id": "uuid" }
     """
     thread_id = payload.get("session_id", "default_thread")
-    config = {"configurable": {"thread_id": thread_id}}
+    app_graph = get_app_graph()
     
     try:
-        # To "clear" in LangGraph with MemorySaver, we can effectively reset by overwriting the state
-        # with an empty list of messages, or just rely on the frontend to generate a NEW session_id.
-        # However, to truly clear the checkpointer's memory for that ID:
-        await app_graph.aupdate_state(config, {"messages": [], "final_response": None})
+        # Waits for the session's running turn, so it never clears a thread mid-run.
+        # Drops every checkpoint, write and blob of the thread, not just the visible messages
+        async with get_turn_scheduler().turn(thread_id):
+            await app_graph.checkpointer.adelete_thread(thread_id)
         return {"status": "cleared", "thread_id": thread_id}
+    except TurnRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear chat: {str(e)}")
 
-@router.post("/message")
-async def chat_message(
-    message: Dict[str, Any]
-):
-    """
-    Primary chat endpoint.
-    Accepts: { "message": "user input", "session_id": "uuid" }
-    Returns: JSON response (Stream later)
-    """
-    user_text = message.get("message", "")
-    
-    # LangGraph Execution
+async def _graph_input(app_graph, user_text: str, config: Dict[str, Any]):
+    """The run's input: a new user message, or the user's answer to an interrupt."""
     from langchain_core.messages import HumanMessage
     
-    # Use session_id as thread_id for persistence
-    thread_id = message.get("session_id", "default_thread")
-    config = {"configurable": {"thread_id": thread_id}}
-    
     # Check if we are resuming from an interrupt (user said "yes"/"no" after approval request)
     # Get current state
     current_state = await app_graph.aget_state(config)
@@ -53,16 +51,87 @@ async def chat_message(
         from langgraph.types import Command
         
         # We interpret the user's message as the "value" to resume with
-        result = await app_graph.ainvoke(Command(resume=user_text), config=config)
-    else:
-        # Standard flow: start new run
-        inputs = {"messages": [HumanMessage(content=user_text)]}
-        result = await app_graph.ainvoke(inputs, config=config)
+        return Command(resume=user_text)
+    # Standard flow: start new run
+    return {"messages": [HumanMessage(content=user_text)]}
+
+@router.post("/message")
+async def chat_message(
+    message: Dict[str, Any]
+):
+    """
+    Primary chat endpoint.
+    Accepts: { "message": "user input", "session_id": "uuid" }
+    Returns: JSON response (see /stream for a streamed one)
+    """
+    user_text = message.get("message", "")
     
-    # Extract final response from state
-    final_response = result.get("final_response", {
-        "type": "text", 
-        "content": "I'm processing your request..."
-    })
+    # Use session_id as thread_id for persistence
+    thread_id = message.get("session_id", "default_thread")
+    config = {"configurable": {"thread_id": thread_id}}
+    app_graph = get_app_graph()
     
-    return final_response
+    # LangGraph Execution, one turn per session at a time (see app/core/turns.py)
+    try:
+        async with get_turn_scheduler().turn(thread_id):
+            result = await app_graph.ainvoke(await _graph_input(app_graph, user_text, config), config=config)
+    except TurnRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    # Extract final response from state
+    return result.get("final_response") or DEFAULT_RESPONSE
+
+@router.post("/stream")
+async def chat_stream(
+    message: Dict[str, Any]
+):
+    """
+    Streaming chat endpoint.
+    Accepts: the same body as /message
+    Returns: NDJSON. Agents that stream partial output (the researcher's summary and
+    each product_carousel card, as {"type": "summary"} / {"type": "carousel_item"})
+    send it as soon as the model has written it; the last line is the final response.
+    A {"type": "reset"} line means the agent failed after streaming some of it: drop
+    the partial summary and cards received so far and show the final response instead.
+    """
+    user_text = message.get("message", "")
+    thread_id = message.get("session_id", "default_thread")
+    config = {"configurable": {"thread_id": thread_id}}
+    app_graph = get_app_graph()
+
+    # The turn is admitted before the response starts (so a busy session still gets a 429)
+    # and lasts until the stream ends; the background task covers a client that left early
+    scheduler = get_turn_scheduler()
+    try:
+        await scheduler.acquire(thread_id)
+    except TurnRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    released = False
+
+    async def release():
+        nonlocal released
+        if not released:
+            released = True
+            scheduler.release(thread_id)
+
+    try:
+        graph_input = await _graph_input(app_graph, user_text, config)
+    except BaseException:
+        await release()
+        raise
+
+    async def lines():
+        try:
+            final_response = None
+            async for mode, chunk in app_graph.astream(graph_input, config=config, stream_mode=["custom", "values"]):
+                if mode == "custom":
+                    yield json.dumps(jsonable_encoder(chunk)) + "\n"
+                elif "__interrupt__" in chunk:
+                    final_response = chunk["__interrupt__"][0].value  # e.g. a payment confirmation request
+                else:
+                    final_response = chunk.get("final_response")
+        finally:
+            await release()
+        yield json.dumps(jsonable_encoder(final_response or DEFAULT_RESPONSE)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(release))
@@ -3,19 +3,22 @@ Stripe Checkout API Endpoints
 Handles payment processing with Stripe in test mode.
 """
 
+import hashlib
+import uuid
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from pydantic import BaseModel
-from app.core.config import settings
-import stripe
-
-# ========================================
-# 🔧 Configuration
-# ========================================
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from app.core.config import get_settings
+from app.services.stripe_service import get_stripe_service, metadata_value, PaymentError
+from app.services.inventory_service import get_inventory_service, InventoryError
 
 router = APIRouter()
 
+# Stripe keeps a checkout session open for at least 30 minutes
+STRIPE_MIN_SESSION_SECONDS = 1800
+# A session closes this long before its stock hold lapses, so a last-moment payment still finds the hold
+SESSION_EXPIRY_MARGIN = 120
+
 # ========================================
 # 📦 Request/Response Models
 # ========================================
@@ -47,18 +50,52 @@ class PaymentIntentResponse(BaseModel):
 # 🛒 Checkout Endpoints
 # ========================================
 
+def _idempotency_key(header_value: Optional[str]) -> str:
+    """
+    Use the client's Idempotency-Key so retried requests map to the same Stripe object.
+    Without one, a fresh key still makes the SDK's own network retries safe.
+    """
+    return header_value or uuid.uuid4().hex
+
+def _reservation_id(idempotency_key: str) -> str:
+    """
+    One stock hold per idempotency key: a retry finds the original hold, and the
+    Stripe request it repeats carries the same metadata (Stripe rejects a
+    replayed key whose parameters changed).
+    """
+    return "co_" + hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]
+
 @router.post("/create-checkout-session", response_model=CheckoutResponse)
-async def create_checkout_session(request: CheckoutRequest):
+async def create_checkout_session(
+    request: CheckoutRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     """
     Create a Stripe Checkout Session for the cart items.
     Returns a URL to redirect the user to Stripe's hosted checkout page.
+    Cart stock is reserved for the session and released if it is abandoned;
+    the session expires before the reservation does, so it can't be paid late.
     """
-    if not stripe.api_key:
+    stripe_service = get_stripe_service()
+    if not stripe_service.configured:
         raise HTTPException(
             status_code=500, 
             detail="Stripe is not configured. Add STRIPE_SECRET_KEY to .env"
         )
     
+    inventory = get_inventory_service()
+    quantities = {}
+    for item in request.items:
+        quantities[item.id] = quantities.get(item.id, 0) + item.quantity
+    idempotency_key = _idempotency_key(idempotency_key)
+    reservation_id = _reservation_id(idempotency_key)
+    try:
+        # Not created when this is a retry: the hold belongs to the original request
+        ttl = max(get_settings().INVENTORY_RESERVATION_TTL, STRIPE_MIN_SESSION_SECONDS + 2 * SESSION_EXPIRY_MARGIN)
+        created, held_until = inventory.hold(reservation_id, quantities, ttl=ttl)
+    except InventoryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     try:
         # Build line items for Stripe
         line_items = []
@@ -76,12 +113,14 @@ async def create_checkout_session(request: CheckoutRequest):
             })
         
         # Create checkout session
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
+        session = await stripe_service.create_checkout_session(
             line_items=line_items,
-            mode="payment",
             success_url=request.success_url,
             cancel_url=request.cancel_url,
+            idempotency_key=idempotency_key,
+            metadata={"reservation_id": reservation_id},
+            # From the hold, not the clock, so a retry sends the same parameters
+            expires_at=int(held_until) - SESSION_EXPIRY_MARGIN,
         )
         
         return CheckoutResponse(
@@ -89,29 +128,37 @@ async def create_checkout_session(request: CheckoutRequest):
             checkout_url=session.url
         )
         
-    except stripe.error.StripeError as e:
+    except PaymentError as e:
+        if created:
+            inventory.cancel(reservation_id)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        if created:
+            inventory.cancel(reservation_id)
         raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
 
 
 @router.post("/create-payment-intent", response_model=PaymentIntentResponse)
-async def create_payment_intent(request: PaymentIntentRequest):
+async def create_payment_intent(
+    request: PaymentIntentRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     """
     Create a Payment Intent for custom payment forms.
     Used with Stripe Elements on the frontend.
     """
-    if not stripe.api_key:
+    stripe_service = get_stripe_service()
+    if not stripe_service.configured:
         raise HTTPException(
             status_code=500,
             detail="Stripe is not configured. Add STRIPE_SECRET_KEY to .env"
         )
     
     try:
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe_service.create_payment_intent(
             amount=request.amount,
             currency=request.currency,
-            automatic_payment_methods={"enabled": True},
+            idempotency_key=_idempotency_key(idempotency_key),
         )
         
         return PaymentIntentResponse(
@@ -119,7 +166,7 @@ async def create_payment_intent(request: PaymentIntentRequest):
             payment_intent_id=intent.id
         )
         
-    except stripe.error.StripeError as e:
+    except PaymentError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -128,7 +175,7 @@ async def get_stripe_config():
     """
     Return the Stripe publishable key for frontend initialization.
     """
-    publishable_key = settings.STRIPE_PUBLISHABLE_KEY
+    publishable_key = get_settings().STRIPE_PUBLISHABLE_KEY
     
     if not publishable_key:
         raise HTTPException(
@@ -143,17 +190,47 @@ async def get_stripe_config():
 async def get_session_status(session_id: str):
     """
     Get the status of a checkout session (for success page).
+    Briefly cached since the success page polls this endpoint.
+    Once the session is paid its stock reservation is committed.
     """
-    if not stripe.api_key:
+    stripe_service = get_stripe_service()
+    if not stripe_service.configured:
         raise HTTPException(status_code=500, detail="Stripe not configured")
     
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        return {
-            "status": session.status,
-            "payment_status": session.payment_status,
-            "customer_email": session.customer_details.email if session.customer_details else None,
-            "amount_total": session.amount_total / 100 if session.amount_total else 0,
-        }
-    except stripe.error.StripeError as e:
+        status = dict(await stripe_service.get_session_status(session_id))
+        reservation_id = status.pop("reservation_id", None)
+        if reservation_id and status["payment_status"] == "paid":
+            # No-op after the first commit, so repeated polls are safe
+            get_inventory_service().commit(reservation_id)
+        return status
+    except PaymentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/webhook")
+async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Header(None, alias="Stripe-Signature")):
+    """
+    Receives Stripe events. A paid session commits its stock reservation even if
+    the buyer never reaches the success page; an expired one releases it.
+    Both are no-ops when repeated, as Stripe redelivers events.
+    """
+    secret = get_settings().STRIPE_WEBHOOK_SECRET
+    stripe_service = get_stripe_service()
+    if not secret or not stripe_service.configured:
+        raise HTTPException(status_code=500, detail="Stripe webhook is not configured. Add STRIPE_WEBHOOK_SECRET to .env")
+
+    try:
+        event = stripe_service.construct_event(await request.body(), stripe_signature, secret)
+    except PaymentError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+    session = event.data.object
+    reservation_id = metadata_value(session, "reservation_id")
+    if reservation_id:
+        if event.type in ("checkout.session.completed", "checkout.session.async_payment_succeeded"):
+            if session.payment_status == "paid":
+                get_inventory_service().commit(reservation_id)
+        elif event.type in ("checkout.session.expired", "checkout.session.async_payment_failed"):
+            get_inventory_service().release(reservation_id)
+    return {"received": True}
@@ -0,0 +1,58 @@
+import hmac
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.core import diagnostics
+from app.core.config import get_settings
+
+def require_diagnostics(x_diagnostics_token: Optional[str] = Header(None)):
+    """Diagnostics are off unless DIAGNOSTICS_TOKEN is set, and then need it in X-Diagnostics-Token."""
+    token = get_settings().DIAGNOSTICS_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_diagnostics_token or not hmac.compare_digest(x_diagnostics_token, token):
+        raise HTTPException(status_code=403, detail="Invalid diagnostics token")
+
+router = APIRouter(dependencies=[Depends(require_diagnostics)])
+
+@router.get("/memory")
+def get_memory(objects: bool = False) -> Dict[str, Any]:
+    """
+    Approximate memory per subsystem (heap and memory-mapped bytes, plus its
+    counters), process RSS and function cache hit rates. With objects=true, also a
+    census of live objects by type (slow on a large heap).
+    """
+    return diagnostics.memory_report(objects=objects)
+
+@router.post("/tracemalloc/start")
+def start_tracemalloc(frames: int = Query(1, ge=1, le=64)) -> Dict[str, Any]:
+    """Starts tracing allocations (frames: stack depth kept per allocation)."""
+    return diagnostics.start_tracing(frames)
+
+@router.post("/tracemalloc/stop")
+def stop_tracemalloc() -> Dict[str, Any]:
+    """Stops tracing and drops all snapshots."""
+    return diagnostics.stop_tracing()
+
+@router.post("/tracemalloc/snapshots")
+def take_tracemalloc_snapshot(limit: int = Query(20, ge=1, le=200)) -> Dict[str, Any]:
+    """Takes a snapshot (the last few are kept) and lists the largest allocation sites."""
+    try:
+        return diagnostics.take_snapshot(limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/tracemalloc/snapshots")
+def list_tracemalloc_snapshots() -> List[Dict[str, Any]]:
+    return diagnostics.list_snapshots()
+
+@router.get("/tracemalloc/diff")
+def diff_tracemalloc_snapshots(
+    base: Optional[int] = None,
+    target: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=200),
+) -> Dict[str, Any]:
+    """Allocation growth between two snapshots (default: the last two), by source line."""
+    try:
+        return diagnostics.diff_snapshots(base, target, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
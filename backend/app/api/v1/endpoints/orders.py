@@ -1,21 +1,88 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Body
-from app.core.models import Order
-from app.services.data_service import data_service
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import get_settings
+from app.core.models import ImportResult, Order, OrderSummary, OrderStatusUpdate, StatusTotals
+from app.core.responses import model_response
+from app.services.catalog_sync import OrderImporter, import_stream, ndjson
+from app.services.data_service import get_data_service
+from app.services.inventory_service import get_inventory_service, InventoryError
+from app.services.order_store import DuplicateOrderError
 
 router = APIRouter()
 
+@router.get("/stats/by-status", response_model=Dict[str, StatusTotals])
+def get_order_status_summary():
+    """
+    Order counts and totals per status across all users.
+    """
+    return model_response(get_data_service().get_order_status_summary(), Dict[str, StatusTotals])
+
+@router.get("/export")
+def export_orders(user_id: Optional[str] = None):
+    """
+    Every order (or one user's) as NDJSON, oldest first, streamed page by page from the order store.
+    """
+    return StreamingResponse(ndjson(get_data_service().iter_orders_json(user_id)), media_type="application/x-ndjson")
+
+@router.post("/import", response_model=ImportResult)
+async def import_orders(request: Request, dry_run: bool = False):
+    """
+    Bulk insert orders from an NDJSON body, one transaction per validated chunk.
+    Orders whose id already exists are skipped, so re-running an import is safe.
+    Imported orders are history: no stock is reserved for them.
+    """
+    importer = OrderImporter(get_data_service(), chunk_size=get_settings().CATALOG_IMPORT_CHUNK_SIZE, dry_run=dry_run)
+    return await import_stream(importer, request.stream())
+
 @router.get("/{user_id}", response_model=List[Order])
 def get_user_orders(user_id: str):
     """
     Get all orders for a specific user.
     """
-    return data_service.get_orders(user_id)
+    return model_response(get_data_service().get_orders(user_id), List[Order])
+
+@router.get("/{user_id}/summary", response_model=OrderSummary)
+def get_user_order_summary(user_id: str):
+    """
+    Compact order summary for a user: counts and spend by status, latest order and open orders.
+    Served from incrementally maintained aggregates, so cost doesn't grow with order history.
+    """
+    return model_response(get_data_service().get_order_summary(user_id), OrderSummary)
 
 @router.post("/", response_model=Order)
 def create_order(order: Order):
     """
     Create a new order.
+    Stock for every item is reserved atomically and committed once the order is stored.
+    """
+    inventory = get_inventory_service()
+    quantities = {}
+    for item in order.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    try:
+        reservation_id = inventory.reserve(quantities)
+    except InventoryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        created = get_data_service().create_order(order)
+    except DuplicateOrderError as e:
+        inventory.release(reservation_id)
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception:
+        inventory.release(reservation_id)
+        raise
+    inventory.commit(reservation_id)
+    # The request body was validated on the way in, so skip response re-validation
+    return model_response(created, Order)
+
+@router.patch("/{order_id}/status", response_model=Order)
+def update_order_status(order_id: str, update: OrderStatusUpdate):
+    """
+    Move an order to a new status (e.g. "processing" -> "shipped").
     """
-    # In a real app, here we would validate stock, process payment, etc.
-    return data_service.create_order(order)
+    order = get_data_service().update_order_status(order_id, update.status)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return model_response(order, Order)
@@ -1,46 +1,171 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
-from app.core.models import Product
-from app.services.data_service import data_service
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import get_settings
+from app.core.models import BatchSearchRequest, ImportResult, Product, ProductFacets, Suggestion, TrendingItem
+from app.core.responses import model_response
+from app.services.analytics import get_analytics
+from app.services.catalog_sync import ProductImporter, import_stream, ndjson, warm_segment_task
+from app.services.data_service import get_data_service
+from app.services.facet_service import get_facet_service
+from app.services.retrieval_service import get_retrieval_service
+from app.services.similarity_service import get_similarity_service
+from app.services.suggest_service import get_suggest_service
+from app.services.task_queue import enqueue
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Product])
-def get_products(category: Optional[str] = None, search: Optional[str] = None):
+def get_products(
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    x_session_id: Optional[str] = Header(None),
+    x_user_id: Optional[str] = Header(None),
+):
     """
-    Get all products, optionally filtered by category slug or search query.
+    Get all products, optionally filtered by category slug, search query and price range.
+    Search matches products whose name, description or a feature contains the query.
     """
-    products = data_service.get_products(category_slug=category)
-    
-    # Apply search filter if provided
+    data = get_data_service()
+    rows = None
+    if min_price is not None or max_price is not None:
+        rows = get_facet_service().match(category=category, min_price=min_price, max_price=max_price)
+
     if search:
-        search_lower = search.lower()
-        products = [
-            p for p in products
-            if search_lower in p.name.lower() 
-            or search_lower in p.description.lower()
-            or any(search_lower in f.lower() for f in p.features)
-        ]
-    
-    return products
+        get_analytics().record_search(search, session_id=x_session_id, user_id=x_user_id)
+        # Matched on the columns, so only the results are built into models
+        products = data.filter_by_text(search, category_slug=category, rows=rows)
+    elif rows is None:
+        products = data.get_products(category_slug=category)
+    else:
+        products = data.get_products_at(rows)
+
+    return model_response(products, List[Product])
+
+@router.get("/facets", response_model=ProductFacets)
+def get_product_facets(
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+):
+    """
+    Facet counts for the current filters: categories, rating buckets, price histogram
+    and in-stock count. Takes the same filters as the product listing, but counts
+    search matches from the token index: every query word must start a word of the
+    name, description or features.
+    """
+    facets = get_facet_service().facets(category=category, search=search, min_price=min_price, max_price=max_price)
+    return model_response(facets, ProductFacets)
+
+@router.get("/search", response_model=List[Product])
+def search_products(
+    q: str,
+    category: Optional[str] = None,
+    in_stock: bool = False,
+    limit: int = Query(10, ge=1, le=50),
+    x_session_id: Optional[str] = Header(None),
+    x_user_id: Optional[str] = Header(None),
+):
+    """
+    Ranked product search: keyword matches (typo-tolerant) fused with vector
+    similarity. Category and stock filters apply before ranking.
+    """
+    get_analytics().record_search(q, session_id=x_session_id, user_id=x_user_id)
+    products = get_retrieval_service().retrieve(q, limit=limit, category=category, in_stock=in_stock)
+    return model_response(products, List[Product])
+
+@router.post("/search/batch", response_model=List[List[Product]])
+def search_products_batch(request: BatchSearchRequest):
+    """
+    Runs many searches with the same filters in one pass (one vectorized FAISS call).
+    Results are returned in query order.
+    """
+    results = get_retrieval_service().retrieve_batch(
+        request.queries, limit=request.limit, category=request.category, in_stock=request.in_stock
+    )
+    return model_response(results, List[List[Product]])
+
+@router.get("/suggest", response_model=List[Suggestion])
+def suggest_products(q: str = "", limit: int = Query(8, ge=1, le=20)):
+    """
+    Search-box autocomplete: product names, categories, feature keywords and tags
+    completing the typed prefix, most popular first.
+    """
+    suggestions = get_suggest_service().suggest(q, limit=limit, segments=get_data_service().segments)
+    return model_response(suggestions, List[Suggestion])
+
+@router.get("/export")
+def export_products():
+    """
+    Every product as NDJSON (one JSON object per line), streamed straight from the catalog.
+    """
+    return StreamingResponse(ndjson(get_data_service().iter_products()), media_type="application/x-ndjson")
+
+@router.post("/import", response_model=ImportResult)
+async def import_products(request: Request, dry_run: bool = False):
+    """
+    Bulk upsert products from an NDJSON body, validated in chunks; a line
+    {"id": ..., "deleted": true} removes a product. Valid lines are published as
+    catalog segments that every worker serves on its next request; invalid ones
+    are skipped and reported. With dry_run, lines are only validated.
+    Segment indexes are built in the background; until then the first search builds them.
+    """
+    segments = get_data_service().segments
+    if segments is None:
+        raise HTTPException(status_code=503, detail="Catalog snapshot is not available")
+    settings = get_settings()
+    importer = ProductImporter(
+        segments,
+        chunk_size=settings.CATALOG_IMPORT_CHUNK_SIZE,
+        segment_rows=settings.CATALOG_SEGMENT_ROWS,
+        dry_run=dry_run,
+        on_segment=lambda name: enqueue(warm_segment_task.task_name, name=name),
+    )
+    return await import_stream(importer, request.stream())
+
+@router.get("/trending", response_model=List[TrendingItem])
+def get_trending(kind: Literal["view", "search"] = "view", limit: int = Query(10, ge=1, le=100)):
+    """
+    Most viewed products (or most searched queries) over the last ANALYTICS_WINDOW
+    seconds of this worker's traffic, with approximate counts.
+    """
+    return [TrendingItem(key=key, count=count) for key, count in get_analytics().trending(kind, limit)]
 
 @router.get("/slug/{slug}", response_model=Product)
-def get_product_by_slug(slug: str):
+def get_product_by_slug(slug: str, x_session_id: Optional[str] = Header(None), x_user_id: Optional[str] = Header(None)):
     """
-    Get a specific product by its URL slug.
+    Get a specific product by its URL slug. Counts as a view of the session
+    (X-Session-Id, the chat session id) and user (X-User-Id) when sent.
     """
-    product = data_service.get_product_by_slug(slug)
+    product = get_data_service().get_product_by_slug(slug)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    get_analytics().record_view(product.id, session_id=x_session_id, user_id=x_user_id)
+    return model_response(product, Product)
 
 @router.get("/{product_id}", response_model=Product)
-def get_product(product_id: str):
+def get_product(product_id: str, x_session_id: Optional[str] = Header(None), x_user_id: Optional[str] = Header(None)):
     """
-    Get a specific product by ID.
+    Get a specific product by ID. Counts as a view, like the slug lookup.
     """
-    product = data_service.get_product_by_id(product_id)
+    product = get_data_service().get_product_by_id(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    get_analytics().record_view(product_id, session_id=x_session_id, user_id=x_user_id)
+    return model_response(product, Product)
 
+@router.get("/{product_id}/similar", response_model=List[Product])
+def get_similar_products(product_id: str, limit: int = Query(10, ge=1, le=50)):
+    """
+    Products most similar to this one (category, features/tags, price band, description),
+    best match first. Served from the precomputed neighbour table.
+    """
+    data = get_data_service()
+    if not data.get_product_by_id(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    neighbours = get_similarity_service().similar(product_id, limit=limit)
+    products = [data.get_product_by_id(neighbour_id) for neighbour_id, _ in neighbours]
+    return model_response([p for p in products if p], List[Product])
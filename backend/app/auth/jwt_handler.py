@@ -2,7 +2,7 @@ import jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Header, HTTPException, status
-from app.core.config import settings
+from app.core.config import get_settings
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -11,6 +11,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    settings = get_settings()
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -28,6 +29,7 @@ def verify_token(authorization: str = Header(None)):
         if scheme.lower() != 'bearer':
             raise HTTPException(status_code=401, detail="Invalid auth scheme")
         
+        settings = get_settings()
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
         return payload
     except Exception:
@@ -0,0 +1,129 @@
+"""
+Chat Checkpoints
+LangGraph checkpoints a chat thread after every super-step, so each turn adds
+a handful of checkpoints, and the in-memory saver keeps all of them for as long
+as the process lives. When each of them also held a full copy of `messages`,
+a session's memory grew with the square of its length.
+
+Two things keep it linear now:
+
+- `AgentState.messages` is a DeltaChannel. A checkpoint stores only the
+  messages its step added, and the history is rebuilt by replaying those
+  writes from the nearest snapshot.
+- RetainingSaver keeps only the newest CHAT_CHECKPOINTS_KEPT checkpoints of a
+  thread, plus any checkpoint still waiting on an interrupt (the
+  transactional node's payment confirmation), and drops the rest along with
+  their writes and channel blobs. Before older checkpoints go, each kept
+  checkpoint that loses its parent gets a snapshot of the delta channels, so
+  no history is lost.
+
+delete_thread (used by /chat/clear) frees everything stored for a thread.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Mapping
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.types import INTERRUPT, RESUME
+
+try:
+    from langgraph.channels import DeltaChannel
+    from langgraph.checkpoint.serde.types import _DeltaSnapshot
+except ImportError:  # older LangGraph: no delta channels to snapshot
+    DeltaChannel = None
+
+
+class RetainingSaver(InMemorySaver):
+    def __init__(self, keep: int = 4, **kwargs):
+        super().__init__(**kwargs)
+        self.keep = max(1, keep)
+        self.delta_channels: Dict[str, Any] = {}
+        # thread id -> namespace -> checkpoint id -> channel versions, so pruning and
+        # deleting a thread touch only its own entries and never deserialize checkpoints
+        self._versions: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = defaultdict(lambda: defaultdict(dict))
+
+    def track(self, channels: Mapping[str, Any]):
+        """Registers the compiled graph's channels; its delta channels are snapshotted before pruning."""
+        if DeltaChannel is not None:
+            self.delta_channels = {name: ch for name, ch in channels.items() if isinstance(ch, DeltaChannel)}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._versions[thread_id][checkpoint_ns][checkpoint["id"]] = dict(checkpoint["channel_versions"])
+        self._prune(thread_id, checkpoint_ns)
+        return saved
+
+    def _awaiting_resume(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> bool:
+        writes = self.writes.get((thread_id, checkpoint_ns, checkpoint_id))
+        if not writes:
+            return False
+        channels = {channel for _, channel, _, _ in writes.values()}
+        return INTERRUPT in channels and RESUME not in channels
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        versions = self._versions[thread_id][checkpoint_ns]
+        if len(versions) <= self.keep:
+            return
+        ids = sorted(versions)  # checkpoint ids sort by creation time
+        kept = set(ids[-self.keep:])
+        kept.update(i for i in ids[:-self.keep] if self._awaiting_resume(thread_id, checkpoint_ns, i))
+        if len(kept) == len(ids):
+            return
+
+        storage = self.storage[thread_id][checkpoint_ns]
+        # Oldest first, so a later root's replay can stop at an earlier root's snapshot
+        for checkpoint_id in sorted(kept):
+            checkpoint, metadata, parent = storage[checkpoint_id]
+            if parent is not None and parent not in kept:
+                self._snapshot(thread_id, checkpoint_ns, checkpoint_id)
+                storage[checkpoint_id] = (checkpoint, metadata, None)
+
+        in_use = {(channel, version) for i in kept for channel, version in versions[i].items()}
+        for checkpoint_id in ids:
+            if checkpoint_id in kept:
+                continue
+            for channel, version in versions.pop(checkpoint_id).items():
+                if (channel, version) not in in_use:
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+            del storage[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _snapshot(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        """Stores the value of every delta channel at this checkpoint, so it no longer needs its ancestors."""
+        versions = self._versions[thread_id][checkpoint_ns][checkpoint_id]
+        names = [
+            name for name in self.delta_channels
+            if name in versions and self.blobs.get((thread_id, checkpoint_ns, name, versions[name]), ("empty",))[0] == "empty"
+        ]
+        if not names:
+            return
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+        for name, history in self.get_delta_channel_history(config=config, channels=names).items():
+            spec = self.delta_channels[name]
+            channel = spec.from_checkpoint(history["seed"] if "seed" in history else _DeltaSnapshot(spec.typ()))
+            channel.replay_writes(history["writes"])
+            self.blobs[(thread_id, checkpoint_ns, name, versions[name])] = self.serde.dumps_typed(_DeltaSnapshot(channel.get()))
+
+    def delete_thread(self, thread_id: str) -> None:
+        for checkpoint_ns, versions in self._versions.pop(thread_id, {}).items():
+            for checkpoint_id, channel_versions in versions.items():
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for channel, version in channel_versions.items():
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        self.storage.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Sessions held in memory and the serialized bytes of their checkpoints, writes and channel blobs."""
+        checkpoints = [entry for namespaces in self.storage.values() for saved in namespaces.values() for entry in saved.values()]
+        writes = [write for saved in self.writes.values() for write in saved.values()]
+        return {
+            "threads": len(self.storage),
+            "checkpoints": len(checkpoints),
+            "checkpoint_bytes": sum(len(checkpoint[1]) + len(metadata[1]) for checkpoint, metadata, _ in checkpoints),
+            "writes": len(writes),
+            "write_bytes": sum(len(value[1]) for _, _, value, _ in writes),
+            "blobs": len(self.blobs),
+            "blob_bytes": sum(len(value[1]) for value in self.blobs.values()),
+        }
@@ -1,3 +1,5 @@
+import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from typing import List, Optional
 
@@ -9,7 +11,35 @@ class Settings(BaseSettings):
     # AI Config
     OPENROUTER_API_KEY: str
     OPENROUTER_MODEL: str = "meta-llama/llama-3.1-70b-instruct"
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"  # e.g. a local stand-in (scripts/llm_stub.py)
+
+    # Model tiers per agent call (see app/core/llm.py). An empty model means OPENROUTER_MODEL;
+    # the fallback answers when the primary model times out or fails.
+    LLM_ROUTER_MODEL: str = "meta-llama/llama-3.1-8b-instruct"  # Supervisor routing
+    LLM_ROUTER_FALLBACK_MODEL: str = ""
+    LLM_ROUTER_TIMEOUT: float = 5.0  # Seconds before the fallback takes over
+    LLM_ROUTER_MAX_TOKENS: int = 64
+    LLM_EXTRACTOR_MODEL: str = "meta-llama/llama-3.1-8b-instruct"  # Researcher keyword extraction
+    LLM_EXTRACTOR_FALLBACK_MODEL: str = ""
+    LLM_EXTRACTOR_TIMEOUT: float = 5.0
+    LLM_EXTRACTOR_MAX_TOKENS: int = 64
+    LLM_CONVERSATIONAL_MODEL: str = ""  # Concierge/support tool loops and replies
+    LLM_CONVERSATIONAL_FALLBACK_MODEL: str = "meta-llama/llama-3.1-8b-instruct"
+    LLM_CONVERSATIONAL_TIMEOUT: float = 30.0
+    LLM_CONVERSATIONAL_MAX_TOKENS: int = 1024
+    LLM_SYNTHESIS_MODEL: str = ""  # Researcher comparison write-up
+    LLM_SYNTHESIS_FALLBACK_MODEL: str = "meta-llama/llama-3.1-8b-instruct"
+    LLM_SYNTHESIS_TIMEOUT: float = 45.0
+    LLM_SYNTHESIS_MAX_TOKENS: int = 2048
     
+    # Chat memory (see app/core/checkpoints.py)
+    CHAT_CHECKPOINTS_KEPT: int = 4  # Newest LangGraph checkpoints kept per session (plus a pending confirmation)
+
+    # Chat turns (see app/core/turns.py)
+    CHAT_MAX_CONCURRENT_TURNS: int = 32  # Turns running at once per worker; the rest wait, round-robin by session
+    CHAT_SESSION_MAX_QUEUED: int = 4  # Turns per session running or waiting; more get a 429
+    CHAT_QUEUE_TIMEOUT: float = 30.0  # Seconds a turn waits for a slot before a 503
+
     # Auth
     JWT_SECRET: str
     ALGORITHM: str = "HS256"
@@ -18,10 +48,83 @@ class Settings(BaseSettings):
     # Stripe (optional - only required for checkout)
     STRIPE_SECRET_KEY: Optional[str] = None
     STRIPE_PUBLISHABLE_KEY: Optional[str] = None
+    STRIPE_API_BASE: Optional[str] = None  # e.g. a local stand-in (scripts/stripe_stub.py)
+    STRIPE_MAX_WORKERS: int = 8  # Threads available for blocking Stripe calls
+    STRIPE_MAX_NETWORK_RETRIES: int = 2
+    STRIPE_SESSION_CACHE_TTL: float = 5.0  # Seconds to cache checkout session status
+    STRIPE_WEBHOOK_SECRET: Optional[str] = None  # Signing secret for /checkout/webhook (commits stock when a session is paid)
+
+    # Storage
+    # Runtime files shared by all workers on this host (mapped catalog, order database)
+    RUNTIME_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "var")
+
+    # Inventory
+    INVENTORY_RESERVATION_TTL: float = 2400.0  # Seconds before an abandoned checkout's stock is released (checkout uses at least 2040: Stripe sessions stay open 30 min)
+    INVENTORY_WAL_FSYNC: bool = False  # fsync every stock transaction (durable across power loss, slower)
+    INVENTORY_SWEEP_INTERVAL: float = 30.0
+
+    # Web search tool (see app/core/hedging.py)
+    WEB_SEARCH_DEADLINE: float = 4.0  # Seconds before research goes on with cached/no web results
+    WEB_SEARCH_HEDGE_DELAY: float = 1.5  # Duplicate request after this long, until the p95 is known
+    WEB_SEARCH_CACHE_TTL: float = 3600.0  # Seconds a query's results are reused (kept longer as a fallback)
+    WEB_SEARCH_WORKERS: int = 8  # Concurrent searches, including stalled ones
+
+    # Background tasks (see app/services/task_queue.py)
+    TASK_WORKERS: int = 4  # Tasks run concurrently per worker process
+    TASK_MAX_RETRIES: int = 3  # Default retries per task, with exponential backoff
+    TASK_RETRY_DELAY: float = 1.0  # Seconds before the first retry (doubles each time)
+    TASK_DRAIN_TIMEOUT: float = 10.0  # Seconds shutdown waits for queued tasks
+
+    # Storefront analytics (see app/services/analytics.py)
+    ANALYTICS_WINDOW: float = 1800.0  # Seconds of views/searches counted (sliding window)
+    ANALYTICS_SKETCH_WIDTH: int = 65536  # Count-min sketch counters per row (power of two)
+    ANALYTICS_SKETCH_DEPTH: int = 4
+    ANALYTICS_TOP_K: int = 100  # Trending products/searches tracked
+    ANALYTICS_SUBJECT_TOP_K: int = 8  # Products/searches tracked per session and user
+    ANALYTICS_MAX_SUBJECTS: int = 20000  # Most recently active sessions and users kept per worker
+    RETENTION_VIEW_THRESHOLD: int = 3  # Views of one product in the window before the chat offers a deal
+    RETENTION_OFFER_DISCOUNT: str = "10%"
+    RETENTION_OFFER_CODE: str = "HIKE2026"
+
+    # Recommendations
+    SIMILAR_PRODUCTS_K: int = 20  # Neighbours precomputed per product
+
+    # Bulk catalog/order import (see app/services/catalog_sync.py)
+    CATALOG_IMPORT_CHUNK_SIZE: int = 1000  # NDJSON lines validated (and orders inserted) per batch
+    CATALOG_SEGMENT_ROWS: int = 20000  # Imported products per catalog segment
+    CATALOG_MAX_SEGMENTS: int = 16  # Above this, the newest small segments are merged
+
+    # Embeddings (cached on disk by model + content hash; only new/changed texts are embedded)
+    EMBEDDING_BATCH_SIZE: int = 256  # Texts per embedding call
+    EMBEDDING_WORKERS: int = 4  # Concurrent embedding calls
+
+    # Vector index (see app/services/vector_index.py)
+    VECTOR_INDEX: str = "auto"  # flat | hnsw | ivf | ivfpq | auto (by catalog size)
+    VECTOR_IVF_NLIST: int = 0  # IVF lists; 0 = ~4 * sqrt(products)
+    VECTOR_IVF_NPROBE: int = 16  # IVF lists scanned per query
+    VECTOR_HNSW_M: int = 32  # HNSW links per node
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 80
+    VECTOR_HNSW_EF_SEARCH: int = 64  # HNSW candidates explored per query
+    VECTOR_PQ_M: int = 32  # PQ bytes per vector (must divide the embedding dim)
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = False  # Build graph/data services in the background after boot
+
+    # Diagnostics (see app/core/diagnostics.py)
+    DIAGNOSTICS_TOKEN: Optional[str] = None  # Enables /diagnostics (memory report, tracemalloc); sent as X-Diagnostics-Token
 
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Settings are read from the environment on first use, not at import."""
+    return Settings()
+
+def __getattr__(name: str):
+    # Keeps `from app.core.config import settings` working without import-time construction
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
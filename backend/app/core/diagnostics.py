@@ -0,0 +1,309 @@
+"""
+Diagnostics
+Memory accounting for a long-running worker, served by the opt-in
+/api/v1/diagnostics endpoints (set DIAGNOSTICS_TOKEN).
+
+memory_report() covers every subsystem this worker has built. Subsystems it
+hasn't used yet are listed as not loaded: reporting never builds anything.
+Each subsystem reports:
+
+    heap_bytes    Python objects and arrays owned by this process
+    mapped_bytes  memory-mapped files (catalog, indexes). The OS shares these
+                  with every worker on the host and pages them in on demand
+    stats         the subsystem's own counters (sessions and checkpoint
+                  bytes, cache occupancy and hit rates, queue depths, ...)
+
+Sizes come from walking each subsystem's objects. Large containers are
+sampled, so the numbers are estimates, good for seeing what grows rather than
+for accounting to the byte. Subsystems are walked owners first, and an object
+is counted once, for the first subsystem that reaches it.
+
+For leaks the report can't attribute, tracemalloc snapshots are taken on
+demand and diffed by source line. Tracing slows allocation-heavy code and
+costs memory per traced block, so stop it when done.
+"""
+
+import gc
+import itertools
+import mmap
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Subsystem -> (module, lazy accessor), owners before the services built on them
+SUBSYSTEMS = [
+    ("catalog", "app.services.data_service", "get_data_service"),
+    ("search_index", "app.services.search_index", "get_search_index"),
+    ("facets", "app.services.facet_service", "get_facet_service"),
+    ("suggest", "app.services.suggest_service", "get_suggest_service"),
+    ("similarity", "app.services.similarity_service", "get_similarity_service"),
+    ("vector_index", "app.services.product_service", "get_product_service"),
+    ("retrieval", "app.services.retrieval_service", "get_retrieval_service"),
+    ("inventory", "app.services.inventory_service", "get_inventory_service"),
+    ("chat", "app.graph", "get_app_graph"),
+    ("chat_turns", "app.core.turns", "get_turn_scheduler"),
+    ("analytics", "app.services.analytics", "get_analytics"),
+    ("task_queue", "app.services.task_queue", "get_task_queue"),
+    ("web_search", "app.agents.tools", "get_web_search"),
+    ("stripe", "app.services.stripe_service", "get_stripe_service"),
+]
+
+# Function-level caches: (module, function)
+LRU_CACHES = [
+    ("app.services.similarity_service", "_bucket"),
+    ("app.core.responses", "_adapter"),
+    ("app.core.llm", "get_llm"),
+]
+
+SAMPLE_ITEMS = 256  # container items measured before extrapolating
+MAX_DEPTH = 24
+MAX_SNAPSHOTS = 4
+
+# Not walked: code, and handles whose memory lives outside Python or belongs to the runtime
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType, types.FrameType)
+_OPAQUE_MODULES = ("faiss", "ssl", "socket", "_thread", "threading", "sqlite3", "asyncio", "concurrent", "_io", "io", "httpx", "httpcore", "openai")
+_SCALARS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+
+class _Sizer:
+    """Approximate heap and mapped bytes reachable from some roots."""
+
+    def __init__(self, seen: set):
+        self.seen = seen
+        self.heap = 0
+        self.mapped = 0
+
+    def add(self, obj, depth: int = 0):
+        if id(obj) in self.seen or depth > MAX_DEPTH:
+            return
+        self.seen.add(id(obj))
+        if isinstance(obj, _SCALARS):
+            self.heap += sys.getsizeof(obj)
+        elif isinstance(obj, mmap.mmap):
+            self.mapped += len(obj)
+        elif isinstance(obj, memoryview):
+            self.add(obj.obj, depth + 1)  # the buffer's owner: an mmap or a bytes object
+        elif _is_array(obj):
+            if obj.base is None:
+                self.heap += obj.nbytes
+            else:
+                self.add(obj.base, depth + 1)  # a view: counted with what it views
+        elif isinstance(obj, dict):
+            self.heap += sys.getsizeof(obj)
+            # Keys and values, not items(): those tuples are temporaries, whose ids get reused
+            self._items(itertools.chain.from_iterable(obj.items()), 2 * len(obj), depth)
+        elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+            self.heap += sys.getsizeof(obj)
+            self._items(obj, len(obj), depth)
+        elif isinstance(obj, _OPAQUE) or type(obj).__module__.split(".")[0] in _OPAQUE_MODULES:
+            return
+        else:
+            self.heap += sys.getsizeof(obj)
+            if isinstance(getattr(type(obj), "memory_bytes", None), property):
+                self.heap += obj.memory_bytes  # e.g. a FAISS index, whose memory Python can't see
+            attrs = getattr(obj, "__dict__", None)
+            if attrs is not None:
+                self.add(attrs, depth + 1)
+            for cls in type(obj).__mro__:
+                for slot in cls.__dict__.get("__slots__", ()):
+                    self.add(getattr(obj, slot, None), depth + 1)
+
+    def _items(self, items, count: int, depth: int):
+        before = self.heap
+        sampled = 0
+        for item in itertools.islice(items, SAMPLE_ITEMS):
+            self.add(item, depth + 1)
+            sampled += 1
+        if sampled and count > sampled:
+            self.heap += (self.heap - before) * (count - sampled) // sampled
+
+
+def _is_array(obj) -> bool:
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(obj, np.ndarray)
+
+
+def _loaded(module: str, accessor: str):
+    """The subsystem's instance if this worker has built it, else None."""
+    if module not in sys.modules:
+        return None
+    get = getattr(sys.modules[module], accessor, None)
+    if get is None or not get.is_initialized():
+        return None
+    return get()
+
+
+def _hit_rate(hits: int, total: int) -> Optional[float]:
+    return round(hits / total, 3) if total else None
+
+
+def _subsystem_stats(name: str, obj) -> Dict[str, Any]:
+    if name == "catalog":
+        products = obj.catalog.tables["products"] if obj.catalog else None
+        return {"products": len(products) if products is not None else 0, "segments": obj.segments.segment_count if obj.segments else 0}
+    if name == "vector_index":
+        index = obj.index
+        return {"kind": index.kind, "vectors": index.ntotal, "index_bytes": index.memory_bytes} if index else {"built": False}
+    if name == "chat":
+        return obj.checkpointer.stats()
+    if name == "web_search":
+        stats = obj.stats()
+        return {**stats, "cache_hit_rate": _hit_rate(stats["cache_hits"], stats["calls"])}
+    if name == "stripe":
+        cache = obj._session_cache
+        return {"session_cache_entries": len(cache), "session_cache_hit_rate": _hit_rate(cache.hits, cache.hits + cache.misses)}
+    stats = getattr(obj, "stats", None)
+    return stats() if callable(stats) else {}
+
+
+def _lru_caches() -> Dict[str, Any]:
+    caches = {}
+    for module, function in LRU_CACHES:
+        fn = getattr(sys.modules.get(module), function, None)
+        if fn is not None:
+            info = fn.cache_info()
+            caches[f"{module}.{function}"] = {
+                "entries": info.currsize, "max_entries": info.maxsize,
+                "hit_rate": _hit_rate(info.hits, info.hits + info.misses),
+            }
+    return caches
+
+
+def process_memory() -> Dict[str, Any]:
+    """Resident and peak memory of this worker, and what tracemalloc is tracing."""
+    report: Dict[str, Any] = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/statm") as f:
+            report["rss_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass  # not Linux
+    try:
+        import resource
+
+        # ru_maxrss is KB on Linux, bytes on macOS
+        report["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        pass
+    report["gc_counts"] = gc.get_count()
+    report["tracemalloc"] = tracemalloc.is_tracing()
+    if tracemalloc.is_tracing():
+        report["traced_bytes"], report["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+    return report
+
+
+def object_census(limit: int = 20) -> Dict[str, Any]:
+    """Live objects tracked by the garbage collector, by type (slow: visits every object)."""
+    counts = Counter(f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in gc.get_objects())
+    pydantic = sys.modules.get("pydantic")
+    models = sum(1 for obj in gc.get_objects() if isinstance(obj, pydantic.BaseModel)) if pydantic else 0
+    return {"objects": sum(counts.values()), "pydantic_models": models, "top_types": counts.most_common(limit)}
+
+
+def memory_report(objects: bool = False) -> Dict[str, Any]:
+    start = time.perf_counter()
+    seen: set = set()
+    subsystems = {}
+    for name, module, accessor in SUBSYSTEMS:
+        obj = _loaded(module, accessor)
+        if obj is None:
+            subsystems[name] = {"loaded": False}
+            continue
+        sizer = _Sizer(seen)
+        sizer.add(obj)
+        try:
+            stats = _subsystem_stats(name, obj)
+        except Exception as e:  # diagnostics must not fail because one subsystem is mid-rebuild
+            stats = {"error": str(e)}
+        subsystems[name] = {"loaded": True, "heap_bytes": sizer.heap, "mapped_bytes": sizer.mapped, "stats": stats}
+    report = {"process": process_memory(), "subsystems": subsystems, "lru_caches": _lru_caches()}
+    if objects:
+        report["census"] = object_census()
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+# ==========================================
+# tracemalloc snapshots
+# ==========================================
+
+_snapshots: "OrderedDict[int, Tuple[float, tracemalloc.Snapshot]]" = OrderedDict()
+_snapshot_ids = itertools.count(1)
+_lock = threading.Lock()
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def start_tracing(frames: int = 1) -> Dict[str, Any]:
+    """Starts tracemalloc (frames: call stack depth recorded per allocation)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return process_memory()
+
+
+def stop_tracing() -> Dict[str, Any]:
+    """Stops tracemalloc and drops the snapshots, freeing the tracing overhead."""
+    with _lock:
+        _snapshots.clear()
+    tracemalloc.stop()
+    return process_memory()
+
+
+def _stat(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    entry = {"where": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry.update(size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+    return entry
+
+
+def take_snapshot(limit: int = 20) -> Dict[str, Any]:
+    """Snapshots traced allocations (keeping the last MAX_SNAPSHOTS) and lists the largest by line."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing; start it first")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    with _lock:
+        snapshot_id = next(_snapshot_ids)
+        _snapshots[snapshot_id] = (time.time(), snapshot)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    stats = snapshot.statistics("lineno")
+    return {
+        "id": snapshot_id,
+        "traced_bytes": sum(stat.size for stat in stats),
+        "top": [_stat(stat) for stat in stats[:limit]],
+    }
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    with _lock:
+        return [{"id": snapshot_id, "taken_at": taken_at} for snapshot_id, (taken_at, _) in _snapshots.items()]
+
+
+def diff_snapshots(base: Optional[int] = None, target: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
+    """What grew between two snapshots (default: the last two), by source line, largest growth first."""
+    with _lock:
+        ids = list(_snapshots)
+        target = ids[-1] if target is None and ids else target
+        if base is None and target in ids and ids.index(target) > 0:
+            base = ids[ids.index(target) - 1]
+        if base not in _snapshots or target not in _snapshots:
+            raise KeyError("Need two snapshots to diff (take another, or pass ids from /tracemalloc/snapshots)")
+        (base_at, base_snapshot), (target_at, target_snapshot) = _snapshots[base], _snapshots[target]
+    stats = target_snapshot.compare_to(base_snapshot, "lineno")
+    return {
+        "base": base,
+        "target": target,
+        "seconds": round(target_at - base_at, 1),
+        "size_diff_bytes": sum(stat.size_diff for stat in stats),
+        "top": [_stat(stat) for stat in stats[:limit]],
+    }
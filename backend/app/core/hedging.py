@@ -0,0 +1,131 @@
+"""
+Hedged Calls
+Runs a slow, flaky upstream call (e.g. the web search tool) with a hard
+deadline. Once the call has taken longer than the upstream's recent p95
+latency, a duplicate request is fired and whichever finishes first wins.
+When the deadline passes, or every attempt fails, the caller gets the last
+good result for the same key (even if expired) or the fallback, so a stalled
+upstream costs at most `deadline` seconds.
+
+Calls run on a small dedicated pool. A stalled attempt can't be cancelled:
+it keeps its thread until the upstream gives up, so the pool bounds how many
+can pile up.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable
+
+# Latency samples needed before the hedge delay follows the observed p95
+MIN_SAMPLES = 20
+
+
+class HedgedCall:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        fallback: Callable[[Any], Any],
+        deadline: float = 4.0,
+        hedge_delay: float = 1.5,
+        cache_ttl: float = 3600.0,
+        cache_size: int = 512,
+        max_workers: int = 8,
+    ):
+        self.name = name
+        self.fn = fn
+        self.fallback = fallback
+        self.deadline = deadline
+        self.initial_hedge_delay = hedge_delay
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._latencies = deque(maxlen=200)  # seconds, successful attempts only
+        # key -> (fetched_at, result); entries past cache_ttl are kept as a last resort
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "cache_hits": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0, "fallbacks": 0}
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first attempt before firing a duplicate: the recent p95."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_SAMPLES:
+            return min(self.initial_hedge_delay, self.deadline)
+        return min(samples[int(len(samples) * 0.95) - 1], self.deadline)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _attempt(self, arg):
+        start = time.monotonic()
+        result = self.fn(arg)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _cached(self, key: Hashable, fresh: bool):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or (fresh and time.monotonic() - entry[0] > self.cache_ttl):
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _remember(self, key: Hashable, result):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def __call__(self, arg, key: Hashable = None):
+        key = arg if key is None else key
+        self._count("calls")
+        cached = self._cached(key, fresh=True)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached
+
+        start = time.monotonic()
+        hedge_at, give_up_at = start + self.hedge_delay(), start + self.deadline
+        first = self._executor.submit(self._attempt, arg)
+        pending, hedged = {first}, False
+        while True:
+            wake_at = give_up_at if hedged else min(hedge_at, give_up_at)
+            done, pending = wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    result = future.result()
+                    self._remember(key, result)
+                    return result
+                self._count("errors")
+                print(f"{self.name} failed: {future.exception()}")
+            now = time.monotonic()
+            if now >= give_up_at:
+                break
+            if not hedged and (not pending or now >= hedge_at):
+                # Slower than p95 (or already failed): race a duplicate against it
+                hedged = True
+                self._count("hedged")
+                pending.add(self._executor.submit(self._attempt, arg))
+            elif not pending:
+                break
+
+        if pending:
+            self._count("timeouts")
+            print(f"{self.name} timed out after {self.deadline}s")
+        self._count("fallbacks")
+        stale = self._cached(key, fresh=False)
+        return stale if stale is not None else self.fallback(arg)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            counters["cached"] = len(self._cache)
+        return {**counters, "hedge_delay_s": round(self.hedge_delay(), 3), "deadline_s": self.deadline}
@@ -0,0 +1,146 @@
+"""
+Streaming JSON
+Parses a JSON object while an LLM is still generating it, so callers can act
+on each piece as soon as it is complete instead of waiting for the whole
+completion (and for the JSON to be cut out of code fences):
+
+    field  a top-level member, e.g. ("field", "next_node", "support")
+    item   an element of a top-level array listed in `stream_arrays`, e.g.
+           ("item", "data", {...one carousel card...})
+
+Anything before the opening brace (a code fence, "Sure, here it is") is
+skipped, and so is anything after the closing one. A malformed completion
+raises ValueError, as json.loads would.
+"""
+
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+Event = Tuple[str, str, Any]
+
+_SPACE = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "expect_key", "value_start")
+
+    def __init__(self, kind: str):
+        self.kind = kind  # "{" or "["
+        self.key: Optional[str] = None  # member being parsed (objects)
+        self.expect_key = kind == "{"
+        self.value_start: Optional[int] = None
+
+
+class JsonStreamParser:
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = set(stream_arrays)
+        self.fields = {}  # top-level members parsed so far
+        self.done = False  # the top-level object is closed
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._in_scalar = False
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Adds the next piece of the completion; returns the events it completed."""
+        events: List[Event] = []
+        if self.done or not chunk:
+            return events
+        self._text += chunk
+        text, stack = self._text, self._stack
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if not stack:
+                if c == "{":
+                    stack.append(_Frame("{"))
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                continue
+            if self._in_scalar and (c in _SPACE or c in ",]}"):
+                self._in_scalar = False
+                self._end_value(i, events)
+            if c in _SPACE:
+                continue
+            frame = stack[-1]
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if not frame.expect_key:
+                    self._start_value(i)
+            elif c in "{[":
+                self._start_value(i)
+                stack.append(_Frame(c))
+            elif c in "}]":
+                stack.pop()
+                if not stack:
+                    self.done = True
+                    self._pos = len(text)
+                    return events
+                self._end_value(i + 1, events)
+            elif c == ",":
+                frame.expect_key = frame.kind == "{"
+            elif c == ":":
+                pass
+            elif not self._in_scalar:
+                self._in_scalar = True
+                self._start_value(i)
+        self._pos = len(text)
+        return events
+
+    def _start_value(self, i: int):
+        self._stack[-1].value_start = i
+
+    def _end_string(self, i: int, events: List[Event]):
+        frame = self._stack[-1]
+        if frame.expect_key:
+            frame.key = self._loads(self._string_start, i + 1)
+            frame.expect_key = False
+        else:
+            self._end_value(i + 1, events)
+
+    def _end_value(self, end: int, events: List[Event]):
+        frame = self._stack[-1]
+        start, frame.value_start = frame.value_start, None
+        depth = len(self._stack)
+        if depth == 1:
+            value = self.fields[frame.key] = self._loads(start, end)
+            events.append(("field", frame.key, value))
+        elif depth == 2 and frame.kind == "[" and self._stack[0].key in self.stream_arrays:
+            events.append(("item", self._stack[0].key, self._loads(start, end)))
+
+    def _loads(self, start: int, end: int):
+        try:
+            return json.loads(self._text[start:end])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed JSON in completion: {e}") from e
+
+
+async def stream_json(
+    chunks: AsyncIterator[Any], stream_arrays: Iterable[str] = (), until: Iterable[str] = ()
+) -> AsyncIterator[Event]:
+    """
+    Parses a streamed completion (LLM message chunks or strings) into events. Stops
+    reading, which closes the stream and ends generation, as soon as every field in
+    `until` is parsed, or once the object is complete.
+    """
+    parser = JsonStreamParser(stream_arrays)
+    wanted = set(until)
+    async with aclosing(chunks) as stream:
+        async for chunk in stream:
+            for event in parser.feed(chunk if isinstance(chunk, str) else chunk.content):
+                yield event
+                if wanted and wanted.issubset(parser.fields):
+                    return
+            if parser.done:
+                return
@@ -0,0 +1,34 @@
+import functools
+import threading
+
+_UNSET = object()
+
+def lazy_singleton(factory):
+    """
+    Turns a zero-argument factory into a thread-safe accessor that builds the
+    object on first call and returns the same instance afterwards.
+    Lets heavy services (and their imports) stay out of module import time.
+    """
+    lock = threading.Lock()
+    instance = _UNSET
+
+    @functools.wraps(factory)
+    def accessor():
+        nonlocal instance
+        if instance is _UNSET:
+            with lock:
+                if instance is _UNSET:
+                    instance = factory()
+        return instance
+
+    def is_initialized() -> bool:
+        return instance is not _UNSET
+
+    def reset():
+        nonlocal instance
+        with lock:
+            instance = _UNSET
+
+    accessor.is_initialized = is_initialized
+    accessor.reset = reset
+    return accessor
@@ -1,13 +1,87 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import settings
+from functools import lru_cache
 
-def get_llm():
+from app.core.config import get_settings
+
+# Model tiers, cheapest first. Each node asks for the cheapest one good enough for its call:
+#   router          supervisor's four-way routing (a few tokens of structured output)
+#   extractor       researcher's keyword extraction
+#   conversational  concierge/support tool loops and replies
+#   synthesis       researcher's comparison write-up
+TIERS = ("router", "extractor", "conversational", "synthesis")
+
+def tier_config(tier: str) -> dict:
+    """Model, fallback model, timeout and max tokens of a tier (LLM_<TIER>_* settings)."""
+    if tier not in TIERS:
+        raise ValueError(f"Unknown LLM tier {tier!r} (expected one of {', '.join(TIERS)})")
+    settings = get_settings()
+    prefix = f"LLM_{tier.upper()}_"
+    model = getattr(settings, prefix + "MODEL") or settings.OPENROUTER_MODEL
+    fallback = getattr(settings, prefix + "FALLBACK_MODEL") or settings.OPENROUTER_MODEL
+    return {
+        "model": model,
+        "fallback_model": fallback if fallback != model else None,
+        "timeout": getattr(settings, prefix + "TIMEOUT"),
+        "max_tokens": getattr(settings, prefix + "MAX_TOKENS"),
+    }
+
+class TieredLLM:
     """
-    Returns a configured ChatOpenAI instance pointing to OpenRouter.
+    A tier's primary model with its fallback. The primary gets the tier's timeout
+    and no retries, so a slow or failing call moves on to the fallback model
+    instead of waiting out a retry. Supports the ChatModel calls the agents use.
     """
-    return ChatOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=settings.OPENROUTER_API_KEY,
-        model=settings.OPENROUTER_MODEL,
-        temperature=0.1
-    )
+
+    def __init__(self, primary, fallback=None):
+        self.primary = primary
+        self.fallback = fallback
+
+    def _wrap(self, build):
+        runnable = build(self.primary)
+        if self.fallback is None:
+            return runnable
+        return runnable.with_fallbacks([build(self.fallback)])
+
+    def bind_tools(self, tools, **kwargs):
+        return self._wrap(lambda llm: llm.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs):
+        return self._wrap(lambda llm: llm.with_structured_output(schema, **kwargs))
+
+    def invoke(self, messages, **kwargs):
+        return self._wrap(lambda llm: llm).invoke(messages, **kwargs)
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self._wrap(lambda llm: llm).ainvoke(messages, **kwargs)
+
+    def stream(self, messages, **kwargs):
+        # Falls back only if the primary fails before its first chunk
+        return self._wrap(lambda llm: llm).stream(messages, **kwargs)
+
+    def astream(self, messages, **kwargs):
+        return self._wrap(lambda llm: llm).astream(messages, **kwargs)
+
+@lru_cache
+def get_llm(tier: str = "conversational") -> TieredLLM:
+    """
+    Returns the tier's models (ChatOpenAI instances pointing to OpenRouter),
+    built once per tier.
+    """
+    from langchain_openai import ChatOpenAI
+
+    settings = get_settings()
+    config = tier_config(tier)
+
+    def model(name: str, retries: int):
+        return ChatOpenAI(
+            base_url=settings.OPENROUTER_BASE_URL,
+            api_key=settings.OPENROUTER_API_KEY,
+            model=name,
+            temperature=0.1,
+            timeout=config["timeout"],
+            max_tokens=config["max_tokens"],
+            max_retries=retries,
+        )
+
+    if config["fallback_model"] is None:
+        return TieredLLM(model(config["model"], 2))
+    return TieredLLM(model(config["model"], 0), model(config["fallback_model"], 2))
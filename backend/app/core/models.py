@@ -41,6 +41,59 @@ class Product(BaseModel):
     model_3d_url: Optional[str] = None  # URL to .glb file
     spatial_metadata: Optional[SpatialMetadata] = None
 
+# --- Facets ---
+class FacetValue(BaseModel):
+    value: str  # e.g. category slug
+    label: str
+    count: int
+
+class RatingBucket(BaseModel):
+    min_rating: float
+    count: int
+
+class PriceBucket(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None  # None = open-ended
+    count: int
+
+class ProductFacets(BaseModel):
+    """Counts for the current filter set; each facet ignores its own filter."""
+    total: int
+    in_stock: int
+    categories: List[FacetValue]
+    ratings: List[RatingBucket]
+    price_histogram: List[PriceBucket]
+
+class Suggestion(BaseModel):
+    text: str
+    kind: str  # "product", "category", "feature" or "tag"
+    product_id: Optional[str] = None  # products only
+    slug: Optional[str] = None  # products and categories
+
+class TrendingItem(BaseModel):
+    key: str  # product id, or normalized search query
+    count: float  # approximate views/searches in the analytics window
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., max_length=100)
+    category: Optional[str] = None
+    in_stock: bool = False
+    limit: int = Field(10, ge=1, le=50)
+
+# --- Bulk import ---
+class ImportIssue(BaseModel):
+    line: int  # 1-based line number in the NDJSON input
+    error: str
+
+class ImportResult(BaseModel):
+    lines: int = 0
+    imported: int = 0  # products upserted / orders inserted
+    deleted: int = 0  # products only
+    skipped: int = 0  # orders whose id already exists
+    failed: int = 0
+    segments: List[str] = []  # products only: catalog segments published
+    errors: List[ImportIssue] = []  # the first IMPORT_ERROR_LIMIT failures
+
 # --- Users ---
 class UserPreferences(BaseModel):
     style: Optional[str] = None
@@ -69,3 +122,29 @@ class Order(BaseModel):
     shipping_address: Optional[str] = None
     tracking_number: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
+
+# --- Order Aggregates ---
+class OrderRef(BaseModel):
+    """Compact order reference used in summaries."""
+    id: str
+    status: str
+    total: float
+    tracking_number: Optional[str] = None
+    created_at: datetime
+
+class StatusTotals(BaseModel):
+    order_count: int = 0
+    total: float = 0.0
+
+class OrderSummary(BaseModel):
+    """Per-user order aggregates, maintained incrementally as orders change."""
+    user_id: str
+    order_count: int = 0
+    total_spent: float = 0.0
+    by_status: Dict[str, StatusTotals] = {}
+    latest_order: Optional[OrderRef] = None
+    open_orders: List[OrderRef] = []
+
+class OrderStatusUpdate(BaseModel):
+    status: str
+
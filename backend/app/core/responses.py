@@ -0,0 +1,24 @@
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+@lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+def model_response(content: Any, annotation: Any, status_code: int = 200) -> Response:
+    """
+    Encodes already-validated models straight to JSON bytes with pydantic-core.
+
+    Returning a Response makes FastAPI skip its response_model round trip
+    (re-validating every model, then serializing), which dominates large
+    listings. Only use this for trusted internal models; the route should
+    still declare response_model so the OpenAPI schema is unchanged.
+    """
+    return Response(
+        content=_adapter(annotation).dump_json(content),
+        media_type="application/json",
+        status_code=status_code,
+    )
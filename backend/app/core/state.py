@@ -2,7 +2,18 @@ from typing import TypedDict, Annotated, List, Union, Dict, Any
 from langchain_core.messages import BaseMessage
 import operator
 
+try:
+    from langgraph.channels import DeltaChannel
+except ImportError:  # older LangGraph: every checkpoint stores the whole history
+    DeltaChannel = None
+
+def append_messages(messages: List[BaseMessage], updates: List[List[BaseMessage]]) -> List[BaseMessage]:
+    """DeltaChannel reducer: applies a batch of node updates (each a list of messages) at once."""
+    return messages + [message for update in updates for message in update]
+
 class AgentState(TypedDict):
-    messages: Annotated[List[BaseMessage], operator.add]
+    # Checkpoints store only the messages each step adds; see app/core/checkpoints.py
+    messages: Annotated[List[BaseMessage], DeltaChannel(append_messages) if DeltaChannel else operator.add]
     next_node: str
     final_response: Dict[str, Any] # To pass structured UI updates back
+    retention_product_id: str # Product the session keeps viewing (set by the supervisor for retention)
@@ -0,0 +1,148 @@
+"""
+Chat Turns
+A chat turn reads the session's LangGraph thread (is a payment confirmation
+pending?), then runs the graph on it. Two turns of one session running at once
+race on the checkpointer, and can resume the same interrupt twice. So turns are
+scheduled per worker:
+
+- A session runs one turn at a time, in arrival order. At most
+  CHAT_SESSION_MAX_QUEUED of its turns can be running or waiting. More are
+  refused (TurnRejected, a 429).
+- At most CHAT_MAX_CONCURRENT_TURNS turns run at once. When a slot frees up,
+  it goes round-robin to the sessions with a waiting turn. A session with a
+  backlog takes its place at the back of the line after every turn, so it
+  can't crowd out the others.
+- A turn that waits longer than CHAT_QUEUE_TIMEOUT seconds gives up
+  (TurnRejected, a 503).
+
+Everything runs on the event loop, so no locks are needed. Sessions are
+pinned to a worker only as far as the load balancer pins them, so run chat on
+one worker per session (as with checkout).
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+
+
+class TurnRejected(Exception):
+    """Raised when a turn can't be admitted (the session's queue is full, or it waited too long)."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Session:
+    __slots__ = ("waiting", "running")
+
+    def __init__(self):
+        self.waiting: Deque[asyncio.Future] = deque()
+        self.running = False
+
+
+class TurnScheduler:
+    def __init__(self, max_concurrent: int = 32, max_queued_per_session: int = 4, queue_timeout: float = 30.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued_per_session = max(1, max_queued_per_session)
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+        self._sessions: Dict[str, _Session] = {}
+        self._ready: Deque[str] = deque()  # sessions with a waiting turn and none running, round-robin order
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        """Waits for the session's turn and a free slot; the turn lasts until the block exits."""
+        await self.acquire(session_id)
+        try:
+            yield
+        finally:
+            self.release(session_id)
+
+    async def acquire(self, session_id: str):
+        """Admits a turn (see turn()); the caller must release(session_id) exactly once."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        if len(session.waiting) + session.running >= self.max_queued_per_session:
+            self.counters["rejected"] += 1
+            raise TurnRejected("Too many messages in flight for this session", 429)
+
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+        session.waiting.append(admitted)
+        if not session.running and len(session.waiting) == 1:
+            self._ready.append(session_id)
+        self._dispatch()
+        if not admitted.done():
+            self.counters["queued"] += 1
+        expiry = loop.call_later(self.queue_timeout, self._expire, session_id, admitted)
+        try:
+            # Shielded: a caller that goes away must not leave a cancelled future in the queue
+            await asyncio.shield(admitted)
+        except asyncio.CancelledError:
+            if admitted.done() and admitted.exception() is None:
+                self.release(session_id)  # admitted just as the caller went away
+            else:
+                self._withdraw(session_id, admitted)
+            raise
+        finally:
+            expiry.cancel()
+        self.counters["admitted"] += 1
+
+    def release(self, session_id: str):
+        session = self._sessions[session_id]
+        session.running = False
+        self.running -= 1
+        if session.waiting:
+            self._ready.append(session_id)  # back of the line
+        else:
+            del self._sessions[session_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._ready:
+            session_id = self._ready.popleft()
+            session = self._sessions[session_id]
+            session.running = True
+            self.running += 1
+            session.waiting.popleft().set_result(None)
+
+    def _withdraw(self, session_id: str, admitted: asyncio.Future):
+        """Drops a turn that stopped waiting, and its session if nothing else is left."""
+        session = self._sessions.get(session_id)
+        if session is None or admitted not in session.waiting:
+            return
+        session.waiting.remove(admitted)
+        if not session.waiting:
+            if session_id in self._ready:
+                self._ready.remove(session_id)
+            if not session.running:
+                del self._sessions[session_id]
+
+    def _expire(self, session_id: str, admitted: asyncio.Future):
+        if admitted.done():
+            return
+        self._withdraw(session_id, admitted)
+        self.counters["timeouts"] += 1
+        admitted.set_exception(TurnRejected(f"Chat is busy, no slot within {self.queue_timeout}s", 503))
+
+    def stats(self) -> Dict[str, int]:
+        waiting = sum(len(session.waiting) for session in self._sessions.values())
+        return {**self.counters, "running": self.running, "waiting": waiting, "sessions": len(self._sessions)}
+
+
+# Global instance (per worker)
+@lazy_singleton
+def get_turn_scheduler() -> TurnScheduler:
+    settings = get_settings()
+    return TurnScheduler(
+        max_concurrent=settings.CHAT_MAX_CONCURRENT_TURNS,
+        max_queued_per_session=settings.CHAT_SESSION_MAX_QUEUED,
+        queue_timeout=settings.CHAT_QUEUE_TIMEOUT,
+    )
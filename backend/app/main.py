@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -7,9 +9,71 @@ from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.v1.api import api_router
 
+def _warm_up():
+    """
+    Builds the lazily-initialized services ahead of the first request.
+    Runs in a worker thread so it never delays the server accepting traffic.
+    """
+    from app.services.data_service import get_data_service
+    from app.services.facet_service import get_facet_service
+    from app.services.retrieval_service import get_retrieval_service
+    from app.services.search_index import get_search_index
+    from app.services.similarity_service import get_similarity_service
+    from app.services.suggest_service import get_suggest_service
+    from app.graph import get_app_graph
+
+    try:
+        get_data_service()
+        get_search_index()
+        get_facet_service()
+        get_suggest_service()
+        get_similarity_service()
+        get_retrieval_service()
+        get_app_graph()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+
+async def _sweep_reservations():
+    """Periodically releases stock held by abandoned checkouts."""
+    from app.services.inventory_service import get_inventory_service
+
+    while True:
+        await asyncio.sleep(settings.INVENTORY_SWEEP_INTERVAL)
+        # Only once checkout/orders have created the engine; never force it from here
+        if get_inventory_service.is_initialized():
+            expired = get_inventory_service().expire_due()
+            if expired:
+                print(f"Released {expired} expired stock reservations")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(_warm_up))
+    sweeper_task = asyncio.create_task(_sweep_reservations())
+    from app.services.task_queue import get_task_queue
+    await get_task_queue().start()
+
+    yield
+
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    sweeper_task.cancel()
+    # Follow-up work queued by the last requests runs before the services it needs close
+    await get_task_queue().stop()
+
+    from app.services.stripe_service import get_stripe_service
+    if get_stripe_service.is_initialized():
+        get_stripe_service().shutdown()
+
+    from app.services.inventory_service import get_inventory_service
+    if get_inventory_service.is_initialized():
+        get_inventory_service().close()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -0,0 +1,356 @@
+"""
+Analytics
+Streaming counters of product views and searches. They are cheap enough to
+record on every storefront request, and memory stays bounded whatever the
+traffic:
+
+    global   views per product and searches per query in a count-min sketch,
+             plus the top ANALYTICS_TOP_K of each (heavy hitters: keys whose
+             sketch estimate beats the smallest one tracked)
+    subject  per session and per user, a Space-Saving summary of the
+             ANALYTICS_SUBJECT_TOP_K products viewed and queries searched most,
+             for the ANALYTICS_MAX_SUBJECTS most recently active subjects
+
+Counts cover a sliding window of ANALYTICS_WINDOW seconds, approximated the
+way sliding-window rate limiters do it: each counter keeps the current and the
+previous window, and a count is current + previous * (the share of the
+previous window still inside the sliding one).
+
+Recording only touches dicts. Global events are buffered, and the sketch is
+updated in vectorized batches. Counts are per worker process: each worker sees
+the traffic it serves, which is enough to notice a session that keeps coming
+back to a product (see retention_candidate).
+"""
+
+import heapq
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+
+FLUSH_EVENTS = 4096  # buffered global events per sketch update
+MAX_QUERY_LENGTH = 100
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACES.sub(" ", query.strip().lower())[:MAX_QUERY_LENGTH]
+
+
+class CountMinSketch:
+    """
+    Approximate counts for any number of keys in depth x width counters. An
+    estimate never undercounts, and it overcounts by at most e/width of the
+    total with probability 1 - e^-depth. Keys are fed as 64-bit hashes.
+    """
+
+    def __init__(self, width: int = 1 << 16, depth: int = 4, seed: int = 0):
+        import numpy as np
+
+        if width & (width - 1):
+            raise ValueError("width must be a power of two")
+        self.width, self.depth = width, depth
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        # Multiply-shift hashing: one odd multiplier per row
+        self._multipliers = np.random.default_rng(seed).integers(1, 2**63, size=(depth, 1), dtype=np.uint64) * 2 + 1
+        self._shift = np.uint64(64 - (width.bit_length() - 1))
+
+    def _columns(self, hashes):
+        import numpy as np
+
+        keys = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+        return (keys[None, :] * self._multipliers) >> self._shift
+
+    def add(self, hashes, counts=None):
+        import numpy as np
+
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns, weights=counts, minlength=self.width).astype(np.uint32)
+
+    def estimate(self, hashes):
+        import numpy as np
+
+        columns = self._columns(hashes)
+        return np.min(self.table[np.arange(self.depth)[:, None], columns], axis=0)
+
+    def clear(self):
+        self.table.fill(0)
+
+
+class SpaceSaving:
+    """
+    Top-k heavy hitters in k entries (Metwally et al.). A key that doesn't fit
+    takes over the smallest entry and inherits its count as `error`, so a
+    count is an overestimate by at most its error. Every key with more than
+    total/k occurrences is guaranteed to be present.
+    """
+
+    __slots__ = ("capacity", "entries")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: Dict[str, List[int]] = {}  # key -> [count, error]
+
+    def add(self, key: str, count: int = 1):
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0] += count
+        elif len(self.entries) < self.capacity:
+            self.entries[key] = [count, 0]
+        else:
+            victim = min(self.entries, key=lambda k: self.entries[k][0])
+            floor = self.entries.pop(victim)[0]
+            self.entries[key] = [floor + count, floor]
+
+    def count(self, key: str) -> Tuple[int, int]:
+        return tuple(self.entries.get(key, (0, 0)))
+
+
+class _Windowed:
+    """Space-Saving summaries of the current and previous window, rotated lazily."""
+
+    __slots__ = ("generation", "current", "previous")
+
+    def __init__(self, capacity: int, generation: int):
+        self.generation = generation
+        self.current = SpaceSaving(capacity)
+        self.previous = SpaceSaving(capacity)
+
+    def rotate(self, generation: int):
+        if generation != self.generation:
+            capacity = self.current.capacity
+            self.previous = self.current if generation == self.generation + 1 else SpaceSaving(capacity)
+            self.current = SpaceSaving(capacity)
+            self.generation = generation
+
+    def top(self, weight: float, limit: int) -> List[Tuple[str, float, float]]:
+        """(key, count, guaranteed count) over the sliding window, highest count first."""
+        scores = []
+        for key in self.current.entries.keys() | self.previous.entries.keys():
+            count, error = self.current.count(key)
+            old_count, old_error = self.previous.count(key)
+            total = count + old_count * weight
+            scores.append((key, total, max(0.0, total - error - old_error * weight)))
+        scores.sort(key=lambda item: -item[1])
+        return scores[:limit]
+
+
+class _Subject:
+    __slots__ = ("views", "searches", "offered")
+
+    def __init__(self):
+        self.views: Optional[_Windowed] = None
+        self.searches: Optional[_Windowed] = None
+        self.offered: Dict[str, int] = {}  # product id -> generation of the last retention offer
+
+
+class Analytics:
+    def __init__(
+        self,
+        window: float = 1800.0,
+        sketch_width: int = 1 << 16,
+        sketch_depth: int = 4,
+        top_k: int = 100,
+        subject_top_k: int = 8,
+        max_subjects: int = 20_000,
+    ):
+        self.window = window
+        self.top_k = top_k
+        self.subject_top_k = subject_top_k
+        self.max_subjects = max_subjects
+        self.events = 0
+        self._sketch_size = (sketch_width, sketch_depth)
+        # kind ("view"/"search") -> [current, previous] sketches
+        self._sketches = {kind: [CountMinSketch(sketch_width, sketch_depth), CountMinSketch(sketch_width, sketch_depth)] for kind in ("view", "search")}
+        self._generation = 0
+        self._started = time.monotonic()
+        # kind -> [current, previous] heavy hitters: key -> sketch estimate when last seen
+        self._top: Dict[str, List[Dict[str, int]]] = {kind: [{}, {}] for kind in ("view", "search")}
+        self._pending: Dict[str, List[str]] = {"view": [], "search": []}
+        self._subjects: "OrderedDict[str, _Subject]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ==========================================
+    # Recording (hot path)
+    # ==========================================
+
+    def record_view(self, product_id: str, session_id: Optional[str] = None, user_id: Optional[str] = None):
+        self._record("view", product_id, session_id, user_id)
+
+    def record_search(self, query: str, session_id: Optional[str] = None, user_id: Optional[str] = None):
+        query = normalize_query(query)
+        if query:
+            self._record("search", query, session_id, user_id)
+
+    def _record(self, kind: str, key: str, session_id: Optional[str], user_id: Optional[str]):
+        with self._lock:
+            self._roll(time.monotonic())
+            self.events += 1
+            pending = self._pending[kind]
+            pending.append(key)
+            if len(pending) >= FLUSH_EVENTS:
+                self._flush(kind)
+            for subject_key in self._subject_keys(session_id, user_id):
+                subject = self._subject(subject_key)
+                counters = subject.views if kind == "view" else subject.searches
+                if counters is None:
+                    counters = _Windowed(self.subject_top_k, self._generation)
+                    if kind == "view":
+                        subject.views = counters
+                    else:
+                        subject.searches = counters
+                counters.rotate(self._generation)
+                counters.current.add(key)
+
+    @staticmethod
+    def _subject_keys(session_id: Optional[str], user_id: Optional[str]) -> List[str]:
+        keys = []
+        if session_id:
+            keys.append("s:" + session_id)
+        if user_id:
+            keys.append("u:" + user_id)
+        return keys
+
+    def _subject(self, key: str) -> _Subject:
+        subject = self._subjects.get(key)
+        if subject is None:
+            subject = self._subjects[key] = _Subject()
+            if len(self._subjects) > self.max_subjects:
+                self._subjects.popitem(last=False)  # least recently active
+        else:
+            self._subjects.move_to_end(key)
+        return subject
+
+    def _roll(self, now: float):
+        """Starts a new window once the current one is over (under the lock)."""
+        elapsed = int((now - self._started) // self.window)
+        if elapsed <= 0:
+            return
+        for kind in self._sketches:
+            self._flush(kind)
+            current, previous = self._sketches[kind]
+            previous.clear()
+            if elapsed > 1:
+                current.clear()  # nothing recorded in the previous window either
+            self._sketches[kind] = [previous, current]
+            self._top[kind] = [{}, self._top[kind][0] if elapsed == 1 else {}]
+        self._generation += elapsed
+        self._started += elapsed * self.window
+
+    def _flush(self, kind: str):
+        import numpy as np
+
+        pending = self._pending[kind]
+        if not pending:
+            return
+        counts = Counter(pending)
+        pending.clear()
+        keys = list(counts)
+        hashes = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+        sketch = self._sketches[kind][0]
+        sketch.add(hashes, np.fromiter(counts.values(), dtype=np.float64, count=len(keys)))
+        # Only keys that now beat the smallest heavy hitter are looked at one by one
+        estimates = sketch.estimate(hashes)
+        top = self._top[kind][0]
+        floor = min(top.values()) if len(top) >= self.top_k else 0
+        for i in np.flatnonzero(estimates > floor):
+            top[keys[i]] = int(estimates[i])
+        if len(top) > 2 * self.top_k:
+            self._top[kind][0] = dict(heapq.nlargest(self.top_k, top.items(), key=itemgetter(1)))
+
+    # ==========================================
+    # Queries
+    # ==========================================
+
+    def _weight(self) -> float:
+        """Share of the previous window still inside the sliding one."""
+        return max(0.0, 1.0 - (time.monotonic() - self._started) / self.window)
+
+    def _estimate(self, kind: str, keys: List[str]):
+        import numpy as np
+
+        hashes = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+        current, previous = self._sketches[kind]
+        return current.estimate(hashes) + previous.estimate(hashes) * self._weight()
+
+    def counts(self, kind: str, keys: List[str]) -> List[float]:
+        """Estimated views (or searches) of each key over the sliding window, across all traffic."""
+        if kind == "search":
+            keys = [normalize_query(key) for key in keys]
+        with self._lock:
+            self._roll(time.monotonic())
+            self._flush(kind)
+            return [float(value) for value in self._estimate(kind, keys)]
+
+    def trending(self, kind: str = "view", limit: int = 10) -> List[Tuple[str, float]]:
+        """Most viewed products (or searched queries) over the sliding window."""
+        with self._lock:
+            self._roll(time.monotonic())
+            self._flush(kind)
+            current, previous = self._top[kind]
+            keys = list(current.keys() | previous.keys())
+            ranked = sorted(zip(keys, self._estimate(kind, keys)), key=itemgetter(1), reverse=True)
+        return [(key, round(float(count), 1)) for key, count in ranked[:limit]]
+
+    def subject_top(self, kind: str, session_id: Optional[str] = None, user_id: Optional[str] = None, limit: int = 5):
+        """(key, count, guaranteed count) a session's (or user's) most viewed products or searched queries."""
+        with self._lock:
+            self._roll(time.monotonic())
+            for subject_key in self._subject_keys(session_id, user_id):
+                subject = self._subjects.get(subject_key)
+                counters = subject and (subject.views if kind == "view" else subject.searches)
+                if counters:
+                    counters.rotate(self._generation)
+                    return counters.top(self._weight(), limit)
+        return []
+
+    def retention_candidate(self, session_id: str, user_id: Optional[str] = None, threshold: int = 3) -> Optional[Tuple[str, int]]:
+        """
+        The product this session (else user) has viewed at least `threshold` times in
+        the window, counting only guaranteed views, and hasn't been offered a deal on
+        in this window. Marks it offered, so each product is offered once per window.
+        """
+        with self._lock:
+            self._roll(time.monotonic())
+            weight = self._weight()
+            for subject_key in self._subject_keys(session_id, user_id):
+                subject = self._subjects.get(subject_key)
+                if subject is None or subject.views is None:
+                    continue
+                subject.views.rotate(self._generation)
+                for product_id, _, guaranteed in subject.views.top(weight, self.subject_top_k):
+                    if guaranteed < threshold:
+                        break
+                    if subject.offered.get(product_id, -2) >= self._generation - 1:
+                        continue
+                    subject.offered[product_id] = self._generation
+                    return product_id, int(guaranteed)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        width, depth = self._sketch_size
+        return {
+            "events": self.events,
+            "subjects": len(self._subjects),
+            "window_s": self.window,
+            "sketch_bytes": 2 * len(self._sketches) * width * depth * 4,
+        }
+
+
+# Global instance (per worker), created on the first recorded event
+@lazy_singleton
+def get_analytics() -> Analytics:
+    settings = get_settings()
+    return Analytics(
+        window=settings.ANALYTICS_WINDOW,
+        sketch_width=settings.ANALYTICS_SKETCH_WIDTH,
+        sketch_depth=settings.ANALYTICS_SKETCH_DEPTH,
+        top_k=settings.ANALYTICS_TOP_K,
+        subject_top_k=settings.ANALYTICS_SUBJECT_TOP_K,
+        max_subjects=settings.ANALYTICS_MAX_SUBJECTS,
+    )
@@ -0,0 +1,373 @@
+"""
+Catalog Segments
+Incremental catalog updates on top of the read-only snapshot. The snapshot is
+compiled from the JSON sources and never edited in place, so a bulk import (see
+catalog_sync) publishes each batch as an immutable segment file in the same
+format, holding the batch's products plus the ids it deletes:
+
+    <RUNTIME_DIR>/segments/manifest.json    {"segments": [name, ...]}, oldest first
+    <RUNTIME_DIR>/segments/<name>.bin       products + deleted tables
+    <RUNTIME_DIR>/segments/<name>.search.*  derived indexes (search, vectors), built once per host
+
+Readers see one catalog made of parts: the base snapshot, then every segment in
+manifest order. Global product rows number the base rows first, then each
+segment's rows, so every part keeps its own derived indexes (search, facets,
+vectors) over local rows and results are shifted by the part's start. The
+newest part that mentions a product id wins: older rows with that id, and rows
+whose id a newer segment deletes, are dead and masked out of every read by the
+part's `live` mask.
+
+Workers notice new segments by a stat of the manifest, so imports show up
+everywhere without a rebuild or restart; only the new segment's ids are checked
+against older parts. Small recent segments are merged once there are more than
+CATALOG_MAX_SEGMENTS, and `scripts/catalog_sync.py compact` folds the overlay
+back into the JSON sources at deploy time.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.catalog_store import CATALOG_TABLES, STR, SharedCatalog, build_lock, write_snapshot
+
+BASE = "base"
+_, _, PRODUCT_COLUMNS, PRODUCT_INDEXED = CATALOG_TABLES["products.json"]
+DELETED_COLUMNS = [("id", STR)]
+
+
+def _stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # The manifest is replaced, never rewritten, so the inode changes with every update
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_manifest(path: str) -> List[str]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)["segments"]
+    except FileNotFoundError:
+        return []
+
+
+def write_manifest(path: str, names: List[str]):
+    with open(path + ".tmp", "w") as f:
+        json.dump({"segments": names}, f)
+    os.replace(path + ".tmp", path)
+
+
+class _IndexCache:
+    """Derived indexes of one part, built on first use; survives the part being re-numbered."""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.RLock()  # a facet index builds the part's search index first
+
+    def get(self, name: str, build: Callable):
+        item = self._items.get(name)
+        if item is None:
+            with self._lock:
+                item = self._items.get(name)
+                if item is None:
+                    item = self._items[name] = build()
+        return item
+
+
+class CatalogPart:
+    """
+    The base snapshot or one segment, placed at `start` in the global row space.
+    `live` is a bool mask of rows no newer part supersedes (None = all of them).
+    Parts are replaced, not mutated, when the segment set changes.
+    """
+
+    def __init__(self, name: str, catalog: SharedCatalog, start: int, live=None, cache: Optional[_IndexCache] = None):
+        self.name = name
+        self.catalog = catalog
+        self.products = catalog.tables["products"]
+        self.start = start
+        self.size = len(self.products)
+        self.live = live
+        self.live_count = self.size if live is None else int(live.sum())
+        self._cache = cache or _IndexCache()
+
+    @property
+    def is_base(self) -> bool:
+        return self.name == BASE
+
+    def moved(self, start: int, live=None) -> "CatalogPart":
+        return CatalogPart(self.name, self.catalog, start, live, self._cache)
+
+    def is_live(self, row: int) -> bool:
+        return self.live is None or bool(self.live[row])
+
+    def live_rows(self) -> Sequence[int]:
+        if self.live is None:
+            return range(self.size)
+        import numpy as np
+
+        return np.flatnonzero(self.live).tolist()
+
+    @property
+    def prefix(self) -> str:
+        """Path prefix for the segment's derived index files."""
+        return self.catalog.path[:-len(".bin")]
+
+    def index(self, name: str, build: Callable):
+        return self._cache.get(name, build)
+
+    def search_index(self):
+        """The segment's token index (the base part's is the global get_search_index())."""
+        from app.services.search_index import SearchIndex
+
+        return self.index("search", lambda: SearchIndex(self.catalog, self.prefix + ".search"))
+
+    def suggest_index(self):
+        """The segment's autocomplete index (the base part's is the global get_suggest_service())."""
+        from app.services.suggest_service import SuggestIndex
+
+        return self.index("suggest", lambda: SuggestIndex(self.catalog, self.prefix + ".suggest"))
+
+
+class CatalogSegments:
+    def __init__(self, base: SharedCatalog, directory: str, segment_rows: int = 20_000, max_segments: int = 16):
+        self.base = base
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self.parts: List[CatalogPart] = [CatalogPart(BASE, base, 0)]
+        self.version = 0
+        self._names: List[str] = []
+        self._stamp = None
+        # Overlay product id -> global row of its live version (None once deleted); only
+        # ids some segment mentions are here, so it grows with the overlay, not the catalog
+        self._owners: Dict[bytes, Optional[int]] = {}
+        self._listeners: List[Callable[[Dict[str, int]], None]] = []
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".bin")
+
+    # ==========================================
+    # Read side
+    # ==========================================
+
+    def subscribe(self, listener: Callable[[Dict[str, int]], None]):
+        """Calls listener({product_id: stock}) with the products each refresh brings in."""
+        self._listeners.append(listener)
+
+    def refresh(self) -> bool:
+        """Picks up segments published since the last call; a single stat when nothing changed."""
+        stamp = _stamp(self.manifest_path)
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            names = read_manifest(self.manifest_path)
+            try:
+                if names[:len(self._names)] == self._names:
+                    changed = self._extend(self.parts, names[len(self._names):], self._owners)
+                else:
+                    # Segments were merged: renumber everything
+                    changed = self._extend([self.parts[0].moved(0)], names, {})
+            except (OSError, ValueError) as e:
+                # A segment was merged away between reading the manifest and mapping it; retry next time
+                print(f"Error loading catalog segments: {e}")
+                return False
+            self._names = names
+            self._stamp = stamp
+            self.version += 1
+        for listener in self._listeners:
+            listener(changed)
+        return True
+
+    def _extend(self, parts: List[CatalogPart], names: List[str], owners: Dict[bytes, Optional[int]]) -> Dict[str, int]:
+        """Appends segments after `parts`; only their ids need checking against the parts before them."""
+        import numpy as np
+
+        known = {part.name: part for part in self.parts}
+        start = parts[-1].start + parts[-1].size
+        new_parts = []
+        for name in names:
+            part = known[name].moved(start) if name in known else CatalogPart(name, SharedCatalog.attach(self._file(name)), start)
+            new_parts.append(part)
+            start += part.size
+
+        parts = parts + new_parts
+        starts = [part.start for part in parts]
+        dead: Dict[int, List[int]] = {}
+        changed: Dict[str, int] = {}
+        # (part, ids written, ids deleted) per new segment
+        writes = [
+            (part, part.products.columns["id"].raw_all(), part.catalog.tables["deleted"].columns["id"].raw_all())
+            for part in new_parts
+        ]
+
+        # Ids the overlay mentions for the first time supersede their base rows, found in one batch
+        fresh = list({key: None for _, ids, deleted in writes for key in (*ids, *deleted) if key not in owners})
+        for rows in self.base.tables["products"].indexes["id"].find_many(fresh):
+            if rows:
+                dead.setdefault(0, []).extend(rows)
+
+        def supersede(key: bytes):
+            row = owners.get(key)
+            if row is not None:
+                position = bisect_right(starts, row) - 1
+                dead.setdefault(position, []).append(row - starts[position])
+
+        for part, ids, deleted in writes:
+            stock = part.products.columns["stock"].values
+            for row, key in enumerate(ids):
+                supersede(key)
+                owners[key] = part.start + row
+                changed[key.decode()] = stock[row]
+            for key in deleted:
+                supersede(key)
+                owners[key] = None
+
+        for position, rows in dead.items():
+            part = parts[position]
+            live = np.ones(part.size, dtype=bool) if part.live is None else part.live.copy()
+            live[rows] = False
+            parts[position] = part.moved(part.start, live)
+        self.parts = parts
+        self._owners = owners
+        return changed
+
+    def current(self) -> List[CatalogPart]:
+        self.refresh()
+        return self.parts
+
+    def find(self, field: str, key: str) -> Optional[Tuple[CatalogPart, int]]:
+        """The live product whose indexed `field` equals key, newest part first."""
+        for part in reversed(self.current()):
+            for row in part.products.find_all(field, key):
+                if part.is_live(row):
+                    return part, row
+        return None
+
+    def find_all(self, field: str, key: str) -> Iterator[Tuple[CatalogPart, int]]:
+        for part in self.current():
+            for row in part.products.find_all(field, key):
+                if part.is_live(row):
+                    yield part, row
+
+    def at(self, rows: Sequence[int]) -> Iterator[Tuple[CatalogPart, int]]:
+        """(part, local row) of each global row, as returned by the search/facet indexes."""
+        parts = self.parts
+        starts = [part.start for part in parts]
+        for row in rows:
+            part = parts[bisect_right(starts, row) - 1]
+            yield part, row - part.start
+
+    def live_rows(self) -> Iterator[Tuple[CatalogPart, int]]:
+        for part in self.current():
+            for row in part.live_rows():
+                yield part, row
+
+    def changes(self, names: Optional[Sequence[str]] = None) -> Tuple[List[Dict], List[str]]:
+        """
+        Live product records and still-deleted ids of the named segments (every
+        segment by default), for indexes that apply imports to the snapshot's
+        version incrementally. Records a newer segment supersedes are left out,
+        so applying segments out of order can't bring an old version back.
+        """
+        products, deleted = [], []
+        for part in self.current()[1:]:
+            if names is not None and part.name not in names:
+                continue
+            products.extend(part.products.row(row) for row in part.live_rows())
+            ids = part.catalog.tables["deleted"].columns["id"]
+            deleted.extend(pid for pid in (ids.get(i) for i in range(len(ids))) if self.find("id", pid) is None)
+        return products, deleted
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.parts) - 1
+
+    # ==========================================
+    # Write side (importers, compaction)
+    # ==========================================
+
+    def _write(self, name: str, products: List[Dict], deleted: Sequence[str]):
+        write_snapshot(self._file(name), [
+            ("products", PRODUCT_COLUMNS, PRODUCT_INDEXED, products),
+            ("deleted", DELETED_COLUMNS, ["id"], [{"id": product_id} for product_id in deleted]),
+        ], hashlib.sha256(name.encode()).digest())
+
+    def append(self, products: List[Dict], deleted: Sequence[str]) -> str:
+        """
+        Publishes a segment of validated product records (unique ids) and deleted
+        ids, merging the newest small segments if there are now too many.
+        Returns the name of the segment now holding these records.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._write(name, products, deleted)
+        removed = []
+        with build_lock(self.manifest_path):
+            names = read_manifest(self.manifest_path) + [name]
+            if len(names) > self.max_segments:
+                names, removed = self._merge_tail(names)
+            write_manifest(self.manifest_path, names)
+        self._remove(removed)
+        self.refresh()
+        return names[-1]
+
+    def _merge_tail(self, names: List[str]) -> Tuple[List[str], List[str]]:
+        """Folds the newest run of segments holding at most segment_rows records into one."""
+        run, rows = [], 0
+        for name in reversed(names):
+            size = len(SharedCatalog.attach(self._file(name)).tables["products"])
+            if run and rows + size > self.segment_rows:
+                break
+            run.insert(0, name)
+            rows += size
+        if len(run) < 2:
+            print(f"Catalog has {len(names)} segments; run scripts/catalog_sync.py compact to fold them into the catalog")
+            return names, []
+
+        records: Dict[str, Optional[Dict]] = {}  # latest write of each id, in write order
+        for name in run:
+            segment = SharedCatalog.attach(self._file(name))
+            products = segment.tables["products"]
+            for row in range(len(products)):
+                record = products.row(row)
+                records.pop(record["id"], None)
+                records[record["id"]] = record
+            deleted = segment.tables["deleted"].columns["id"]
+            for i in range(len(deleted)):
+                records.pop(deleted.get(i), None)
+                records[deleted.get(i)] = None
+        merged = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._write(
+            merged,
+            [record for record in records.values() if record is not None],
+            [product_id for product_id, record in records.items() if record is None],
+        )
+        return names[:-len(run)] + [merged], run
+
+    def _remove(self, names: Sequence[str]):
+        # Workers that still map a removed file keep reading it until they refresh
+        prefixes = tuple(name + "." for name in names)
+        if not prefixes:
+            return
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefixes):
+                os.remove(os.path.join(self.directory, filename))
+
+    def clear(self):
+        """Drops every segment (after compaction has folded them into the sources)."""
+        with build_lock(self.manifest_path):
+            names = read_manifest(self.manifest_path)
+            write_manifest(self.manifest_path, [])
+        self._remove(names)
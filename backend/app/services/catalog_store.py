@@ -0,0 +1,413 @@
+"""
+Shared Catalog Store
+Compiles the read-only catalog JSON (products, categories, users) into a
+versioned binary snapshot that every worker memory-maps. The OS page cache
+backs all mappings, so N uvicorn workers share one copy of the catalog, and
+attaching costs the same at 50 products as at 1M: nothing is parsed until a
+record is actually read.
+
+File layout (little-endian, every section 8-byte aligned):
+    header     magic(8) | version u32 | section_count u32 | signature(32)
+    directory  section_count x [name(48) | kind u32 | count u64 | pos u64]
+    sections   one per column ("<table>.<field>") or key index ("<table>.<field>#index")
+
+Column encodings:
+    f64 / i64  count fixed-width values
+    str        (count + 1) u64 offsets, then the UTF-8 string table
+    opt_str    count presence bytes (padded), then a str column
+    str_list   (count + 1) u64 item offsets, then a str column of all items
+    json       opt_str holding JSON text, for nested or rarely-read fields
+    index      count u32 row ids sorted by the indexed str column
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from app.core.models import Category, Product, User
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds still publish atomically via os.replace
+    fcntl = None
+
+MAGIC = b"TMCATLG\0"
+VERSION = 2
+
+_HEADER = struct.Struct("<8sII32s")
+_DIR_ENTRY = struct.Struct("<48sIQQ")
+
+F64, I64, STR, OPT_STR, STR_LIST, JSON, INDEX = range(1, 8)
+
+# Source file -> (table, model used to validate at build time, columns, indexed fields)
+CATALOG_TABLES = {
+    "products.json": ("products", Product, [
+        ("id", STR), ("name", STR), ("slug", STR), ("description", STR),
+        ("price", F64), ("currency", STR), ("category_id", STR), ("stock", I64),
+        ("images", STR_LIST), ("features", STR_LIST), ("rating", F64),
+        ("reviews_count", I64), ("ai_tags", STR_LIST),
+        ("model_3d_url", OPT_STR), ("spatial_metadata", JSON),
+    ], ["id", "slug", "category_id"]),
+    "categories.json": ("categories", Category, [
+        ("id", STR), ("name", STR), ("slug", STR), ("description", STR), ("image", OPT_STR),
+    ], ["id", "slug"]),
+    "users.json": ("users", User, [
+        ("id", STR), ("name", STR), ("email", STR), ("role", STR), ("preferences", JSON),
+    ], ["id"]),
+}
+
+
+def source_signature(data_dir: str) -> bytes:
+    """Changes whenever a catalog source file or the snapshot schema changes."""
+    digest = hashlib.sha256(f"v{VERSION}".encode())
+    for filename in sorted(CATALOG_TABLES):
+        table, _, columns, indexed = CATALOG_TABLES[filename]
+        digest.update(repr((table, columns, indexed)).encode())
+        path = os.path.join(data_dir, filename)
+        stat = os.stat(path) if os.path.exists(path) else None
+        digest.update(f"{filename}:{stat.st_size if stat else -1}:{stat.st_mtime_ns if stat else -1};".encode())
+    return digest.digest()
+
+
+# ==========================================
+# Build
+# ==========================================
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def _encode_str(values: Sequence[str]) -> bytes:
+    blobs = [v.encode() for v in values]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return _pad(struct.pack(f"<{len(offsets)}Q", *offsets) + b"".join(blobs))
+
+
+def _encode_opt_str(values: Sequence[Optional[str]]) -> bytes:
+    presence = bytes(0 if v is None else 1 for v in values)
+    return _pad(presence) + _encode_str(["" if v is None else v for v in values])
+
+
+def _encode_column(kind: int, values: List[Any]) -> bytes:
+    if kind == F64:
+        return struct.pack(f"<{len(values)}d", *values)
+    if kind == I64:
+        return struct.pack(f"<{len(values)}q", *values)
+    if kind == STR:
+        return _encode_str(values)
+    if kind == OPT_STR:
+        return _encode_opt_str(values)
+    if kind == STR_LIST:
+        offsets = [0]
+        for items in values:
+            offsets.append(offsets[-1] + len(items))
+        return struct.pack(f"<{len(offsets)}Q", *offsets) + _encode_str([item for items in values for item in items])
+    if kind == JSON:
+        return _encode_opt_str([None if v is None else json.dumps(v) for v in values])
+    raise ValueError(f"Unknown column kind {kind}")
+
+
+def _encode_index(values: Sequence[str]) -> bytes:
+    encoded = [v.encode() for v in values]
+    order = sorted(range(len(values)), key=lambda i: encoded[i])
+    return _pad(struct.pack(f"<{len(order)}I", *order))
+
+
+def write_snapshot(out_path: str, tables, signature: bytes):
+    """
+    Encodes tables given as (name, columns, indexed fields, rows) into the
+    snapshot format and publishes the file atomically. Rows are plain dicts
+    that must already be valid.
+    """
+    sections = []  # (name, kind, count, payload)
+    for table, columns, indexed, rows in tables:
+        for field, kind in columns:
+            values = [r[field] for r in rows]
+            sections.append((f"{table}.{field}", kind, len(rows), _encode_column(kind, values)))
+            if field in indexed:
+                sections.append((f"{table}.{field}#index", INDEX, len(rows), _encode_index(values)))
+
+    position = _HEADER.size + _DIR_ENTRY.size * len(sections)
+    position += -position % 8
+    directory = []
+    for name, kind, count, payload in sections:
+        directory.append(_DIR_ENTRY.pack(name.encode(), kind, count, position))
+        position += len(payload)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_pad(_HEADER.pack(MAGIC, VERSION, len(sections), signature) + b"".join(directory)))
+        for _, _, _, payload in sections:
+            f.write(payload)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, out_path)
+
+
+def compile_catalog(data_dir: str, out_path: str):
+    """
+    Builds the snapshot from the JSON sources and publishes it atomically.
+    Records are validated against the API models here, once, so readers can
+    trust the snapshot.
+    """
+    tables = []
+    for filename, (table, model, columns, indexed) in CATALOG_TABLES.items():
+        path = os.path.join(data_dir, filename)
+        rows = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                rows = [model(**r).model_dump(mode="json") for r in json.load(f)]
+        tables.append((table, columns, indexed, rows))
+    write_snapshot(out_path, tables, source_signature(data_dir))
+
+
+@contextmanager
+def build_lock(path: str):
+    """Cross-process lock so only one worker compiles while the others wait."""
+    with open(path + ".lock", "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ==========================================
+# Read
+# ==========================================
+
+class StrColumn:
+    """String table view: values are decoded from the mapping on access."""
+
+    def __init__(self, buf: memoryview, count: int, pos: int):
+        self._buf = buf
+        self._count = count
+        self._offsets = buf[pos:pos + 8 * (count + 1)].cast("Q")
+        self._data_pos = pos + 8 * (count + 1)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self._buf[self._data_pos + self._offsets[i]:self._data_pos + self._offsets[i + 1]])
+
+    def get(self, i: int) -> str:
+        return self.raw(i).decode()
+
+    def raw_all(self) -> List[bytes]:
+        """Every value as bytes in row order, in one pass over the string table."""
+        blob = bytes(self._buf[self._data_pos:self._data_pos + self._offsets[self._count]])
+        offsets = self._offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]] for i in range(self._count)]
+
+
+class OptStrColumn:
+    def __init__(self, buf: memoryview, count: int, pos: int):
+        self._presence = buf[pos:pos + count]
+        self._values = StrColumn(buf, count, pos + count + (-count % 8))
+
+    def get(self, i: int) -> Optional[str]:
+        return self._values.get(i) if self._presence[i] else None
+
+
+class JsonColumn(OptStrColumn):
+    def get(self, i: int) -> Any:
+        text = super().get(i)
+        return None if text is None else json.loads(text)
+
+
+class StrListColumn:
+    def __init__(self, buf: memoryview, count: int, pos: int):
+        self._offsets = buf[pos:pos + 8 * (count + 1)].cast("Q")
+        self._items = StrColumn(buf, self._offsets[count], pos + 8 * (count + 1))
+
+    def get(self, i: int) -> List[str]:
+        return [self._items.get(j) for j in range(self._offsets[i], self._offsets[i + 1])]
+
+
+class FixedColumn:
+    """f64/i64 column; `values` is a zero-copy memoryview usable by array libraries."""
+
+    def __init__(self, buf: memoryview, count: int, pos: int, fmt: str):
+        self.values = buf[pos:pos + 8 * count].cast(fmt)
+
+    def get(self, i: int):
+        return self.values[i]
+
+
+class KeyIndex:
+    """Row ids sorted by a str column, searched in place with bisect."""
+
+    # Key bytes kept per entry by find_many's vectorized search
+    PREFIX_BYTES = 16
+
+    def __init__(self, column: StrColumn, buf: memoryview, count: int, pos: int):
+        self._column = column
+        self._count = count
+        self._ids = buf[pos:pos + 4 * count].cast("I")
+        self._prefixes = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._column.raw(self._ids[i])
+
+    def find_all(self, key: str) -> List[int]:
+        """Row ids for every entry equal to key, in row order."""
+        needle = key.encode()
+        lo = bisect_left(self, needle)
+        hi = bisect_right(self, needle, lo)
+        return sorted(self._ids[lo:hi].tolist())
+
+    def find(self, key: str) -> Optional[int]:
+        ids = self.find_all(key)
+        return ids[0] if ids else None
+
+    def _sorted_prefixes(self):
+        """First PREFIX_BYTES of every key in index order, as a numpy S array (built once)."""
+        if self._prefixes is None:
+            import numpy as np
+
+            column, width = self._column, self.PREFIX_BYTES
+            offsets = np.frombuffer(column._offsets, dtype=np.uint64)
+            ids = np.frombuffer(self._ids, dtype=np.uint32).astype(np.int64)
+            starts = offsets[ids].astype(np.int64)
+            lengths = offsets[ids + 1].astype(np.int64) - starts
+            blob = np.frombuffer(column._buf, dtype=np.uint8, count=int(offsets[-1]), offset=column._data_pos)
+            gathered = np.zeros((self._count, width), dtype=np.uint8)
+            for j in range(width):
+                has = lengths > j
+                gathered[has, j] = blob[starts[has] + j]
+            self._prefixes = gathered.view(f"S{width}").ravel()
+        return self._prefixes
+
+    def find_many(self, keys: Sequence[bytes]) -> List[List[int]]:
+        """find_all for a batch of (encoded) keys: one vectorized search instead of a bisect each."""
+        import numpy as np
+
+        if not keys or not self._count:
+            return [[] for _ in keys]
+        width = self.PREFIX_BYTES
+        prefixes = self._sorted_prefixes()
+        probe = np.array([key[:width] for key in keys], dtype=f"S{width}")
+        lo = np.searchsorted(prefixes, probe, side="left").tolist()
+        hi = np.searchsorted(prefixes, probe, side="right").tolist()
+        # A shorter key matching a prefix is an exact match (keys have no NUL bytes); longer ones are checked
+        return [
+            sorted(self._ids[i] for i in range(a, b) if len(key) < width or self[i] == key)
+            for key, a, b in zip(keys, lo, hi)
+        ]
+
+
+class ColumnTable:
+    """One catalog table: named columns plus key indexes, all views into the mapping."""
+
+    def __init__(self, name: str, count: int):
+        self.name = name
+        self.count = count
+        self.columns: Dict[str, Any] = {}
+        self.indexes: Dict[str, KeyIndex] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {field: column.get(i) for field, column in self.columns.items()}
+
+    def find(self, field: str, key: str) -> Optional[int]:
+        return self.indexes[field].find(key)
+
+    def find_all(self, field: str, key: str) -> List[int]:
+        return self.indexes[field].find_all(key)
+
+
+_READERS = {
+    STR: StrColumn,
+    OPT_STR: OptStrColumn,
+    JSON: JsonColumn,
+    STR_LIST: StrListColumn,
+    F64: lambda buf, count, pos: FixedColumn(buf, count, pos, "d"),
+    I64: lambda buf, count, pos: FixedColumn(buf, count, pos, "q"),
+}
+
+
+class SharedCatalog:
+    """
+    Attaches to (building if needed) the memory-mapped catalog snapshot.
+    Tables are accessed by name, e.g. catalog.tables["products"].
+    """
+
+    def __init__(self, data_dir: str, path: str):
+        self.data_dir = data_dir
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._ensure_compiled()
+        self._attach()
+
+    @classmethod
+    def attach(cls, path: str) -> "SharedCatalog":
+        """Maps an existing snapshot file as-is, with no source checks (e.g. a catalog segment)."""
+        catalog = cls.__new__(cls)
+        catalog.data_dir = None
+        catalog.path = path
+        catalog._attach()
+        return catalog
+
+    def _is_current(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, _, signature = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return magic == MAGIC and version == VERSION and signature == source_signature(self.data_dir)
+
+    def _ensure_compiled(self):
+        if self._is_current():
+            return
+        with build_lock(self.path):
+            # Another worker may have finished the build while we waited
+            if not self._is_current():
+                compile_catalog(self.data_dir, self.path)
+
+    def _attach(self):
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        _, _, section_count, self.signature = _HEADER.unpack_from(buf, 0)
+        self.tables: Dict[str, ColumnTable] = {}
+        for n in range(section_count):
+            name, kind, count, pos = _DIR_ENTRY.unpack_from(buf, _HEADER.size + n * _DIR_ENTRY.size)
+            table_name, field = name.rstrip(b"\0").decode().split(".", 1)
+            table = self.tables.setdefault(table_name, ColumnTable(table_name, count))
+            if kind == INDEX:
+                field = field.split("#", 1)[0]
+                table.indexes[field] = KeyIndex(table.columns[field], buf, count, pos)
+            else:
+                table.columns[field] = _READERS[kind](buf, count, pos)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._mmap)
+
+    def refresh(self) -> bool:
+        """Re-attaches if the sources changed since this worker mapped the file."""
+        if self._is_current():
+            return False
+        self._ensure_compiled()
+        self._attach()
+        return True
+
+    def iter_rows(self, table: str) -> Iterator[Dict[str, Any]]:
+        columns = self.tables[table]
+        for i in range(len(columns)):
+            yield columns.row(i)
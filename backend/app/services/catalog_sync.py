@@ -0,0 +1,214 @@
+"""
+Catalog Sync
+Streaming NDJSON (one JSON object per line) export and import of products and
+orders, for bulk syncs with external systems such as a PIM.
+
+Exports read straight from the catalog snapshot/segments and the order
+database and are encoded a batch of lines at a time, so memory stays flat
+whatever the size.
+
+Imports are validated in chunks of CATALOG_IMPORT_CHUNK_SIZE lines against the
+API models. Invalid lines are skipped and reported (line number + error); valid
+ones are applied:
+
+    products  buffered into segments of up to CATALOG_SEGMENT_ROWS products and
+              published with CatalogSegments.append, which every worker picks
+              up on its next request (no rebuild, no restart). A line
+              {"id": "...", "deleted": true} removes a product.
+    orders    inserted one chunk per transaction; ids that already exist are
+              skipped, so re-running an import is safe. Imported orders are
+              history, not checkouts: no stock is reserved for them.
+"""
+
+import json
+from typing import AsyncIterable, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from app.core.models import ImportIssue, ImportResult, Order, Product
+from app.services.task_queue import PRIORITY_LOW, task
+
+IMPORT_ERROR_LIMIT = 100
+EXPORT_BATCH_LINES = 500
+
+
+def ndjson(records: Iterable[Union[str, Dict]], batch_lines: int = EXPORT_BATCH_LINES) -> Iterator[bytes]:
+    """Encodes records (dicts, or JSON text passed through as-is) as NDJSON, a batch of lines per chunk."""
+    batch = []
+    for record in records:
+        batch.append(record if isinstance(record, str) else json.dumps(record, separators=(",", ":")))
+        if len(batch) >= batch_lines:
+            yield ("\n".join(batch) + "\n").encode()
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode()
+
+
+def _describe(error: ValueError) -> str:
+    errors = getattr(error, "errors", None)
+    if not callable(errors):
+        return str(error)
+    details = errors()
+    first = details[0]
+    location = ".".join(str(part) for part in first["loc"]) or "record"
+    more = f" (+{len(details) - 1} more)" if len(details) > 1 else ""
+    return f"{location}: {first['msg']}{more}"
+
+
+class _Importer:
+    """Collects NDJSON lines, validates them a chunk at a time and applies the valid records."""
+
+    def __init__(self, chunk_size: int, dry_run: bool = False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.result = ImportResult()
+        self._pending = []  # (line number, text)
+
+    def add_lines(self, lines: Iterable[Union[str, bytes]]):
+        for line in lines:
+            self.result.lines += 1
+            if line.strip():
+                self._pending.append((self.result.lines, line))
+                if len(self._pending) >= self.chunk_size:
+                    self._flush_chunk()
+
+    def finish(self) -> ImportResult:
+        if self._pending:
+            self._flush_chunk()
+        self._finish()
+        return self.result
+
+    def _flush_chunk(self):
+        chunk, self._pending = self._pending, []
+        valid = []
+        for line_number, line in chunk:
+            try:
+                valid.append(self._parse(line))
+            except ValueError as e:  # bad JSON or a pydantic ValidationError
+                self.result.failed += 1
+                if len(self.result.errors) < IMPORT_ERROR_LIMIT:
+                    self.result.errors.append(ImportIssue(line=line_number, error=_describe(e)))
+        if valid:
+            self._apply(valid)
+
+    def _parse(self, line):
+        raise NotImplementedError
+
+    def _apply(self, records: List):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+
+class ProductImporter(_Importer):
+    def __init__(
+        self,
+        segments,
+        chunk_size: int = 1000,
+        segment_rows: int = 20_000,
+        dry_run: bool = False,
+        on_segment: Optional[Callable[[str], None]] = None,
+    ):
+        super().__init__(chunk_size, dry_run)
+        self.segments = segments
+        self.segment_rows = segment_rows
+        self.on_segment = on_segment
+        # Latest record per id (None = delete) for the segment being filled
+        self._records: Dict[str, Optional[Dict]] = {}
+
+    def _parse(self, line):
+        data = json.loads(line)
+        if isinstance(data, dict) and data.get("deleted") is True:
+            if not isinstance(data.get("id"), str) or not data["id"]:
+                raise ValueError("id: a deleted record needs the product id")
+            return data["id"], None
+        product = Product.model_validate(data)
+        return product.id, product.model_dump(mode="json")
+
+    def _apply(self, records: List):
+        for product_id, record in records:
+            self._records.pop(product_id, None)
+            self._records[product_id] = record
+        if len(self._records) >= self.segment_rows:
+            self._flush_segment()
+
+    def _flush_segment(self):
+        records, self._records = self._records, {}
+        products = [record for record in records.values() if record is not None]
+        deleted = [product_id for product_id, record in records.items() if record is None]
+        self.result.imported += len(products)
+        self.result.deleted += len(deleted)
+        if self.dry_run or not records:
+            return
+        name = self.segments.append(products, deleted)
+        self.result.segments.append(name)
+        if self.on_segment:
+            self.on_segment(name)
+
+    def _finish(self):
+        self._flush_segment()
+
+
+class OrderImporter(_Importer):
+    def __init__(self, data, chunk_size: int = 1000, dry_run: bool = False):
+        super().__init__(chunk_size, dry_run)
+        self.data = data
+
+    def _parse(self, line):
+        return Order.model_validate_json(line)
+
+    def _apply(self, orders: List[Order]):
+        inserted = len(orders) if self.dry_run else self.data.add_orders(orders)
+        self.result.imported += inserted
+        self.result.skipped += len(orders) - inserted
+
+
+async def import_stream(importer: _Importer, chunks: AsyncIterable[bytes]) -> ImportResult:
+    """Feeds a streamed NDJSON body to an importer, a chunk of lines at a time on the thread pool."""
+    from starlette.concurrency import run_in_threadpool
+
+    buffer = b""
+    lines = []
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        lines.extend(complete)
+        if len(lines) >= importer.chunk_size:
+            batch, lines = lines, []
+            await run_in_threadpool(importer.add_lines, batch)
+    if buffer:
+        lines.append(buffer)
+    await run_in_threadpool(importer.add_lines, lines)
+    return await run_in_threadpool(importer.finish)
+
+
+def warm_segment(segments, name: str, similarity=None):
+    """
+    Builds a new segment's search and autocomplete indexes and vectors (all
+    stored next to it), so workers picking the segment up only map files and
+    index the vectors, and applies its products to the similar-products table
+    (the app's own by default).
+    """
+    from app.services.product_service import HashingEmbedder, ProductService, default_embedding_store
+    from app.services.similarity_service import get_similarity_service
+    from app.services.vector_index import VectorIndexConfig
+
+    part = next((p for p in segments.current() if p.name == name), None)
+    if part is None:
+        return
+    if part.size:
+        part.search_index()
+        part.suggest_index()
+        embedder = HashingEmbedder()
+        ProductService(part.catalog, embedder, default_embedding_store(embedder), VectorIndexConfig("flat"), part.prefix + ".vectors")
+    products, deleted = segments.changes([name])
+    (similarity or get_similarity_service()).update(products, deleted)
+
+
+@task("catalog.warm_segment", priority=PRIORITY_LOW)
+def warm_segment_task(name: str):
+    """Background version for API imports (the segment may have been merged away since)."""
+    from app.services.data_service import get_data_service
+
+    segments = get_data_service().segments
+    if segments is not None:
+        warm_segment(segments, name)
@@ -1,82 +1,216 @@
-import json
 import os
-from typing import List, Optional, Dict
-from app.core.models import Product, Category, User, Order
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.core.models import Product, Category, User, Order, OrderSummary, StatusTotals
+from app.services.catalog_segments import CatalogPart, CatalogSegments
+from app.services.catalog_store import SharedCatalog
+from app.services.order_store import OrderStore
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 
 class DataService:
-    def __init__(self):
-        self._products: List[Product] = []
-        self._categories: List[Category] = []
-        self._users: List[User] = []
-        self._orders: List[Order] = []
+    """
+    Catalog reads come from the memory-mapped snapshot (one copy per host,
+    shared by all workers). Lookups and filters work on the snapshot's columns
+    and indexes; a model is only built for records that are actually returned.
+    Products imported since the snapshot was built live in catalog segments
+    layered over it (see catalog_segments), so product reads go through them.
+    Orders live in the cross-process OrderStore.
+    """
+    def __init__(self, data_dir: str = DATA_DIR, runtime_dir: Optional[str] = None):
+        self.data_dir = data_dir
+        self.runtime_dir = runtime_dir or get_settings().RUNTIME_DIR
+        self._catalog: Optional[SharedCatalog] = None
+        self._segments: Optional[CatalogSegments] = None
+        self._orders: Optional[OrderStore] = None
         self._load_data()
 
     def _load_data(self):
-        """Loads data from JSON files."""
+        """Attaches to the shared catalog and order store, building them on first run."""
         try:
-            with open(os.path.join(DATA_DIR, "products.json"), "r") as f:
-                products_data = json.load(f)
-                self._products = [Product(**p) for p in products_data]
-            
-            with open(os.path.join(DATA_DIR, "categories.json"), "r") as f:
-                categories_data = json.load(f)
-                self._categories = [Category(**c) for c in categories_data]
-
-            with open(os.path.join(DATA_DIR, "users.json"), "r") as f:
-                users_data = json.load(f)
-                self._users = [User(**u) for u in users_data]
-                
-            with open(os.path.join(DATA_DIR, "orders.json"), "r") as f:
-                orders_data = json.load(f)
-                self._orders = [Order(**o) for o in orders_data]
-                
+            self._catalog = SharedCatalog(self.data_dir, os.path.join(self.runtime_dir, "catalog.bin"))
+            settings = get_settings()
+            self._segments = CatalogSegments(
+                self._catalog, os.path.join(self.runtime_dir, "segments"),
+                segment_rows=settings.CATALOG_SEGMENT_ROWS, max_segments=settings.CATALOG_MAX_SEGMENTS,
+            )
         except Exception as e:
             print(f"Error loading data: {e}")
-            # Initialize with empty lists if files don't exist or error
-            self._products = []
-            self._categories = []
-            self._users = []
-            self._orders = []
+            self._catalog = None
+            self._segments = None
+        self._orders = OrderStore(
+            os.path.join(self.runtime_dir, "orders.db"),
+            seed_path=os.path.join(self.data_dir, "orders.json"),
+        )
+
+    @property
+    def catalog(self) -> Optional[SharedCatalog]:
+        """The mapped snapshot, for services that build derived indexes from it."""
+        return self._catalog
+
+    @property
+    def segments(self) -> Optional[CatalogSegments]:
+        """Imported product segments layered over the snapshot (bulk imports write here)."""
+        return self._segments
+
+    def catalog_parts(self) -> List[CatalogPart]:
+        """The base snapshot followed by every imported segment, current as of this call."""
+        return self._segments.current() if self._segments else []
+
+    def _materialize(self, table: str, model, ids):
+        if not self._catalog:
+            return []
+        rows = self._catalog.tables[table]
+        return [model.model_validate(rows.row(i)) for i in ids]
+
+    def _lookup(self, table: str, field: str, key: str, model):
+        if not self._catalog:
+            return None
+        rows = self._catalog.tables[table]
+        i = rows.find(field, key)
+        return None if i is None else model.model_validate(rows.row(i))
+
+    def _base_only(self) -> bool:
+        parts = self.catalog_parts()
+        return len(parts) == 1 and parts[0].live is None
+
+    @staticmethod
+    def _products(located) -> List[Product]:
+        return [Product.model_validate(part.products.row(row)) for part, row in located]
+
+    def _lookup_product(self, field: str, key: str) -> Optional[Product]:
+        if not self._catalog:
+            return None
+        if self._base_only():
+            return self._lookup("products", field, key, Product)
+        found = self._segments.find(field, key)
+        return self._products([found])[0] if found else None
 
     def get_products(self, category_slug: Optional[str] = None) -> List[Product]:
+        if not self._catalog:
+            return []
         if category_slug:
             # Find category ID by slug
-            category = next((c for c in self._categories if c.slug == category_slug), None)
+            category = self._lookup("categories", "slug", category_slug, Category)
+            if not category:
+                return []
+            if not self._base_only():
+                return self._products(self._segments.find_all("category_id", category.id))
+            ids = self._catalog.tables["products"].find_all("category_id", category.id)
+            return self._materialize("products", Product, ids)
+        if not self._base_only():
+            return self._products(self._segments.live_rows())
+        return self._materialize("products", Product, range(len(self._catalog.tables["products"])))
+
+    def find_products(
+        self,
+        match: Callable[[Dict[str, Any]], bool],
+        fields: Sequence[str],
+        category_slug: Optional[str] = None,
+        rows: Optional[Sequence[int]] = None,
+    ) -> List[Product]:
+        """
+        Products (every one, a category's, or those at global `rows`) whose `fields`,
+        read straight from the columns, satisfy `match`. Only matches become models,
+        so scanning the whole catalog costs no more memory than the results.
+        """
+        if not self._catalog:
+            return []
+        if rows is not None:
+            located = self._segments.at(rows)
+        elif category_slug:
+            category = self._lookup("categories", "slug", category_slug, Category)
             if not category:
                 return []
-            return [p for p in self._products if p.category_id == category.id]
-        return self._products
+            located = self._segments.find_all("category_id", category.id)
+        else:
+            located = self._segments.live_rows()
+        matched = []
+        for part, row in located:
+            columns = part.products.columns
+            if match({field: columns[field].get(row) for field in fields}):
+                matched.append((part, row))
+        return self._products(matched)
+
+    def filter_by_text(
+        self, query: str, category_slug: Optional[str] = None, rows: Optional[Sequence[int]] = None
+    ) -> List[Product]:
+        """Products whose name, description or a feature contains `query` (case-insensitive), as /products?search= matches."""
+        query = query.lower()
+        return self.find_products(
+            lambda p: query in p["name"].lower()
+            or query in p["description"].lower()
+            or any(query in f.lower() for f in p["features"]),
+            ("name", "description", "features"),
+            category_slug=category_slug,
+            rows=rows,
+        )
+
+    def get_products_at(self, rows: List[int]) -> List[Product]:
+        """Products at the given global rows (as returned by the search/facet indexes)."""
+        if self._segments and self._segments.segment_count:
+            return self._products(self._segments.at(rows))
+        return self._materialize("products", Product, rows)
+
+    def iter_products(self) -> Iterator[Dict[str, Any]]:
+        """Every live product as a plain dict (already validated), one at a time, for streaming exports."""
+        if not self._catalog:
+            return
+        for part, row in self._segments.live_rows():
+            yield part.products.row(row)
+
+    def get_stock_levels(self) -> Dict[str, int]:
+        """Catalog stock per product id, read straight from the snapshot (and segment) columns."""
+        if not self._catalog:
+            return {}
+        levels = {}
+        for part in self.catalog_parts():
+            ids, stock = part.products.columns["id"], part.products.columns["stock"].values
+            for i in part.live_rows():
+                levels[ids.get(i)] = stock[i]
+        return levels
 
     def get_product_by_id(self, product_id: str) -> Optional[Product]:
-        return next((p for p in self._products if p.id == product_id), None)
-    
+        return self._lookup_product("id", product_id)
+
     def get_product_by_slug(self, slug: str) -> Optional[Product]:
-        return next((p for p in self._products if p.slug == slug), None)
+        return self._lookup_product("slug", slug)
 
     def get_categories(self) -> List[Category]:
-        return self._categories
+        if not self._catalog:
+            return []
+        return self._materialize("categories", Category, range(len(self._catalog.tables["categories"])))
 
     def get_user(self, user_id: str) -> Optional[User]:
-        return next((u for u in self._users if u.id == user_id), None)
+        return self._lookup("users", "id", user_id, User)
 
     def get_orders(self, user_id: str) -> List[Order]:
-        return [o for o in self._orders if o.user_id == user_id]
+        return self._orders.list_for_user(user_id)
 
     def create_order(self, order: Order) -> Order:
-        self._orders.append(order)
-        # In a real app, we would write back to the JSON file here
-        self._save_orders()
-        return order
+        # Committed to the shared store, so every worker sees it immediately
+        return self._orders.add(order)
 
-    def _save_orders(self):
-        """Persists orders back to JSON file."""
-        try:
-            with open(os.path.join(DATA_DIR, "orders.json"), "w") as f:
-                json.dump([o.model_dump(mode='json') for o in self._orders], f, indent=2)
-        except Exception as e:
-            print(f"Error saving orders: {e}")
+    def add_orders(self, orders: List[Order]) -> int:
+        """Inserts a batch in one transaction, skipping ids that already exist. Returns how many were new."""
+        return self._orders.add_many(orders)
+
+    def iter_orders_json(self, user_id: Optional[str] = None) -> Iterator[str]:
+        """Stored orders as JSON text, oldest first, read a page at a time."""
+        return self._orders.iter_json(user_id)
+
+    def update_order_status(self, order_id: str, status: str) -> Optional[Order]:
+        return self._orders.update_status(order_id, status)
+
+    def get_order_summary(self, user_id: str) -> OrderSummary:
+        """Counts, spend, latest and open orders for a user, read from maintained aggregates."""
+        return self._orders.user_summary(user_id)
+
+    def get_order_status_summary(self) -> Dict[str, StatusTotals]:
+        return self._orders.status_summary()
 
-# Global instance
-data_service = DataService()
+# Global instance, loaded on first use (or by the startup warm-up)
+@lazy_singleton
+def get_data_service() -> DataService:
+    return DataService()
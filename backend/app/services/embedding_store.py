@@ -0,0 +1,119 @@
+"""
+Embedding Store
+On-disk cache of text embeddings, keyed by embedding model + a content hash of
+the embedded text, so a product is only ever embedded again when its text (or
+the model) changes:
+
+    <path>.<model_id>.json                    manifest (see index_files), signature = model id
+    <path>.<model_id>.<version>.keys.npy      sorted uint64 content hashes
+    <path>.<model_id>.<version>.vectors.npy   float32 vectors, one row per key
+
+Texts that miss the cache are embedded in batches of EMBEDDING_BATCH_SIZE on a
+pool of EMBEDDING_WORKERS threads (a remote embedding API spends its time
+waiting on the network), then merged into the store under the build lock so
+workers never clobber each other's entries. Every save is a new version that
+the manifest switches to, so a worker loading the store while another saves
+always gets keys and vectors that belong together.
+"""
+
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+from app.services.catalog_store import build_lock
+from app.services.index_files import load_arrays, save_arrays
+
+LAYOUT = "1"
+
+
+def content_key(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+class EmbeddingStore:
+    def __init__(self, path: str, embedder, batch_size: int = 256, workers: int = 4):
+        import numpy as np
+
+        self._np = np
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.workers = workers
+        self.path = f"{path}.{re.sub(r'[^A-Za-z0-9._-]', '_', embedder.model_id)}"
+        self.last_embedded = 0  # texts the last embed() call actually sent to the model
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._load()
+
+    def _load(self):
+        np = self._np
+        arrays = load_arrays(self.path, self.embedder.model_id, LAYOUT)
+        if arrays is None:
+            arrays = {"keys": np.zeros(0, dtype=np.uint64), "vectors": np.zeros((0, self.embedder.dim), dtype=np.float32)}
+        self._keys = arrays["keys"]
+        self._vectors = arrays["vectors"]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _positions(self, keys):
+        """Store position of each key and whether it is actually stored there."""
+        np = self._np
+        positions = np.searchsorted(self._keys, keys)
+        found = positions < len(self._keys)
+        found[found] = self._keys[positions[found]] == keys[found]
+        return positions, found
+
+    def _compute(self, texts: Sequence[str]):
+        np = self._np
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.workers <= 1:
+            return np.vstack([self.embedder.embed(batch) for batch in batches])
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed") as pool:
+            return np.vstack(list(pool.map(self.embedder.embed, batches)))
+
+    def embed(self, texts: Sequence[str], prune: bool = False, persist: bool = True) -> "np.ndarray":
+        """
+        Vectors for `texts`, embedding only the ones not stored yet. With
+        `prune`, entries not in `texts` are dropped once they outnumber the
+        live ones (a full catalog rebuild passes every product's text). Without
+        `persist`, misses are embedded but not added: saving rewrites the whole
+        store, which a small catalog segment shouldn't pay for.
+        """
+        np = self._np
+        keys = np.fromiter((content_key(t) for t in texts), dtype=np.uint64, count=len(texts))
+        self.last_embedded = 0
+        live = len(np.unique(keys))
+        positions, found = self._positions(keys)
+        if not persist:
+            vectors = np.zeros((len(texts), self.embedder.dim), dtype=np.float32)
+            vectors[found] = self._vectors[positions[found]]
+            missing = np.flatnonzero(~found)
+            if len(missing):
+                vectors[missing] = self._compute([texts[i] for i in missing])
+                self.last_embedded = len(missing)
+            return vectors
+        if not found.all() or (prune and len(self._keys) > 2 * live):
+            with build_lock(self.path):
+                # Another worker may have stored some of them while we waited
+                self._load()
+                positions, found = self._positions(keys)
+                missing_keys, first = np.unique(keys[~found], return_index=True)
+                missing_texts = [texts[i] for i in np.flatnonzero(~found)[first]]
+                new_vectors = self._compute(missing_texts) if missing_texts else None
+                self.last_embedded = len(missing_texts)
+
+                all_keys, all_vectors = self._keys, self._vectors
+                if prune and len(all_keys) > 2 * live:
+                    keep = np.isin(all_keys, keys)
+                    all_keys, all_vectors = all_keys[keep], all_vectors[keep]
+                if new_vectors is not None:
+                    all_keys = np.concatenate([all_keys, missing_keys])
+                    all_vectors = np.concatenate([all_vectors, new_vectors.astype(np.float32, copy=False)])
+                order = np.argsort(all_keys, kind="stable")
+                save_arrays(self.path, self.embedder.model_id, LAYOUT, {
+                    "keys": all_keys[order], "vectors": all_vectors[order],
+                })
+                self._load()
+                positions, found = self._positions(keys)
+        return np.asarray(self._vectors[positions])
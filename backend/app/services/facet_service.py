@@ -0,0 +1,368 @@
+"""
+Facet Service
+Facet counts (categories, rating buckets, price histogram, in-stock) for any
+combination of category / search / price filters, computed with bitmap
+intersections instead of scans over product models.
+
+Every facet value owns a compressed Bitmap over product rows. Filters become
+bitmaps too (category: the value's bitmap; price range: a vectorized compare on
+the snapshot's price column; search: the token index), and each count is one
+AND + popcount.
+
+Counts follow the usual storefront convention: a facet ignores its own filter,
+so picking a category still shows how many results the other categories would
+have, and the price histogram ignores the price range.
+
+Imported catalog segments (see catalog_segments) get a FacetIndex each;
+CatalogFacets runs a query on every part and sums the counts, and rows that a
+newer part supersedes are masked out of every result via `use_live`.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_singleton
+from app.core.models import FacetValue, PriceBucket, ProductFacets, RatingBucket
+from app.services.catalog_segments import CatalogPart
+from app.services.catalog_store import SharedCatalog
+
+# Lower edges of the rating buckets ("4.5 & up", "4 to 4.5", ...)
+RATING_BUCKETS = (0.0, 3.0, 3.5, 4.0, 4.5)
+# Price histogram edges; the last bucket is open-ended
+PRICE_BUCKETS = (0, 25, 50, 100, 150, 200, 300, 500, 1000)
+
+
+class Bitmap:
+    """
+    Set of product rows out of `size`, stored in whichever form is smaller:
+    sorted uint32 row ids when sparse (under 1 in 32 rows set), packed uint64
+    words otherwise.
+    """
+
+    __slots__ = ("size", "rows", "words")
+
+    def __init__(self, size: int, rows=None, words=None):
+        self.size = size
+        self.rows = rows
+        self.words = words
+
+    @classmethod
+    def from_rows(cls, rows, size: int) -> "Bitmap":
+        import numpy as np
+
+        rows = np.unique(np.asarray(rows, dtype=np.uint32))
+        if len(rows) * 32 < size:
+            return cls(size, rows=rows)
+        mask = np.zeros(size, dtype=bool)
+        mask[rows] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def from_mask(cls, mask) -> "Bitmap":
+        import numpy as np
+
+        size = len(mask)
+        count = int(np.count_nonzero(mask))
+        if count * 32 < size:
+            return cls(size, rows=np.flatnonzero(mask).astype(np.uint32))
+        padded = np.zeros(-(-size // 64) * 64, dtype=bool)
+        padded[:size] = mask
+        return cls(size, words=np.packbits(padded, bitorder="little").view(np.uint64))
+
+    def _contains(self, rows):
+        """Vectorized membership test of `rows` against this (dense) bitmap."""
+        import numpy as np
+
+        rows = rows.astype(np.uint64)
+        return ((self.words[rows >> np.uint64(6)] >> (rows & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        import numpy as np
+
+        if self.rows is not None and other.rows is not None:
+            return Bitmap(self.size, rows=np.intersect1d(self.rows, other.rows, assume_unique=True))
+        if self.rows is not None:
+            return Bitmap(self.size, rows=self.rows[other._contains(self.rows)])
+        if other.rows is not None:
+            return Bitmap(self.size, rows=other.rows[self._contains(other.rows)])
+        return Bitmap(self.size, words=self.words & other.words)
+
+    def count(self) -> int:
+        if self.rows is not None:
+            return len(self.rows)
+        return _popcount(self.words)
+
+    def intersection_count(self, other: "Bitmap") -> int:
+        """|self & other| without materializing the intersection when one side is sparse."""
+        if self.rows is not None and other.words is not None:
+            return int(other._contains(self.rows).sum())
+        if other.rows is not None and self.words is not None:
+            return int(self._contains(other.rows).sum())
+        return (self & other).count()
+
+    def to_mask(self):
+        import numpy as np
+
+        if self.rows is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self.rows] = True
+            return mask
+        return np.unpackbits(self.words.view(np.uint8), bitorder="little")[:self.size].astype(bool)
+
+    def to_bytes(self):
+        """Packed little-endian bits (bit i = row i), the layout faiss.IDSelectorBitmap expects."""
+        import numpy as np
+
+        if self.rows is not None:
+            return np.packbits(self.to_mask(), bitorder="little")
+        return self.words.view(np.uint8)[:-(-self.size // 8)]
+
+    def to_rows(self) -> List[int]:
+        import numpy as np
+
+        if self.rows is not None:
+            return self.rows.tolist()
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder="little")[:self.size]
+        return np.flatnonzero(bits).tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return (self.rows if self.rows is not None else self.words).nbytes
+
+
+def _popcount(words) -> int:
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return int(np.bitwise_count(words).sum())
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return int(table[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+class FacetIndex:
+    def __init__(self, catalog: SharedCatalog, search_index=None, categories=None):
+        import numpy as np
+
+        self._np = np
+        # Search filters use this index (default: the global one); segments have their own
+        self.search_index = search_index
+        products = catalog.tables["products"]
+        self.size = len(products)
+        # Zero-copy views of the snapshot's fixed-width columns
+        self._prices = np.frombuffer(products.columns["price"].values, dtype=np.float64)
+        ratings = np.frombuffer(products.columns["rating"].values, dtype=np.float64)
+        stock = np.frombuffer(products.columns["stock"].values, dtype=np.int64)
+
+        # Segments carry no categories table; theirs come from the base snapshot
+        categories = categories if categories is not None else catalog.tables["categories"]
+        category_index = products.indexes["category_id"]
+        self.categories: Dict[str, Bitmap] = {}
+        self._category_labels: Dict[str, str] = {}
+        for i in range(len(categories)):
+            slug = categories.columns["slug"].get(i)
+            self._category_labels[slug] = categories.columns["name"].get(i)
+            self.categories[slug] = Bitmap.from_rows(
+                category_index.find_all(categories.columns["id"].get(i)), self.size
+            )
+
+        self.ratings = self._bucketize(ratings, RATING_BUCKETS)
+        self.prices = self._bucketize(self._prices, PRICE_BUCKETS)
+        self.in_stock = Bitmap.from_mask(stock > 0)
+        self.all = Bitmap.from_mask(np.ones(self.size, dtype=bool))
+        self.none = Bitmap.from_rows([], self.size)
+        self._live = None
+
+    def use_live(self, live):
+        """
+        Restricts every result to `live` rows (a bool mask, None = all rows), e.g.
+        to hide base products that an imported segment replaced or deleted.
+        """
+        if live is self._live:
+            return
+        self.all = Bitmap.from_mask(self._np.ones(self.size, dtype=bool) if live is None else live)
+        self._live = live
+
+    def _bucketize(self, values, edges: Sequence[float]) -> List[Bitmap]:
+        np = self._np
+        codes = np.digitize(values, edges[1:])
+        return [Bitmap.from_mask(codes == i) for i in range(len(edges))]
+
+    # ==========================================
+    # Filters
+    # ==========================================
+
+    def price_filter(self, min_price: Optional[float], max_price: Optional[float]) -> Optional[Bitmap]:
+        if min_price is None and max_price is None:
+            return None
+        mask = self._np.ones(self.size, dtype=bool)
+        if min_price is not None:
+            mask &= self._prices >= min_price
+        if max_price is not None:
+            mask &= self._prices <= max_price
+        return Bitmap.from_mask(mask)
+
+    def search_filter(self, search: Optional[str]) -> Optional[Bitmap]:
+        if not search:
+            return None
+        search_index = self.search_index
+        if search_index is None:
+            from app.services.search_index import get_search_index
+
+            search_index = get_search_index()
+        mask = search_index.match_mask(search)
+        return None if mask is None else Bitmap.from_mask(mask)
+
+    def category_filter(self, category: Optional[str]) -> Optional[Bitmap]:
+        if not category:
+            return None
+        return self.categories.get(category, self.none)
+
+    def _combine(self, *filters: Optional[Bitmap]) -> Bitmap:
+        result = self.all
+        for f in filters:
+            if f is not None:
+                result = result & f
+        return result
+
+    def filters(
+        self,
+        category: Optional[str] = None,
+        in_stock: bool = False,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Optional[Bitmap]:
+        """Rows passing the given structured filters, or None when nothing (not even liveness) is filtered."""
+        active = [
+            f for f in (
+                self.category_filter(category),
+                self.in_stock if in_stock else None,
+                self.price_filter(min_price, max_price),
+            ) if f is not None
+        ]
+        if not active:
+            return None if self._live is None else self.all
+        return self._combine(*active)
+
+    def match(
+        self,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[int]:
+        """Rows (in catalog order) matching every given filter."""
+        return self._combine(
+            self.category_filter(category), self.search_filter(search), self.price_filter(min_price, max_price)
+        ).to_rows()
+
+    # ==========================================
+    # Facets
+    # ==========================================
+
+    def facets(
+        self,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> ProductFacets:
+        category_filter = self.category_filter(category)
+        search_filter = self.search_filter(search)
+        price_filter = self.price_filter(min_price, max_price)
+
+        # Each facet ignores its own filter
+        without_category = self._combine(search_filter, price_filter)
+        without_price = self._combine(search_filter, category_filter)
+        matching = without_category & category_filter if category_filter is not None else without_category
+
+        return ProductFacets(
+            total=matching.count(),
+            in_stock=matching.intersection_count(self.in_stock),
+            categories=[
+                FacetValue(value=slug, label=self._category_labels[slug], count=without_category.intersection_count(rows))
+                for slug, rows in self.categories.items()
+            ],
+            ratings=[
+                RatingBucket(min_rating=edge, count=matching.intersection_count(rows))
+                for edge, rows in zip(RATING_BUCKETS, self.ratings)
+            ],
+            price_histogram=[
+                PriceBucket(
+                    min_price=edge,
+                    max_price=PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None,
+                    count=without_price.intersection_count(rows),
+                )
+                for i, (edge, rows) in enumerate(zip(PRICE_BUCKETS, self.prices))
+            ],
+        )
+
+    @property
+    def size_bytes(self) -> int:
+        bitmaps = [*self.categories.values(), *self.ratings, *self.prices, self.in_stock, self.all, self.none]
+        return sum(b.nbytes for b in bitmaps)
+
+
+class CatalogFacets:
+    """
+    Facets over the whole catalog: the base snapshot's FacetIndex plus one per
+    imported segment, with results in global rows (see catalog_segments).
+    """
+
+    def __init__(self, base: FacetIndex, data):
+        self.base = base
+        self.data = data
+
+    def shards(self) -> List[Tuple[CatalogPart, FacetIndex]]:
+        """(part, facet index) for every non-empty catalog part, superseded rows masked out."""
+        shards = []
+        for part in self.data.catalog_parts():
+            if not part.size:
+                continue
+            if part.is_base:
+                index = self.base
+            else:
+                categories = self.data.catalog.tables["categories"]
+                index = part.index("facets", lambda part=part: FacetIndex(part.catalog, part.search_index(), categories))
+            index.use_live(part.live)
+            shards.append((part, index))
+        return shards
+
+    def match(self, **filters) -> List[int]:
+        """Global rows (base first, then each segment) matching every given filter."""
+        rows = []
+        for part, index in self.shards():
+            matched = index.match(**filters)
+            rows.extend(matched if part.is_base else [part.start + row for row in matched])
+        return rows
+
+    def facets(self, **filters) -> ProductFacets:
+        results = [index.facets(**filters) for _, index in self.shards()]
+        if len(results) == 1:
+            return results[0]
+        first = results[0]
+        return ProductFacets(
+            total=sum(r.total for r in results),
+            in_stock=sum(r.in_stock for r in results),
+            categories=[
+                FacetValue(value=v.value, label=v.label, count=sum(r.categories[i].count for r in results))
+                for i, v in enumerate(first.categories)
+            ],
+            ratings=[
+                RatingBucket(min_rating=b.min_rating, count=sum(r.ratings[i].count for r in results))
+                for i, b in enumerate(first.ratings)
+            ],
+            price_histogram=[
+                PriceBucket(min_price=b.min_price, max_price=b.max_price, count=sum(r.price_histogram[i].count for r in results))
+                for i, b in enumerate(first.price_histogram)
+            ],
+        )
+
+
+# Global instance, built on first use or by the startup warm-up
+@lazy_singleton
+def get_facet_service() -> CatalogFacets:
+    from app.services.data_service import get_data_service
+
+    data = get_data_service()
+    if data.catalog is None:
+        raise RuntimeError("Catalog snapshot is not available")
+    return CatalogFacets(FacetIndex(data.catalog), data)
@@ -0,0 +1,115 @@
+"""
+Derived Index Files
+Search/facet indexes are derived from the catalog snapshot and stored next to it
+as plain .npy arrays plus a small JSON manifest:
+
+    <path>.json                     {"signature": ..., "layout": ..., "arrays": {name: file}, "meta": ...}
+    <path>.<version>.<array>.npy    one file per array, written once under a fresh version
+
+Arrays are memory-mapped read-only, so every worker shares the same pages, and
+they are rebuilt (once per host, under the snapshot build lock) whenever the
+snapshot signature or the index layout changes.
+
+A save never touches the files the current manifest names: it writes a new
+version and then replaces the manifest, so a reader maps either every old
+array or every new one, never a mix. The previous version is kept for readers
+that read the old manifest just before the switch; older ones are removed.
+"""
+
+import json
+import os
+import re
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.catalog_store import SharedCatalog, build_lock
+
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(path + ".json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _files(manifest: Optional[Dict]) -> List[str]:
+    arrays = (manifest or {}).get("arrays") or {}
+    return list(arrays.values()) if isinstance(arrays, dict) else []
+
+
+def load_index(path: str, signature: str, layout: str, attempts: int = 5) -> Optional[Tuple[Dict[str, "np.ndarray"], Dict]]:
+    """The stored arrays plus the metadata saved with them, or None if there's no usable index."""
+    import numpy as np
+
+    directory = os.path.dirname(path)
+    for _ in range(attempts):
+        manifest = _read_manifest(path)
+        try:
+            if manifest is None or (manifest["signature"], manifest["layout"]) != (signature, layout):
+                return None
+            arrays = {name: np.load(os.path.join(directory, file), mmap_mode="r") for name, file in manifest["arrays"].items()}
+            return arrays, manifest.get("meta") or {}
+        except FileNotFoundError:
+            continue  # pruned by two saves since we read the manifest; the new one names live files
+        except (OSError, ValueError, KeyError, AttributeError):
+            # A manifest from before versioned files (a list of names), or a damaged file
+            return None
+    return None
+
+
+def load_arrays(path: str, signature: str, layout: str) -> Optional[Dict[str, "np.ndarray"]]:
+    loaded = load_index(path, signature, layout)
+    return loaded[0] if loaded else None
+
+
+def save_arrays(path: str, signature: str, layout: str, arrays: Dict[str, "np.ndarray"], meta: Optional[Dict] = None):
+    import numpy as np
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    previous = _read_manifest(path)
+    version = uuid.uuid4().hex[:12]
+    files = {name: f"{os.path.basename(path)}.{version}.{name}.npy" for name in arrays}
+    for name, array in arrays.items():
+        with open(os.path.join(directory, files[name]), "wb") as f:
+            np.save(f, array)
+    manifest = {"signature": signature, "layout": layout, "arrays": files, "previous": _files(previous), "meta": meta}
+    # Replaced last: this is the switch from the old version to the new one
+    with open(path + ".json.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".json.tmp", path + ".json")
+    _prune(path, list(arrays), keep=set(files.values()) | set(manifest["previous"]))
+
+
+def _prune(path: str, names: List[str], keep: set):
+    """Removes this index's array files other than `keep`: older versions, unversioned files, crashed saves."""
+    directory = os.path.dirname(path)
+    pattern = re.compile(
+        re.escape(os.path.basename(path)) + r"\.(?:[0-9a-f]{12}\.)?(?:" + "|".join(map(re.escape, names)) + r")\.npy"
+    )
+    for filename in os.listdir(directory):
+        if filename not in keep and pattern.fullmatch(filename):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+
+def load_or_build(
+    catalog: SharedCatalog,
+    path: str,
+    layout: str,
+    build: Callable[[SharedCatalog], Dict[str, "np.ndarray"]],
+) -> Dict[str, "np.ndarray"]:
+    """Maps the stored index for this snapshot, building and publishing it first if needed."""
+    signature = catalog.signature.hex()
+    arrays = load_arrays(path, signature, layout)
+    if arrays is None:
+        with build_lock(path):
+            # Another worker may have built it while we waited
+            arrays = load_arrays(path, signature, layout)
+            if arrays is None:
+                save_arrays(path, signature, layout, build(catalog))
+                arrays = load_arrays(path, signature, layout)
+    return arrays
@@ -0,0 +1,337 @@
+"""
+Inventory Service
+Stock reservation engine keyed by product_id, shared by every worker on the
+host through SQLite (RUNTIME_DIR/inventory.db, WAL mode), like the order store.
+
+- Each product has a row with its catalog stock and the units sold and held.
+  A reservation is one BEGIN IMMEDIATE transaction of conditional updates
+  (held = held + qty WHERE catalog - sold - held >= qty): every item is
+  reserved or none is, and no two workers can sell the same unit.
+- reserve -> commit / release: a reservation holds stock for a TTL; abandoned
+  ones are expired by whichever worker's sweeper gets there first and their
+  stock returns to the pool.
+- hold: a reservation under an id the caller derives from an idempotency key.
+  A retry finds the original hold (or learns it already ended) instead of
+  reserving the stock a second time.
+
+Catalog stock (from the snapshot) is the starting on-hand quantity; sold and
+held count against it. Bulk catalog imports replace the catalog figure
+(update_stock) and the units sold so far keep counting against it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+
+# Ended holds are remembered this long past their expiry, so a late retry can't hold stock again
+# (Stripe forgets idempotency keys after 24 h)
+FINISHED_HOLD_RETENTION = 86400.0
+# Reservations check for expired holds at most this often (the sweeper covers idle periods)
+EXPIRY_CHECK_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    product_id TEXT PRIMARY KEY,
+    catalog    INTEGER NOT NULL,
+    sold       INTEGER NOT NULL DEFAULT 0,
+    held       INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id         TEXT PRIMARY KEY,
+    items      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    keyed      INTEGER NOT NULL,
+    state      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_due ON reservations(state, expires_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class InventoryError(Exception):
+    """Raised when a reservation can't be satisfied (unknown product or not enough stock)."""
+
+
+class InventoryEngine:
+    def __init__(
+        self,
+        stock: Dict[str, int],
+        path: str,
+        reservation_ttl: float = 900.0,
+        fsync: bool = False,
+        refresh_stock: Optional[Callable[[], object]] = None,
+    ):
+        self.path = path
+        self.reservation_ttl = reservation_ttl
+        # Called before each reservation so stock imported by another worker is picked up
+        self._refresh_stock = refresh_stock
+        self._fsync = fsync
+        self._local = threading.local()
+        self._checked_at = 0.0
+        self._pruned_at = 0.0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        self._load_catalog(stock)
+        self._import_legacy_wal(os.path.join(os.path.dirname(path), "inventory.wal"))
+        self.expire_due()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, as in OrderStore
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={'FULL' if self._fsync else 'NORMAL'}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent reservations queue instead of failing
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _load_catalog(self, stock: Dict[str, int]):
+        """Upserts the catalog figures, skipped when they match what the last worker loaded."""
+        fingerprint = hashlib.sha1(json.dumps(sorted(stock.items())).encode()).hexdigest()
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'catalog' AND value = ?", (fingerprint,)).fetchone():
+            return
+        self.update_stock(stock)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('catalog', ?)", (fingerprint,))
+
+    def _import_legacy_wal(self, wal_path: str):
+        """
+        Carries sales and open reservations over from the JSON-lines log that
+        kept stock before it moved to SQLite. Runs once; the log is then renamed.
+        """
+        if not os.path.exists(wal_path):
+            return
+        sold: Dict[str, int] = {}
+        reservations: Dict[str, dict] = {}
+        finished: Dict[str, float] = {}
+        with open(wal_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final write from a crash; everything before it is intact
+                op = record["op"]
+                if op == "checkpoint":
+                    sold = dict(record["sold"])
+                    reservations = {r["id"]: r for r in record["reservations"]}
+                    finished = dict(record.get("finished", {}))
+                elif op == "reserve":
+                    reservations[record["id"]] = record
+                elif op in ("commit", "release", "expire", "cancel"):
+                    reservation = reservations.pop(record["id"], None)
+                    if reservation and op == "commit":
+                        for pid, qty in reservation["items"].items():
+                            sold[pid] = sold.get(pid, 0) + qty
+                    if reservation and reservation.get("keyed") and op != "cancel":
+                        finished[reservation["id"]] = reservation["expires_at"]
+
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_wal'").fetchone():
+                return  # another worker imported it first
+            conn.executemany("UPDATE stock SET sold = sold + ? WHERE product_id = ?", [(qty, pid) for pid, qty in sold.items()])
+            for r in reservations.values():
+                conn.executemany(
+                    "UPDATE stock SET held = held + ? WHERE product_id = ?", [(qty, pid) for pid, qty in r["items"].items()]
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO reservations (id, items, expires_at, keyed, state) VALUES (?, ?, ?, ?, 'held')",
+                    (r["id"], json.dumps(r["items"]), r["expires_at"], int(bool(r.get("keyed")))),
+                )
+            conn.executemany(
+                "INSERT OR IGNORE INTO reservations (id, items, expires_at, keyed, state) VALUES (?, '{}', ?, 1, 'release')",
+                list(finished.items()),
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_wal', '1')")
+        os.replace(wal_path, wal_path + ".imported")
+
+    # ==========================================
+    # Public API
+    # ==========================================
+
+    def reserve(self, items: Dict[str, int], ttl: Optional[float] = None) -> str:
+        """
+        Atomically reserves every item or none of them.
+        Returns the reservation id; raises InventoryError if any item can't be held.
+        """
+        reservation_id = uuid.uuid4().hex
+        self._hold(reservation_id, items, ttl, keyed=False)
+        return reservation_id
+
+    def hold(self, reservation_id: str, items: Dict[str, int], ttl: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Reserves like reserve(), under an id derived from an idempotency key.
+        Returns (created, expires_at). When the id is already held, or its hold
+        already ended (committed, released or expired), nothing is reserved and
+        created is False. Raises InventoryError if the id is held for other items.
+        """
+        return self._hold(reservation_id, items, ttl, keyed=True)
+
+    def _hold(self, reservation_id: str, items: Dict[str, int], ttl: Optional[float], keyed: bool) -> Tuple[bool, float]:
+        items = {pid: qty for pid, qty in items.items() if qty > 0}
+        if not items:
+            raise InventoryError("Nothing to reserve")
+        if self._refresh_stock:
+            self._refresh_stock()
+        now = time.time()
+        if now - self._checked_at > EXPIRY_CHECK_INTERVAL:
+            self.expire_due(now)
+        expires_at = now + (ttl or self.reservation_ttl)
+
+        with self._transaction() as conn:
+            if keyed:
+                row = conn.execute("SELECT items, expires_at, state FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+                if row:
+                    if row[2] == "held" and json.loads(row[0]) != items:
+                        raise InventoryError("This checkout was already started with a different cart")
+                    return False, row[1]
+
+            short = []
+            for pid, qty in items.items():
+                cursor = conn.execute(
+                    "UPDATE stock SET held = held + ? WHERE product_id = ? AND catalog - sold - held >= ?", (qty, pid, qty)
+                )
+                if cursor.rowcount == 0:
+                    short.append(pid)
+            if short:
+                # Raising rolls back the items already held
+                known = {row[0] for row in conn.execute(
+                    f"SELECT product_id FROM stock WHERE product_id IN ({','.join('?' * len(short))})", short
+                )}
+                unknown = [pid for pid in short if pid not in known]
+                if unknown:
+                    raise InventoryError(f"Unknown product(s): {', '.join(unknown)}")
+                raise InventoryError(f"Insufficient stock for: {', '.join(short)}")
+            conn.execute(
+                "INSERT INTO reservations (id, items, expires_at, keyed, state) VALUES (?, ?, ?, ?, 'held')",
+                (reservation_id, json.dumps(items), expires_at, int(keyed)),
+            )
+        return True, expires_at
+
+    def _finish(self, reservation_id: str, op: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT items, keyed FROM reservations WHERE id = ? AND state = 'held'", (reservation_id,)
+            ).fetchone()
+            if not row:
+                return False  # unknown, or another worker finished it first
+            items = json.loads(row[0])
+            if op == "commit":
+                sql = "UPDATE stock SET sold = sold + ?, held = held - ? WHERE product_id = ?"
+                conn.executemany(sql, [(qty, qty, pid) for pid, qty in items.items()])
+            else:
+                conn.executemany("UPDATE stock SET held = held - ? WHERE product_id = ?", [(qty, pid) for pid, qty in items.items()])
+            if row[1] and op != "cancel":
+                conn.execute("UPDATE reservations SET state = ? WHERE id = ?", (op, reservation_id))
+            else:
+                conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+        return True
+
+    def commit(self, reservation_id: str) -> bool:
+        """Turns a reservation into a sale. Unknown/already-finished reservations are a no-op."""
+        return self._finish(reservation_id, "commit")
+
+    def release(self, reservation_id: str) -> bool:
+        """Returns a reservation's stock to the pool (cancelled checkout)."""
+        return self._finish(reservation_id, "release")
+
+    def cancel(self, reservation_id: str) -> bool:
+        """Releases a hold whose request failed and forgets it, so a retry with the same key holds again."""
+        return self._finish(reservation_id, "cancel")
+
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """Releases every reservation whose TTL has passed. One indexed lookup when nothing is due."""
+        now = now or time.time()
+        self._checked_at = now
+        conn = self._connect()
+        due = [row[0] for row in conn.execute(
+            "SELECT id FROM reservations WHERE state = 'held' AND expires_at <= ?", (now,)
+        )]
+        if now - self._pruned_at > 3600:
+            self._pruned_at = now
+            with self._transaction() as conn:
+                conn.execute(
+                    "DELETE FROM reservations WHERE state != 'held' AND expires_at < ?", (now - FINISHED_HOLD_RETENTION,)
+                )
+        return sum(self._finish(reservation_id, "expire") for reservation_id in due)
+
+    def update_stock(self, levels: Dict[str, int]):
+        """
+        Applies new catalog stock figures (e.g. from a bulk import). Units sold
+        or held by reservations keep counting against the new figure; products
+        the engine hasn't seen become reservable.
+        """
+        if not levels:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                """INSERT INTO stock (product_id, catalog) VALUES (?, ?)
+                   ON CONFLICT(product_id) DO UPDATE SET catalog = excluded.catalog""",
+                list(levels.items()),
+            )
+
+    def available(self, product_id: str) -> Optional[int]:
+        row = self._connect().execute(
+            "SELECT catalog - sold - held FROM stock WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def on_hand(self, product_id: str) -> Optional[int]:
+        row = self._connect().execute("SELECT catalog - sold FROM stock WHERE product_id = ?", (product_id,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def active_reservations(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM reservations WHERE state = 'held'").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        products, held, sold = conn.execute("SELECT COUNT(*), TOTAL(held), TOTAL(sold) FROM stock").fetchone()
+        return {"products": products, "active_reservations": self.active_reservations, "units_held": int(held), "units_sold": int(sold)}
+
+    def close(self):
+        # Only this thread's connection; the others close with their threads
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+@lazy_singleton
+def get_inventory_service() -> InventoryEngine:
+    from app.services.data_service import get_data_service
+
+    settings = get_settings()
+    data = get_data_service()
+    segments = data.segments
+    engine = InventoryEngine(
+        stock=data.get_stock_levels(),
+        path=os.path.join(settings.RUNTIME_DIR, "inventory.db"),
+        reservation_ttl=settings.INVENTORY_RESERVATION_TTL,
+        fsync=settings.INVENTORY_WAL_FSYNC,
+        refresh_stock=segments.refresh if segments else None,
+    )
+    if segments:
+        segments.subscribe(engine.update_stock)
+    return engine
@@ -0,0 +1,285 @@
+"""
+Order Store
+Cross-process store for mutable order data, backed by SQLite in WAL mode.
+Every worker opens the same database file; SQLite's file locking serializes
+writers, so orders created by one worker are immediately visible to the others
+and no worker can overwrite another's writes.
+
+Per-user and per-status aggregates are kept in their own tables and updated in
+the same transaction as every order insert or status change, so summaries never
+depend on the size of the order history.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from app.core.models import Order, OrderRef, OrderSummary, StatusTotals
+
+# Orders in these states still need attention from support
+OPEN_ORDER_STATUSES = ("pending", "processing", "shipped")
+# Orders in these states don't count towards a user's spend
+REFUNDED_ORDER_STATUSES = ("returned",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    id         TEXT NOT NULL UNIQUE,
+    user_id    TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    total      REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    body       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id);
+CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders(user_id, status);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE IF NOT EXISTS user_status_stats (
+    user_id     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    order_count INTEGER NOT NULL,
+    total       REAL NOT NULL,
+    PRIMARY KEY (user_id, status)
+);
+CREATE TABLE IF NOT EXISTS status_stats (
+    status      TEXT PRIMARY KEY,
+    order_count INTEGER NOT NULL,
+    total       REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_latest_order (
+    user_id   TEXT PRIMARY KEY,
+    order_seq INTEGER NOT NULL
+);
+"""
+
+
+class DuplicateOrderError(Exception):
+    """Raised when an order is created with an id that is already stored."""
+
+
+class OrderStore:
+    def __init__(self, path: str, seed_path: Optional[str] = None):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._init_schema(seed_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads; FastAPI runs
+        # sync endpoints on a thread pool, so keep one connection per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def _init_schema(self, seed_path: Optional[str]):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        with self._transaction() as conn:
+            # Import the JSON seed exactly once, even if several workers race here
+            seeded = conn.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            if not seeded:
+                if seed_path and os.path.exists(seed_path):
+                    with open(seed_path, "r") as f:
+                        for data in json.load(f):
+                            self._insert(conn, Order(**data))
+                conn.execute("INSERT INTO meta (key, value) VALUES ('seeded', '1')")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('aggregates', '1')")
+
+            # Databases created before aggregates existed get them backfilled once
+            if not conn.execute("SELECT value FROM meta WHERE key = 'aggregates'").fetchone():
+                self._rebuild_aggregates(conn)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('aggregates', '1')")
+
+    # ==========================================
+    # Aggregate maintenance (always inside a write transaction)
+    # ==========================================
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, user_id: str, status: str, count: int, total: float):
+        conn.execute(
+            """INSERT INTO user_status_stats (user_id, status, order_count, total) VALUES (?, ?, ?, ?)
+               ON CONFLICT(user_id, status) DO UPDATE SET
+                   order_count = order_count + excluded.order_count, total = total + excluded.total""",
+            (user_id, status, count, total),
+        )
+        conn.execute(
+            """INSERT INTO status_stats (status, order_count, total) VALUES (?, ?, ?)
+               ON CONFLICT(status) DO UPDATE SET
+                   order_count = order_count + excluded.order_count, total = total + excluded.total""",
+            (status, count, total),
+        )
+
+    def _rebuild_aggregates(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM user_status_stats")
+        conn.execute("DELETE FROM status_stats")
+        conn.execute("DELETE FROM user_latest_order")
+        conn.execute(
+            """INSERT INTO user_status_stats (user_id, status, order_count, total)
+               SELECT user_id, status, COUNT(*), SUM(total) FROM orders GROUP BY user_id, status"""
+        )
+        conn.execute(
+            """INSERT INTO status_stats (status, order_count, total)
+               SELECT status, COUNT(*), SUM(total) FROM orders GROUP BY status"""
+        )
+        conn.execute(
+            """INSERT INTO user_latest_order (user_id, order_seq)
+               SELECT user_id, MAX(seq) FROM orders GROUP BY user_id"""
+        )
+
+    def _insert(self, conn: sqlite3.Connection, order: Order):
+        cursor = conn.execute(
+            "INSERT INTO orders (id, user_id, status, total, created_at, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (order.id, order.user_id, order.status, order.total, order.created_at.isoformat(), order.model_dump_json()),
+        )
+        self._bump(conn, order.user_id, order.status, 1, order.total)
+        conn.execute(
+            "INSERT OR REPLACE INTO user_latest_order (user_id, order_seq) VALUES (?, ?)",
+            (order.user_id, cursor.lastrowid),
+        )
+
+    # ==========================================
+    # Writes
+    # ==========================================
+
+    def add(self, order: Order) -> Order:
+        """Inserts one order; raises DuplicateOrderError if its id is taken."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM orders WHERE id = ?", (order.id,)).fetchone():
+                raise DuplicateOrderError(f"Order {order.id} already exists")
+            self._insert(conn, order)
+        return order
+
+    def add_many(self, orders: Sequence[Order]) -> int:
+        """Inserts a batch in one transaction; orders whose id already exists are skipped. Returns the count inserted."""
+        inserted = 0
+        with self._transaction() as conn:
+            for order in orders:
+                if conn.execute("SELECT 1 FROM orders WHERE id = ?", (order.id,)).fetchone():
+                    continue
+                self._insert(conn, order)
+                inserted += 1
+        return inserted
+
+    def update_status(self, order_id: str, status: str) -> Optional[Order]:
+        """Moves an order to a new status, shifting its count/total between aggregates."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT body FROM orders WHERE id = ?", (order_id,)).fetchone()
+            if not row:
+                return None
+            order = Order.model_validate_json(row[0])
+            if order.status == status:
+                return order
+            self._bump(conn, order.user_id, order.status, -1, -order.total)
+            self._bump(conn, order.user_id, status, 1, order.total)
+            order.status = status
+            conn.execute(
+                "UPDATE orders SET status = ?, body = ? WHERE id = ?",
+                (status, order.model_dump_json(), order_id),
+            )
+        return order
+
+    # ==========================================
+    # Reads
+    # ==========================================
+
+    def get(self, order_id: str) -> Optional[Order]:
+        row = self._connect().execute("SELECT body FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return Order.model_validate_json(row[0]) if row else None
+
+    def list_for_user(self, user_id: str) -> List[Order]:
+        rows = self._connect().execute("SELECT body FROM orders WHERE user_id = ? ORDER BY seq", (user_id,))
+        return [Order.model_validate_json(body) for (body,) in rows]
+
+    def list_all(self) -> List[Order]:
+        rows = self._connect().execute("SELECT body FROM orders ORDER BY seq")
+        return [Order.model_validate_json(body) for (body,) in rows]
+
+    def iter_json(self, user_id: Optional[str] = None, page_size: int = 1000) -> Iterator[str]:
+        """
+        Stored order bodies (JSON text), oldest first. Pages are fetched by seq, each
+        with a fresh query, so a consumer may resume it from another thread.
+        """
+        where, params = ("AND user_id = ?", (user_id,)) if user_id else ("", ())
+        last = 0
+        while True:
+            rows = self._connect().execute(
+                f"SELECT seq, body FROM orders WHERE seq > ? {where} ORDER BY seq LIMIT ?", (last, *params, page_size)
+            ).fetchall()
+            for _, body in rows:
+                yield body
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    @staticmethod
+    def _ref(body: str) -> OrderRef:
+        order = Order.model_validate_json(body)
+        return OrderRef(
+            id=order.id,
+            status=order.status,
+            total=order.total,
+            tracking_number=order.tracking_number,
+            created_at=order.created_at,
+        )
+
+    def user_summary(self, user_id: str) -> OrderSummary:
+        """Reads the user's aggregates plus their open orders via the (user_id, status) index."""
+        conn = self._connect()
+        by_status = {
+            status: StatusTotals(order_count=count, total=round(total, 2))
+            for status, count, total in conn.execute(
+                "SELECT status, order_count, total FROM user_status_stats WHERE user_id = ? AND order_count > 0",
+                (user_id,),
+            )
+        }
+        latest = conn.execute(
+            """SELECT o.body FROM user_latest_order l JOIN orders o ON o.seq = l.order_seq
+               WHERE l.user_id = ?""",
+            (user_id,),
+        ).fetchone()
+        placeholders = ",".join("?" * len(OPEN_ORDER_STATUSES))
+        open_rows = conn.execute(
+            f"SELECT body FROM orders WHERE user_id = ? AND status IN ({placeholders}) ORDER BY seq",
+            (user_id, *OPEN_ORDER_STATUSES),
+        )
+        return OrderSummary(
+            user_id=user_id,
+            order_count=sum(s.order_count for s in by_status.values()),
+            total_spent=round(sum(s.total for status, s in by_status.items() if status not in REFUNDED_ORDER_STATUSES), 2),
+            by_status=by_status,
+            latest_order=self._ref(latest[0]) if latest else None,
+            open_orders=[self._ref(body) for (body,) in open_rows],
+        )
+
+    def status_summary(self) -> Dict[str, StatusTotals]:
+        rows = self._connect().execute(
+            "SELECT status, order_count, total FROM status_stats WHERE order_count > 0 ORDER BY status"
+        )
+        return {status: StatusTotals(order_count=count, total=round(total, 2)) for status, count, total in rows}
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE takes the write lock up front so concurrent writers queue instead of failing."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -1,60 +1,149 @@
-import json
-import faiss # type: ignore
-import numpy as np
 import os
+import zlib
+from typing import List, Optional, Sequence
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.core.models import Product
+from app.services.catalog_store import SharedCatalog
+from app.services.index_files import load_or_build
+from app.services.search_index import product_text, tokenize
+from app.services.vector_index import VectorIndex, VectorIndexConfig
 
 # For embeddings, we can use a simple sentence transformer or OpenRouter embedding API
-# For MVP/Offline speed without API costs, let's use a dummy embedding or simple one
-# if user wants "embeddings on the go", we might simulate or use a lightweight lib
+# For MVP/Offline speed without API costs, we use a local hashing embedder: deterministic,
+# free, and good enough to exercise the vector path end to end. Swap in a real model by
+# replacing HashingEmbedder (same embed() contract, different model_id).
+
+EMBEDDING_DIM = 256
+# Vector hits below this cosine similarity are noise (hash collisions), not matches
+MIN_SIMILARITY = 0.2
+
+_STOPWORDS = frozenset("a an and are as at for from in is it of on or our the to with you your".split())
+
+
+def embedding_text(products, row: int) -> str:
+    """What gets embedded for one snapshot product row."""
+    return f"{product_text(products, row)} {products.columns['category_id'].get(row)}"
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of words and word pairs into a unit vector. Each
+    feature is hashed twice, so an unrelated product has to collide on both
+    buckets to look similar.
+    """
+
+    model_id = f"hashing-{EMBEDDING_DIM}-v2"
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = [w for w in tokenize(text) if w not in _STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                for salt in (b"", b"#"):
+                    h = zlib.crc32(salt + feature.encode())
+                    vectors[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
 
 class ProductService:
-    def __init__(self):
-        self.products = []
+    """
+    Vector index over the catalog snapshot. FAISS ids are snapshot row numbers,
+    so results line up with the lexical search index and facet bitmaps.
+    """
+
+    def __init__(
+        self,
+        catalog: SharedCatalog,
+        embedder: Optional[HashingEmbedder] = None,
+        store=None,
+        index_config: Optional[VectorIndexConfig] = None,
+        vectors_path: Optional[str] = None,
+    ):
+        self.catalog = catalog
+        self.embedder = embedder or HashingEmbedder()
+        # Optional EmbeddingStore: product vectors are cached on disk and only changed products are re-embedded
+        self.store = store
+        # Catalog segments keep their vectors in their own files (see index_files) and only read the store
+        self.vectors_path = vectors_path
+        self.index_config = index_config or VectorIndexConfig()
         self.index = None
-        self.load_products()
         self.build_index()
 
-    def load_products(self):
-        path = os.path.join(os.path.dirname(__file__), "../data/products.json")
-        try:
-            with open(path, 'r') as f:
-                self.products = json.load(f)
-        except Exception as e:
-            print(f"Error loading products: {e}")
-            self.products = []
+    def _product_text(self, row: int) -> str:
+        return embedding_text(self.catalog.tables["products"], row)
 
     def _get_embedding(self, text: str):
-        # TODO: Replace with real embedding (OpenAI/Cohere/Local)
-        # Mock 128-dim vector
-        return np.random.rand(128).astype('float32')
+        return self.embedder.embed([text])[0]
 
     def build_index(self):
-        if not self.products:
+        products = self.catalog.tables["products"]
+        if not len(products):
             return
-        
-        # Dimension 128 for mock
-        self.index = faiss.IndexFlatL2(128)
-        embeddings = []
-        for p in self.products:
-            # Embed combined text
-            text = f"{p['name']} {p['category']} {p['description']}"
-            emb = self._get_embedding(text)
-            embeddings.append(emb)
-        
-        if embeddings:
-            self.index.add(np.array(embeddings))
-
-    def search(self, query: str, k: int = 3):
-        if not self.index:
-            return []
-        
-        query_emb = self._get_embedding(query).reshape(1, -1)
-        distances, indices = self.index.search(query_emb, k)
-        
-        results = []
-        for i in indices[0]:
-            if i < len(self.products):
-                results.append(self.products[i])
-        return results
-
-product_service = ProductService()
+
+        texts = [self._product_text(row) for row in range(len(products))]
+        if self.store is None:
+            vectors = self.embedder.embed(texts)
+        elif self.vectors_path:
+            vectors = load_or_build(
+                self.catalog, self.vectors_path, self.embedder.model_id,
+                lambda _: {"vectors": self.store.embed(texts, persist=False)},
+            )["vectors"]
+        else:
+            vectors = self.store.embed(texts, prune=True)
+        # Index type (flat/hnsw/ivf/ivfpq) and its build/search knobs come from index_config
+        self.index = VectorIndex(vectors, self.index_config)
+
+    def search_rows(self, queries: Sequence[str], k: int, allowed=None, with_scores: bool = False) -> List[List]:
+        """
+        Nearest rows for many queries in one FAISS call, best first. `allowed` is
+        an optional Bitmap of rows to consider (filters apply before scoring).
+        Hits below MIN_SIMILARITY are dropped. With with_scores, each hit is a
+        (row, cosine similarity) pair.
+        """
+        if self.index is None or not queries:
+            return [[] for _ in queries]
+        scores, rows = self.index.search(self.embedder.embed(queries), k, allowed=allowed)
+        return [
+            [(int(r), float(s)) if with_scores else int(r) for r, s in zip(row_ids, row_scores) if r >= 0 and s >= MIN_SIMILARITY]
+            for row_ids, row_scores in zip(rows, scores)
+        ]
+
+    def derive(self, catalog: SharedCatalog, vectors_path: str) -> "ProductService":
+        """A vector index over an imported catalog segment, with this embedder, store and config."""
+        return ProductService(catalog, self.embedder, self.store, self.index_config, vectors_path)
+
+    def search(self, query: str, k: int = 3) -> List[Product]:
+        from app.services.data_service import get_data_service
+
+        return get_data_service().get_products_at(self.search_rows([query], k)[0])
+
+
+def default_embedding_store(embedder: HashingEmbedder):
+    """The host's shared EmbeddingStore under RUNTIME_DIR."""
+    from app.services.embedding_store import EmbeddingStore
+
+    settings = get_settings()
+    return EmbeddingStore(
+        os.path.join(settings.RUNTIME_DIR, "embeddings"), embedder,
+        batch_size=settings.EMBEDDING_BATCH_SIZE, workers=settings.EMBEDDING_WORKERS,
+    )
+
+
+@lazy_singleton
+def get_product_service() -> ProductService:
+    from app.services.data_service import get_data_service
+
+    catalog = get_data_service().catalog
+    if catalog is None:
+        raise RuntimeError("Catalog snapshot is not available")
+    embedder = HashingEmbedder()
+    return ProductService(catalog, embedder, default_embedding_store(embedder), VectorIndexConfig.from_settings(get_settings()))
@@ -0,0 +1,110 @@
+"""
+Retrieval Service
+Hybrid product retrieval: the lexical search index (prefix + typo-tolerant
+matching) and the FAISS vector index each rank candidates, and the rankings are
+fused with reciprocal rank fusion:
+
+    score(product) = sum over rankings of 1 / (RRF_K + rank)
+
+RRF needs no score calibration between the two paths, and a product ranked
+well by both beats one ranked first by only one of them.
+
+Structured filters (category, in stock, price) are applied before scoring:
+they become a row bitmap that masks the lexical scores and is handed to FAISS as
+an ID selector, so filtered-out products never take a candidate slot.
+
+Imported catalog segments (see catalog_segments) have their own search, vector
+and facet indexes. Each ranking runs on every part and the per-part hits are
+merged by score (lexical score, cosine similarity) before fusion, so a product
+updated by an import ranks exactly like one compiled into the snapshot.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_singleton
+from app.core.models import Product
+
+RRF_K = 60
+# Candidates taken from each ranking before fusion (at least this many, or 5x the limit)
+MIN_CANDIDATES = 50
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[int]:
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, 1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    # Stable on ties: earlier rankings (lexical first) win
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class RetrievalService:
+    def __init__(self, search_index, product_service, facets, data):
+        self.search_index = search_index
+        self.product_service = product_service
+        self.facets = facets
+        self.data = data
+
+    def retrieve_rows(
+        self,
+        queries: Sequence[str],
+        limit: int = 10,
+        category: Optional[str] = None,
+        in_stock: bool = False,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[List[int]]:
+        """Fused row rankings for many queries sharing one filter set; one FAISS call for all of them."""
+        from app.services.search_index import query_groups
+
+        depth = max(MIN_CANDIDATES, limit * 5)
+        groups = [query_groups(q) for q in queries]
+        shards = self._shards()
+        lexical = [[] for _ in queries]
+        vector = [[] for _ in queries]
+        for part, search_index, product_service, facets in shards:
+            allowed = facets.filters(category=category, in_stock=in_stock, min_price=min_price, max_price=max_price)
+            if allowed is not None and not allowed.count():
+                continue
+            mask = allowed.to_mask() if allowed is not None else None
+            if len(shards) == 1:
+                lexical = [search_index.rank(g, allowed=mask, limit=depth) for g in groups]
+                vector = product_service.search_rows(queries, depth, allowed=allowed)
+                break
+            for hits, g in zip(lexical, groups):
+                hits.extend((part.start + row, score) for row, score in search_index.rank(g, allowed=mask, limit=depth, with_scores=True))
+            for hits, found in zip(vector, product_service.search_rows(queries, depth, allowed=allowed, with_scores=True)):
+                hits.extend((part.start + row, score) for row, score in found)
+        if len(shards) > 1:
+            # Best score first, catalog order on ties, like a single index would rank them
+            lexical = [[row for row, _ in sorted(hits, key=lambda h: (-h[1], h[0]))[:depth]] for hits in lexical]
+            vector = [[row for row, _ in sorted(hits, key=lambda h: (-h[1], h[0]))[:depth]] for hits in vector]
+        return [reciprocal_rank_fusion([lex, vec])[:limit] for lex, vec in zip(lexical, vector)]
+
+    def _shards(self) -> List[Tuple]:
+        """(part, search index, vector index, facets) for every catalog part; the base uses ours."""
+        shards = []
+        for part, facets in self.facets.shards():
+            if part.is_base:
+                shards.append((part, self.search_index, self.product_service, facets))
+            else:
+                vectors = part.index("vectors", lambda part=part: self.product_service.derive(part.catalog, part.prefix + ".vectors"))
+                shards.append((part, part.search_index(), vectors, facets))
+        return shards
+
+    def retrieve(self, query: str, limit: int = 10, **filters) -> List[Product]:
+        return self.data.get_products_at(self.retrieve_rows([query], limit=limit, **filters)[0])
+
+    def retrieve_batch(self, queries: Sequence[str], limit: int = 10, **filters) -> List[List[Product]]:
+        return [self.data.get_products_at(rows) for rows in self.retrieve_rows(queries, limit=limit, **filters)]
+
+
+# Global instance, built on first use or by the startup warm-up
+@lazy_singleton
+def get_retrieval_service() -> RetrievalService:
+    from app.services.data_service import get_data_service
+    from app.services.facet_service import get_facet_service
+    from app.services.product_service import get_product_service
+    from app.services.search_index import get_search_index
+
+    return RetrievalService(get_search_index(), get_product_service(), get_facet_service(), get_data_service())
@@ -0,0 +1,269 @@
+"""
+Search Index
+Token index over product text (name, description, features), derived from the
+catalog snapshot and stored as a sorted vocabulary plus CSR postings:
+
+    vocab     sorted unique tokens (ASCII bytes)
+    offsets   postings of vocab[i] are rows[offsets[i]:offsets[i + 1]]
+    rows      product row ids grouped by token, ascending within each token
+    in_name   1 where the posting's token appears in the product name (ranking boost)
+
+Because the vocabulary is sorted and postings are grouped by token, all tokens
+starting with a prefix own one contiguous slice of `rows`: a prefix lookup is
+two binary searches and a slice, whatever the catalog size.
+
+Typo tolerance uses a trigram index over the vocabulary (CSR again: gram code ->
+token ids). A misspelled word's trigrams propose candidate tokens, since k edits
+change at most 3k trigrams. A bounded edit-distance check then keeps the real
+matches, so "hikng" finds "hiking" without scanning the vocabulary.
+"""
+
+import os
+import re
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.services.catalog_store import SharedCatalog
+from app.services.index_files import load_or_build
+
+SEARCH_FIELDS = ("name", "description", "features")
+MAX_TOKEN_LENGTH = 32
+LAYOUT = repr((3, SEARCH_FIELDS, MAX_TOKEN_LENGTH))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Related words that also count as a match for a query word
+SYNONYMS = {
+    "boots": ["shoes", "footwear", "hiking"],
+    "shoes": ["boots", "footwear", "sneakers"],
+    "jacket": ["coat", "parka", "shell", "outerwear"],
+    "parka": ["jacket", "coat", "down"],
+    "shirt": ["top", "tee", "apparel"],
+    "pants": ["trousers", "bottoms"],
+    "backpack": ["pack", "bag", "rucksack"],
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN.findall(text.lower())]
+
+
+def query_groups(query: str) -> List[List[str]]:
+    """One group per distinct query word: the word itself, then its synonyms."""
+    return [[token] + SYNONYMS.get(token, []) for token in dict.fromkeys(tokenize(query))]
+
+
+def max_edits(token: str) -> int:
+    """Typos tolerated in a query word: none for short words or numbers, more for long ones."""
+    if len(token) < 4 or any(c.isdigit() for c in token):
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def trigrams(token: str) -> List[int]:
+    """Distinct trigram codes of a token padded with word boundaries (3 ASCII bytes per code)."""
+    padded = f" {token} ".encode()
+    return sorted({padded[i] << 16 | padded[i + 1] << 8 | padded[i + 2] for i in range(len(padded) - 2)})
+
+
+def edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Levenshtein distance if it is at most `limit`, else None (stops early)."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+def product_text(products, row: int) -> str:
+    """The searchable text of one snapshot product row."""
+    columns = products.columns
+    return " ".join([columns["name"].get(row), columns["description"].get(row), *columns["features"].get(row)])
+
+
+def _scores(np, size: int, postings, base: int):
+    """Per-row score for one group of words: base, +1 if a word is in the name; best posting wins."""
+    score = np.zeros(size, dtype=np.int32)
+    for rows, in_name in postings:
+        np.maximum.at(score, rows, base + in_name.astype(np.int32))
+    return score
+
+
+def _build(catalog: SharedCatalog) -> Dict[str, "np.ndarray"]:
+    import numpy as np
+
+    products = catalog.tables["products"]
+    vocab: Dict[str, int] = {}
+    token_ids, row_ids, name_flags = array("I"), array("I"), array("B")
+    for row in range(len(products)):
+        name_tokens = set(tokenize(products.columns["name"].get(row)))
+        for token in name_tokens | set(tokenize(product_text(products, row))):
+            token_ids.append(vocab.setdefault(token, len(vocab)))
+            row_ids.append(row)
+            name_flags.append(token in name_tokens)
+
+    words = sorted(vocab)
+    rank = np.empty(len(vocab), dtype=np.uint32)
+    rank[[vocab[w] for w in words]] = np.arange(len(vocab), dtype=np.uint32)
+    keys = rank[np.array(token_ids, dtype=np.uint32)]
+    rows = np.array(row_ids, dtype=np.uint32)
+    order = np.lexsort((rows, keys))
+
+    gram_codes, gram_terms = array("I"), array("I")
+    for term_id, word in enumerate(words):
+        for code in trigrams(word):
+            gram_codes.append(code)
+            gram_terms.append(term_id)
+    codes = np.array(gram_codes, dtype=np.uint32)
+    terms = np.array(gram_terms, dtype=np.uint32)
+    gram_order = np.lexsort((terms, codes))
+    codes = codes[gram_order]
+    unique_codes = np.unique(codes)
+    return {
+        "vocab": np.array([w.encode() for w in words], dtype=f"S{MAX_TOKEN_LENGTH}"),
+        "offsets": np.searchsorted(keys[order], np.arange(len(vocab) + 1)).astype(np.uint64),
+        "rows": rows[order],
+        "in_name": np.array(name_flags, dtype=np.uint8)[order],
+        "gram_codes": unique_codes,
+        "gram_offsets": np.searchsorted(codes, np.append(unique_codes, np.uint32(0xFFFFFFFF))).astype(np.uint64),
+        "gram_terms": terms[gram_order],
+    }
+
+
+class SearchIndex:
+    def __init__(self, catalog: SharedCatalog, path: str):
+        import numpy as np
+
+        self._np = np
+        self.size = len(catalog.tables["products"])
+        arrays = load_or_build(catalog, path, LAYOUT, _build)
+        self._vocab, self._offsets, self._rows = arrays["vocab"], arrays["offsets"], arrays["rows"]
+        self._in_name = arrays["in_name"]
+        self._gram_codes, self._gram_offsets = arrays["gram_codes"], arrays["gram_offsets"]
+        self._gram_terms = arrays["gram_terms"]
+
+    def _prefix_span(self, prefix: str) -> slice:
+        key = prefix.encode()[:MAX_TOKEN_LENGTH]
+        lo = self._np.searchsorted(self._vocab, key, side="left")
+        hi = self._np.searchsorted(self._vocab, key + b"\xff", side="left")
+        return slice(int(self._offsets[lo]), int(self._offsets[hi])) if lo < hi else slice(0, 0)
+
+    def _exact_span(self, token: str) -> slice:
+        key = token.encode()[:MAX_TOKEN_LENGTH]
+        i = self._np.searchsorted(self._vocab, key)
+        if i < len(self._vocab) and self._vocab[i] == key:
+            return slice(int(self._offsets[i]), int(self._offsets[i + 1]))
+        return slice(0, 0)
+
+    def prefix_rows(self, prefix: str) -> "np.ndarray":
+        """Rows with any token starting with `prefix` (a row may repeat across tokens)."""
+        return self._rows[self._prefix_span(prefix)]
+
+    def fuzzy_terms(self, token: str) -> List[Tuple[str, int]]:
+        """Vocabulary tokens within max_edits(token) edits of `token`, as (token, distance)."""
+        np = self._np
+        limit = max_edits(token)
+        if not limit:
+            return []
+        grams = trigrams(token)
+        slices = []
+        for code in grams:
+            i = np.searchsorted(self._gram_codes, code)
+            if i < len(self._gram_codes) and self._gram_codes[i] == code:
+                slices.append(self._gram_terms[self._gram_offsets[i]:self._gram_offsets[i + 1]])
+        if not slices:
+            return []
+        candidates, shared = np.unique(np.concatenate(slices), return_counts=True)
+        candidates = candidates[shared >= max(1, len(grams) - 3 * limit)]
+
+        matches = []
+        for term_id in candidates.tolist():
+            word = self._vocab[term_id].decode()
+            distance = edit_distance(token, word, limit)
+            if distance is not None:
+                matches.append((word, distance))
+        return matches
+
+    def rank(
+        self,
+        groups: Sequence[Sequence[str]],
+        allowed: Optional["np.ndarray"] = None,
+        limit: int = 20,
+        with_scores: bool = False,
+    ) -> List:
+        """
+        Best-matching rows for a query given as groups of alternative words (a
+        query word first, then its synonyms). A group matches a product when one
+        of its words starts a word of the product; the query word itself beats a
+        synonym and a match in the name beats one elsewhere. A group with no
+        match anywhere falls back to catalog words within a few typos of the
+        query word. Fuzzy matches always rank below exact ones; ties keep
+        catalog order. `allowed` is an optional boolean row mask. With
+        with_scores, returns (row, score) pairs instead of rows.
+        """
+        np = self._np
+        exact = np.zeros(self.size, dtype=np.int32)
+        fuzzy = np.zeros(self.size, dtype=np.int32)
+        for word, *synonyms in groups:
+            spans = [self._prefix_span(word)]
+            synonym_spans = [self._prefix_span(s) for s in synonyms]
+            if any(span.stop > span.start for span in spans + synonym_spans):
+                # 3-4 for the query word itself, 1-2 for a synonym
+                exact += np.maximum(
+                    _scores(np, self.size, [(self._rows[s], self._in_name[s]) for s in spans], 3),
+                    _scores(np, self.size, [(self._rows[s], self._in_name[s]) for s in synonym_spans], 1),
+                )
+                continue
+            spans = [self._exact_span(match) for match, _ in self.fuzzy_terms(word)]
+            fuzzy += _scores(np, self.size, [(self._rows[s], self._in_name[s]) for s in spans], 1)
+
+        # Any exact group outweighs every fuzzy one combined
+        score = exact * (2 * len(groups) + 1) + fuzzy
+        if allowed is not None:
+            score[~allowed] = 0
+        matched = np.flatnonzero(score)
+        best = matched[np.argsort(-score[matched], kind="stable")][:limit]
+        if with_scores:
+            return list(zip(best.tolist(), score[best].tolist()))
+        return best.tolist()
+
+    def match_mask(self, query: str) -> Optional["np.ndarray"]:
+        """
+        Boolean row mask: every query token must prefix some token of the product.
+        None when the query has no tokens (no filtering).
+        """
+        np = self._np
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        mask = None
+        for token in sorted(set(tokens), key=len, reverse=True):  # longest (most selective) first
+            token_mask = np.zeros(self.size, dtype=bool)
+            token_mask[self.prefix_rows(token)] = True
+            mask = token_mask if mask is None else (mask & token_mask)
+            if not mask.any():
+                break
+        return mask
+
+    def search_rows(self, query: str) -> List[int]:
+        mask = self.match_mask(query)
+        return list(range(self.size)) if mask is None else self._np.flatnonzero(mask).tolist()
+
+
+# Global instance, loaded (or built) on first use or by the startup warm-up
+@lazy_singleton
+def get_search_index() -> SearchIndex:
+    from app.services.data_service import get_data_service
+
+    catalog = get_data_service().catalog
+    if catalog is None:
+        raise RuntimeError("Catalog snapshot is not available")
+    return SearchIndex(catalog, os.path.join(get_settings().RUNTIME_DIR, "search"))
@@ -0,0 +1,416 @@
+"""
+Similarity Service
+Precomputed "similar products" table: every product's top-K neighbours by a
+weighted cosine similarity over
+
+- category_id            same category scores high
+- features + ai_tags     shared attributes
+- price band             log-spaced bands; neighbouring bands count half
+- name + description     TF-IDF over hashed word buckets
+
+Each block is hashed into a fixed number of dimensions (crc32, so it is stable
+across processes) and normalized separately, so a product's vector depends on
+nothing but its own fields and the IDF weights fixed at build time. That is what
+lets changed products be re-scored without rebuilding the whole table.
+
+The table is two N x K arrays (int32 neighbour rows, float16 scores) stored next
+to the catalog snapshot (see index_files) and memory-mapped read-only, so all
+workers share one copy and a lookup is O(K). It is rebuilt whenever the
+snapshot changes; the build is O(N^2) dot products (about 2 CPU-minutes per
+100k products), so run it at deploy time via scripts/build_catalog_snapshot.py
+rather than at boot.
+
+Imported catalog segments are applied with update() as they are warmed (see
+catalog_sync.warm_segment), under the build lock, and published as a new
+version of the table; other workers notice the new manifest on their next
+lookup and map it. A rebuild re-applies every live segment.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.services.catalog_store import SharedCatalog, build_lock
+from app.services.index_files import load_index, save_arrays
+
+CATEGORY_DIMS = 64
+TAG_DIMS = 64
+PRICE_BANDS = (25, 50, 100, 200, 400, 800)  # upper edges; the last band is open-ended
+TEXT_DIMS = 256
+
+# Share of the final score contributed by each block (they sum to 1, so scores are in [0, 1])
+BLOCK_WEIGHTS = {"category": 0.3, "tags": 0.25, "price": 0.15, "text": 0.3}
+
+# Similarity cells computed per batch (rows x catalog size); bounds peak memory at ~64 MB
+BATCH_CELLS = 16_000_000
+
+# Product fields the vectors are built from
+FEATURE_FIELDS = ("name", "description", "category_id", "features", "ai_tags", "price")
+
+_BLOCK_DIMS = {"category": CATEGORY_DIMS, "tags": TAG_DIMS, "price": len(PRICE_BANDS) + 1, "text": TEXT_DIMS}
+_BLOCKS: Dict[str, slice] = {}
+_offset = 0
+for _name, _dims in _BLOCK_DIMS.items():
+    _BLOCKS[_name] = slice(_offset, _offset + _dims)
+    _offset += _dims
+DIMS = _offset
+
+# Stored tables are only reused when they were built with the same layout
+LAYOUT = repr((1, _BLOCK_DIMS, BLOCK_WEIGHTS, PRICE_BANDS))
+
+_TOKEN = re.compile(r"[a-z0-9]{3,}")
+_STOPWORDS = frozenset("the and for with you your this that are from into our its yet all any".split())
+
+
+@lru_cache(maxsize=65536)
+def _bucket(token: str, dims: int) -> int:
+    return zlib.crc32(token.encode()) % dims
+
+
+class _Table(NamedTuple):
+    """What lookups read, swapped as a whole so a reader never mixes two versions."""
+    neighbors: "np.ndarray"  # N x K int32 rows, -1 = empty slot
+    scores: "np.ndarray"  # N x K float16
+    extra_ids: List[str]  # products added since the snapshot, rows from the snapshot's size on
+    extra_rows: Dict[str, int]
+
+
+def _stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SimilarityIndex:
+    def __init__(self, catalog: SharedCatalog, path: str, k: int = 20, overlay: Optional[Callable[[], Tuple]] = None):
+        """
+        `overlay` returns the (products, removed ids) changed since the snapshot;
+        they're applied right after a full build so a rebuild doesn't lose them.
+        """
+        import numpy as np
+
+        self._np = np
+        self.k = k
+        self.path = path  # prefix for the index files (see index_files)
+        self._products = catalog.tables["products"]
+        self._signature = catalog.signature.hex()
+        self._layout = f"{LAYOUT} k={k}"
+        self._base = len(self._products)
+        self._lock = threading.RLock()
+
+        self._table: Optional[_Table] = None
+        self._stamp = None  # manifest the table was loaded from; another worker's update changes it
+        self._idf = None
+        # Products changed since the snapshot: id -> feature fields (None = removed). Only
+        # update() needs them, so they're parsed from the stored JSON on first use.
+        self._overrides: Optional[Dict[str, Optional[dict]]] = None
+        self._overrides_data = None
+        self._vectors = None  # only materialized while building or updating
+
+        if not self._load():
+            with build_lock(path):
+                # Another worker may have built it while we waited
+                if not self._load():
+                    self.build()
+                    if overlay is not None:
+                        self._apply(*overlay())
+
+    # ==========================================
+    # Rows and feature vectors
+    # ==========================================
+
+    def _row_of(self, product_id: str, table: _Table) -> Optional[int]:
+        row = table.extra_rows.get(product_id)
+        return row if row is not None else self._products.find("id", product_id)
+
+    def _id_of(self, row: int, table: _Table) -> str:
+        return self._products.columns["id"].get(row) if row < self._base else table.extra_ids[row - self._base]
+
+    def _changes(self) -> Dict[str, Optional[dict]]:
+        if self._overrides is None:
+            self._overrides = json.loads(bytes(self._overrides_data)) if self._overrides_data is not None else {}
+        return self._overrides
+
+    def _feature_row(self, row: int, table: _Table, overrides: Dict[str, Optional[dict]]) -> Optional[dict]:
+        product_id = self._id_of(row, table)
+        if product_id in overrides:
+            return overrides[product_id]
+        return {field: self._products.columns[field].get(row) for field in FEATURE_FIELDS}
+    def _fill(self, vector, product: dict):
+        vector[_BLOCKS["category"].start + _bucket(product["category_id"], CATEGORY_DIMS)] = 1.0
+        for tag in list(product.get("features") or []) + list(product.get("ai_tags") or []):
+            vector[_BLOCKS["tags"].start + _bucket(tag.strip().lower(), TAG_DIMS)] = 1.0
+        band = bisect_right(PRICE_BANDS, product["price"])
+        price = _BLOCKS["price"]
+        for neighbour in (band - 1, band + 1):
+            if 0 <= neighbour < price.stop - price.start:
+                vector[price.start + neighbour] = 0.5
+        vector[price.start + band] = 1.0
+        text = f"{product['name']} {product['description']}".lower()
+        for token in _TOKEN.findall(text):
+            if token not in _STOPWORDS:
+                vector[_BLOCKS["text"].start + _bucket(token, TEXT_DIMS)] += 1.0
+
+    def _vectorize(self, products: Iterable[Optional[dict]], count: int):
+        """
+        Vectors for `count` products (None rows stay zero). Computes the IDF
+        weights on the first (full) build and reuses them afterwards.
+        """
+        np = self._np
+        vectors = np.zeros((count, DIMS), dtype=np.float32)
+        for i, product in enumerate(products):
+            if product is not None:
+                self._fill(vectors[i], product)
+
+        text = vectors[:, _BLOCKS["text"]]
+        if self._idf is None:
+            df = np.count_nonzero(text, axis=0)
+            self._idf = (np.log((1 + count) / (1 + df)) + 1).astype(np.float32)
+        np.log1p(text, out=text)
+        text *= self._idf
+
+        # Unit-normalize each block and scale it so dot products are the weighted sum of block cosines
+        for name, columns in _BLOCKS.items():
+            block = vectors[:, columns]
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            np.divide(block, norms, out=block, where=norms > 0)
+            block *= math.sqrt(BLOCK_WEIGHTS[name])
+        return vectors
+
+    def _all_vectors(self):
+        if self._vectors is None:
+            table, overrides = self._table, self._changes()
+            total = self._base + len(table.extra_ids)
+            self._vectors = self._vectorize((self._feature_row(i, table, overrides) for i in range(total)), total)
+        return self._vectors
+
+    # ==========================================
+    # Top-K
+    # ==========================================
+
+    def _select(self, ids, scores):
+        """Best self.k (id, score) pairs per row, best first; empty slots are -1 / 0."""
+        np = self._np
+        width = min(self.k, scores.shape[1])
+        top = np.argpartition(scores, scores.shape[1] - width, axis=1)[:, -width:]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top_ids = ids[top] if ids.ndim == 1 else np.take_along_axis(ids, top, axis=1)
+
+        out_ids = np.full((len(scores), self.k), -1, dtype=np.int32)
+        out_scores = np.zeros((len(scores), self.k), dtype=np.float32)
+        valid = top_scores > 0
+        out_ids[:, :width] = np.where(valid, top_ids, -1)
+        out_scores[:, :width] = np.where(valid, top_scores, 0)
+        return out_ids, out_scores
+
+    def _top_k(self, vectors, alive, rows):
+        """Full neighbour lists for `rows`, scored against the whole catalog in batches."""
+        np = self._np
+        n = len(vectors)
+        neighbors = np.full((len(rows), self.k), -1, dtype=np.int32)
+        scores = np.zeros((len(rows), self.k), dtype=np.float32)
+        if n == 0 or len(rows) == 0:
+            return neighbors, scores
+        all_ids = np.arange(n, dtype=np.int32)
+        batch = max(1, BATCH_CELLS // n)
+        for start in range(0, len(rows), batch):
+            chunk = rows[start:start + batch]
+            sims = vectors[chunk] @ vectors.T
+            sims[np.arange(len(chunk)), chunk] = -1  # a product is never its own neighbour
+            sims[:, ~alive] = -1
+            neighbors[start:start + len(chunk)], scores[start:start + len(chunk)] = self._select(all_ids, sims)
+        return neighbors, scores
+
+    def build(self):
+        """Scores the whole catalog from the snapshot and publishes the table."""
+        np = self._np
+        with self._lock:
+            empty = np.zeros((0, self.k), dtype=np.int32)
+            self._table = _Table(empty, empty.astype(np.float16), [], {})
+            self._overrides, self._idf, self._vectors = {}, None, None
+            vectors = self._all_vectors()
+            alive = np.ones(len(vectors), dtype=bool)
+            neighbors, scores = self._top_k(vectors, alive, np.arange(len(vectors)))
+            self._table = _Table(neighbors, scores.astype(np.float16), [], {})
+            self._save()
+            self._vectors = None  # ~1.5 KB per product; rebuilt on demand by update()
+
+    def update(self, products: Sequence[dict] = (), removed: Sequence[str] = ()):
+        """
+        Applies added/changed products and removals without a full rebuild:
+        changed products get fresh lists, lists that contained a changed product
+        are recomputed, and every other list only merges the changed products in.
+        Publishes the new table to every worker (they reload it on their next lookup).
+        """
+        with build_lock(self.path), self._lock:
+            self._refresh()  # start from the latest table, another worker may have updated it
+            self._apply(products, removed)
+
+    def _apply(self, products: Sequence[dict], removed: Sequence[str]):
+        try:
+            self._apply_changes(products, removed)
+        except BaseException:
+            self._vectors = None  # may be half-updated
+            raise
+
+    def _apply_changes(self, products: Sequence[dict], removed: Sequence[str]):
+        np = self._np
+        vectors = self._all_vectors()
+        table = self._table
+        overrides = dict(self._changes())
+        extra_ids = list(table.extra_ids)
+        extra_rows = dict(table.extra_rows)
+        changed: List[int] = []
+        added = 0
+        for product in products:
+            features = {field: product.get(field) for field in FEATURE_FIELDS}
+            row = extra_rows.get(product["id"])
+            if row is None:
+                row = self._products.find("id", product["id"])
+            if row is None:
+                row = self._base + len(extra_ids)
+                extra_ids.append(product["id"])
+                extra_rows[product["id"]] = row
+                added += 1
+            overrides[product["id"]] = features
+            changed.append(row)
+        for product_id in removed:
+            row = self._row_of(product_id, table)
+            if row is not None:
+                overrides[product_id] = None
+                changed.append(row)
+        if not changed:
+            return
+
+        if added:
+            vectors = self._vectors = np.vstack([vectors, np.zeros((added, DIMS), dtype=np.float32)])
+        new_table = table._replace(extra_ids=extra_ids, extra_rows=extra_rows)
+        changed_rows = np.unique(np.array(changed, dtype=np.int64))
+        vectors[changed_rows] = self._vectorize(
+            (self._feature_row(int(r), new_table, overrides) for r in changed_rows), len(changed_rows)
+        )
+        alive = np.ones(len(vectors), dtype=bool)
+        for product_id, features in overrides.items():
+            if features is None:
+                alive[self._row_of(product_id, new_table)] = False
+
+        padding = len(vectors) - len(table.neighbors)
+        neighbors = np.vstack([table.neighbors, np.full((padding, self.k), -1, dtype=np.int32)])
+        scores = np.vstack([table.scores, np.zeros((padding, self.k), dtype=np.float16)]).astype(np.float32)
+
+        # Lists that mention a changed product may lose it, so they're recomputed in full
+        stale = np.isin(neighbors, changed_rows).any(axis=1)
+        stale[changed_rows] = True
+        stale_rows = np.flatnonzero(stale)
+        neighbors[stale_rows], scores[stale_rows] = self._top_k(vectors, alive, stale_rows)
+
+        # Everyone else keeps their list and only considers the changed products as newcomers
+        others = np.flatnonzero(~stale & alive)
+        candidates = vectors[changed_rows]
+        batch = max(1, BATCH_CELLS // (self.k + len(changed_rows)))
+        for start in range(0, len(others), batch):
+            chunk = others[start:start + batch]
+            sims = vectors[chunk] @ candidates.T
+            sims[:, ~alive[changed_rows]] = -1
+            ids = np.hstack([neighbors[chunk], np.broadcast_to(changed_rows.astype(np.int32), sims.shape)])
+            merged = np.hstack([np.where(neighbors[chunk] >= 0, scores[chunk], -1), sims])
+            neighbors[chunk], scores[chunk] = self._select(ids, merged)
+
+        neighbors[~alive] = -1
+        scores[~alive] = 0
+        self._overrides = overrides
+        self._table = new_table._replace(neighbors=neighbors, scores=scores.astype(np.float16))
+        self._save()
+
+    # ==========================================
+    # Storage
+    # ==========================================
+
+    def _load(self) -> bool:
+        np = self._np
+        stamp = _stamp(self.path + ".json")
+        loaded = load_index(self.path, self._signature, self._layout)
+        if loaded is None:
+            return False
+        arrays, meta = loaded
+        extra_ids = meta.get("extra_ids", [])
+        with self._lock:
+            self._idf = np.asarray(arrays["idf"])
+            self._overrides, self._overrides_data, self._vectors = None, arrays["overrides"], None
+            self._table = _Table(
+                arrays["neighbors"], arrays["scores"],
+                extra_ids, {pid: self._base + i for i, pid in enumerate(extra_ids)},
+            )
+            self._stamp = stamp
+        return True
+
+    def _refresh(self):
+        """Reloads the table if another worker has published a newer one; a single stat otherwise."""
+        stamp = _stamp(self.path + ".json")
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp and not self._load():
+                    self._stamp = stamp  # not ours to use (e.g. a newer snapshot's); keep serving this one
+
+    def _save(self):
+        np = self._np
+        table = self._table
+        save_arrays(self.path, self._signature, self._layout, {
+            "neighbors": table.neighbors,
+            "scores": table.scores,
+            "idf": self._idf,
+            "overrides": np.frombuffer(json.dumps(self._changes()).encode(), dtype=np.uint8),
+        }, meta={"extra_ids": table.extra_ids})
+        self._stamp = _stamp(self.path + ".json")
+
+    # ==========================================
+    # Lookups
+    # ==========================================
+
+    def similar(self, product_id: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(product_id, score) for the product's nearest neighbours, best first. O(K)."""
+        self._refresh()
+        table = self._table
+        row = self._row_of(product_id, table)
+        if row is None or row >= len(table.neighbors):
+            return []
+        limit = min(limit or self.k, self.k)
+        results = []
+        for neighbour, score in zip(table.neighbors[row, :limit].tolist(), table.scores[row, :limit].tolist()):
+            if neighbour < 0:
+                break
+            results.append((self._id_of(neighbour, table), round(score, 4)))
+        return results
+
+    @property
+    def size_bytes(self) -> int:
+        return self._table.neighbors.nbytes + self._table.scores.nbytes
+
+
+# Global instance, loaded (or built) on first use or by the startup warm-up
+@lazy_singleton
+def get_similarity_service() -> SimilarityIndex:
+    from app.services.data_service import get_data_service
+
+    catalog = get_data_service().catalog
+    if catalog is None:
+        raise RuntimeError("Catalog snapshot is not available")
+    settings = get_settings()
+    segments = get_data_service().segments
+    return SimilarityIndex(
+        catalog, os.path.join(settings.RUNTIME_DIR, "similar"), k=settings.SIMILAR_PRODUCTS_K,
+        overlay=segments.changes if segments is not None else None,
+    )
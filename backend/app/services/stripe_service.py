@@ -0,0 +1,161 @@
+"""
+Stripe Service
+Runs the blocking Stripe SDK on a bounded thread pool so checkout calls
+never stall the event loop.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+
+
+class PaymentError(Exception):
+    """Raised when Stripe rejects a request (card errors, invalid params, etc.)."""
+
+
+def metadata_value(stripe_object, key: str) -> Optional[str]:
+    """Reads a metadata key from a Stripe object (StripeObject isn't a dict in newer SDKs)."""
+    metadata = getattr(stripe_object, "metadata", None)
+    return metadata[key] if metadata and key in metadata else None
+
+
+class StripeService:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_base: Optional[str] = None,
+        max_workers: int = 8,
+        max_network_retries: int = 2,
+        session_cache_ttl: float = 5.0,
+    ):
+        # Imported here so the SDK is only loaded once checkout is actually used
+        import stripe
+
+        self._stripe = stripe
+        stripe.api_key = api_key
+        if api_base:
+            stripe.api_base = api_base.rstrip("/")
+        # The SDK re-sends the same idempotency key on its own retries
+        stripe.max_network_retries = max_network_retries
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stripe")
+        self._session_cache = TTLCache(ttl=session_cache_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._stripe.api_key)
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run a blocking SDK call on the Stripe pool, translating SDK errors."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        except self._stripe.error.StripeError as e:
+            raise PaymentError(str(e)) from e
+
+    async def create_checkout_session(
+        self,
+        line_items: List[Dict[str, Any]],
+        success_url: str,
+        cancel_url: str,
+        idempotency_key: str,
+        metadata: Optional[Dict[str, str]] = None,
+        expires_at: Optional[int] = None,
+    ):
+        params = {"expires_at": expires_at} if expires_at else {}
+        return await self._call(
+            self._stripe.checkout.Session.create,
+            payment_method_types=["card"],
+            line_items=line_items,
+            mode="payment",
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata=metadata or {},
+            idempotency_key=idempotency_key,
+            **params,
+        )
+
+    async def create_payment_intent(self, amount: int, currency: str, idempotency_key: str):
+        return await self._call(
+            self._stripe.PaymentIntent.create,
+            amount=amount,
+            currency=currency,
+            automatic_payment_methods={"enabled": True},
+            idempotency_key=idempotency_key,
+        )
+
+    async def get_session_status(self, session_id: str) -> Dict[str, Any]:
+        """
+        Returns a summary of a checkout session, including the stock
+        reservation_id recorded in its metadata.
+        Results are cached briefly and concurrent lookups for the same session
+        share a single upstream request, since the success page polls this.
+        """
+        while True:
+            cached = self._session_cache.get(session_id)
+            if cached is not None:
+                return cached
+
+            pending = self._inflight.get(session_id)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The caller that owned the lookup went away; if we didn't, look it up ourselves
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[session_id] = future
+        try:
+            session = await self._call(self._stripe.checkout.Session.retrieve, session_id)
+            status = {
+                "status": session.status,
+                "payment_status": session.payment_status,
+                "customer_email": session.customer_details.email if session.customer_details else None,
+                "amount_total": session.amount_total / 100 if session.amount_total else 0,
+                "reservation_id": metadata_value(session, "reservation_id"),
+            }
+            self._session_cache.set(session_id, status)
+            future.set_result(status)
+            return status
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so the loop doesn't warn when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            # Cancelled before a result (e.g. the client disconnected): don't leave waiters hanging
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(session_id, None)
+
+    def construct_event(self, payload: bytes, signature: Optional[str], secret: str):
+        """Verifies a webhook's Stripe-Signature and parses the event (CPU only, no API call)."""
+        try:
+            return self._stripe.Webhook.construct_event(payload, signature, secret)
+        except (ValueError, self._stripe.error.SignatureVerificationError) as e:
+            raise PaymentError(f"Invalid webhook: {e}") from e
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance, created on the first checkout request
+@lazy_singleton
+def get_stripe_service() -> StripeService:
+    settings = get_settings()
+    return StripeService(
+        api_key=settings.STRIPE_SECRET_KEY,
+        api_base=settings.STRIPE_API_BASE,
+        max_workers=settings.STRIPE_MAX_WORKERS,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        session_cache_ttl=settings.STRIPE_SESSION_CACHE_TTL,
+    )
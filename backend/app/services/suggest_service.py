@@ -0,0 +1,272 @@
+"""
+Suggest Service
+Search-box autocomplete over product names/slugs, feature keywords, ai_tags and
+category names, derived from the catalog snapshot (rebuilt with it).
+
+Each suggestion ("entry") is indexed under every word it contains, so "boo"
+completes "TrailBlazer Pro Boots". The index is a sorted array of keys:
+
+    keys        normalized text from each word onward, sorted (fixed-width bytes)
+    key_entry   the entry each key belongs to
+    key_weight  that entry's popularity (reviews_count and rating)
+
+A prefix is two binary searches into `keys`; the best entries in the matching
+range are picked by weight. Short prefixes match huge ranges, so the top
+entries of every prefix matching more than SCAN_LIMIT keys are precomputed
+(`heavy`); every other range is small enough to rank on the fly.
+
+Imported catalog segments get an index of their own, stored next to the
+segment (built by catalog_sync.warm_segment, or on first use). A lookup asks
+every part for its best entries, skipping products a newer part has replaced
+or deleted, and merges them by weight.
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Tuple
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+from app.core.models import Suggestion
+from app.services.catalog_store import SharedCatalog
+from app.services.index_files import load_or_build
+
+KEY_BYTES = 32  # typed prefixes longer than this are truncated
+MAX_SUGGESTIONS = 20
+SCAN_LIMIT = 1024
+
+PRODUCT, CATEGORY, FEATURE, TAG = range(4)
+KINDS = {PRODUCT: "product", CATEGORY: "category", FEATURE: "feature", TAG: "tag"}
+
+LAYOUT = repr((2, KEY_BYTES, MAX_SUGGESTIONS, SCAN_LIMIT))
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _word_suffixes(text: str) -> List[bytes]:
+    words = normalize(text).split()
+    return [" ".join(words[i:]).encode()[:KEY_BYTES] for i in range(len(words))]
+
+
+def _popularity(reviews_count: int, rating: float) -> float:
+    return math.log1p(reviews_count) * rating / 5
+
+
+def _top_entries(np, key_entry, key_weight, lo: int, hi: int, k: int, dead=None):
+    """The k best distinct entries among keys[lo:hi], best first, leaving out `dead` ones."""
+    order = np.argsort(-key_weight[lo:hi], kind="stable")
+    entries = key_entry[lo:hi][order]
+    if dead is not None:
+        entries = entries[~dead[entries]]
+    _, first = np.unique(entries, return_index=True)
+    return entries[np.sort(first)][:k]
+
+
+def _build(catalog: SharedCatalog) -> Dict[str, "np.ndarray"]:
+    import numpy as np
+
+    products = catalog.tables["products"]
+    columns = products.columns
+    popularity = [
+        _popularity(reviews, rating)
+        for reviews, rating in zip(columns["reviews_count"].values, columns["rating"].values)
+    ]
+
+    # (kind, normalized display text) -> [ref, weight]; duplicates collapse into their best product
+    entries: Dict[Tuple[int, str], List] = {}
+    terms: List[str] = []  # display text of feature/tag entries; their ref indexes this
+
+    def add(kind: int, text: str, ref, weight: float):
+        key = (kind, normalize(text))
+        if not key[1]:
+            return
+        entry = entries.get(key)
+        if entry is None:
+            if kind in (FEATURE, TAG):
+                ref = len(terms)
+                terms.append(text.strip())
+            entries[key] = [ref, weight]
+        elif weight > entry[1]:
+            entry[1] = weight
+            if kind == PRODUCT:
+                entry[0] = ref
+
+    category_weight: Dict[str, float] = {}
+    for row in range(len(products)):
+        weight = popularity[row]
+        add(PRODUCT, columns["name"].get(row), row, weight)
+        for feature in columns["features"].get(row):
+            add(FEATURE, feature, None, weight)
+        for tag in columns["ai_tags"].get(row):
+            add(TAG, tag, None, weight)
+        category_id = columns["category_id"].get(row)
+        category_weight[category_id] = max(category_weight.get(category_id, 0.0), weight)
+
+    # Segments hold products only; categories come from the snapshot
+    categories = catalog.tables.get("categories")
+    for row in range(len(categories) if categories is not None else 0):
+        weight = category_weight.get(categories.columns["id"].get(row), 0.0)
+        add(CATEGORY, categories.columns["name"].get(row), row, weight)
+
+    keys: List[bytes] = []
+    key_entry: List[int] = []
+    entry_kind, entry_ref, entry_weight = [], [], []
+    for n, ((kind, _), (ref, weight)) in enumerate(entries.items()):
+        entry_kind.append(kind)
+        entry_ref.append(ref)
+        entry_weight.append(weight)
+        if kind == PRODUCT:
+            # Slugs usually repeat the name, but index them too in case they don't
+            texts = [columns["name"].get(ref), columns["slug"].get(ref)]
+        elif kind == CATEGORY:
+            texts = [categories.columns["name"].get(ref), categories.columns["slug"].get(ref)]
+        else:
+            texts = [terms[ref]]
+        for key in {suffix for text in texts for suffix in _word_suffixes(text)}:
+            keys.append(key)
+            key_entry.append(n)
+
+    keys_array = np.array(keys, dtype=f"S{KEY_BYTES}")
+    order = np.argsort(keys_array, kind="stable")
+    keys_array = keys_array[order]
+    key_entry_array = np.array(key_entry, dtype=np.int32)[order]
+    key_weight_array = np.array(entry_weight, dtype=np.float32)[key_entry_array]
+
+    # Precompute the answers for every prefix whose range is too big to rank per request
+    key_bytes = keys_array.view(np.uint8).reshape(len(keys_array), KEY_BYTES)
+    heavy, heavy_top = [], []
+    stack = [b""]
+    while stack:
+        prefix = stack.pop()
+        lo = np.searchsorted(keys_array, prefix, side="left")
+        hi = np.searchsorted(keys_array, prefix + b"\xff", side="left")
+        if hi - lo <= SCAN_LIMIT:
+            continue
+        if prefix:
+            top = np.full(MAX_SUGGESTIONS, -1, dtype=np.int32)
+            best = _top_entries(np, key_entry_array, key_weight_array, lo, hi, MAX_SUGGESTIONS)
+            top[:len(best)] = best
+            heavy.append(prefix)
+            heavy_top.append(top)
+        if len(prefix) < KEY_BYTES:
+            stack.extend(prefix + bytes([c]) for c in np.unique(key_bytes[lo:hi, len(prefix)]) if c)
+
+    heavy_array = np.array(heavy, dtype=f"S{KEY_BYTES}")
+    heavy_order = np.argsort(heavy_array, kind="stable")
+    return {
+        "keys": keys_array,
+        "key_entry": key_entry_array,
+        "key_weight": key_weight_array,
+        "entry_kind": np.array(entry_kind, dtype=np.uint8),
+        "entry_ref": np.array(entry_ref, dtype=np.int32),
+        "entry_weight": np.array(entry_weight, dtype=np.float32),
+        "terms": np.array([t.encode() for t in terms], dtype=bytes),
+        "heavy": heavy_array[heavy_order],
+        "heavy_top": np.array(heavy_top, dtype=np.int32).reshape(-1, MAX_SUGGESTIONS)[heavy_order],
+    }
+
+
+class SuggestIndex:
+    def __init__(self, catalog: SharedCatalog, path: str):
+        import numpy as np
+
+        self._np = np
+        self._products = catalog.tables["products"]
+        self._categories = catalog.tables.get("categories")
+        arrays = load_or_build(catalog, path, LAYOUT, _build)
+        self._keys = arrays["keys"]
+        self._key_entry = arrays["key_entry"]
+        self._key_weight = arrays["key_weight"]
+        self._entry_kind = arrays["entry_kind"]
+        self._entry_ref = arrays["entry_ref"]
+        self._entry_weight = arrays["entry_weight"]
+        self._terms = arrays["terms"]
+        self._heavy = arrays["heavy"]
+        self._heavy_top = arrays["heavy_top"]
+        self._dead = None  # (live mask, entries of products it masks out), for the last mask seen
+
+    def _entry(self, n: int) -> Suggestion:
+        kind, ref = int(self._entry_kind[n]), int(self._entry_ref[n])
+        if kind == PRODUCT:
+            columns = self._products.columns
+            return Suggestion(
+                text=columns["name"].get(ref), kind=KINDS[kind],
+                product_id=columns["id"].get(ref), slug=columns["slug"].get(ref),
+            )
+        if kind == CATEGORY:
+            columns = self._categories.columns
+            return Suggestion(text=columns["name"].get(ref), kind=KINDS[kind], slug=columns["slug"].get(ref))
+        return Suggestion(text=self._terms[ref].decode(), kind=KINDS[kind])
+
+    def _dead_entries(self, live):
+        """Entries pointing at product rows `live` masks out (None when every row is live)."""
+        if live is None:
+            return None
+        cached = self._dead
+        if cached is not None and cached[0] is live:
+            return cached[1]
+        np = self._np
+        products = self._entry_kind == PRODUCT
+        dead = np.zeros(len(self._entry_kind), dtype=bool)
+        dead[products] = ~live[self._entry_ref[products]]
+        self._dead = (live, dead)
+        return dead
+
+    def ranked(self, prefix: bytes, limit: int, live=None) -> List[Tuple[float, int]]:
+        """(weight, entry) of the best entries completing a normalized prefix, skipping products `live` masks out."""
+        np = self._np
+        dead = self._dead_entries(live)
+        i = np.searchsorted(self._heavy, prefix)
+        best = None
+        if i < len(self._heavy) and self._heavy[i] == prefix:
+            top = self._heavy_top[i]
+            top = top[top >= 0]
+            live_top = top if dead is None else top[~dead[top]]
+            # Past the precomputed list only if dead entries left it short and there are more
+            if len(live_top) >= limit or len(top) < MAX_SUGGESTIONS:
+                best = live_top[:limit]
+        if best is None:
+            lo = np.searchsorted(self._keys, prefix, side="left")
+            hi = np.searchsorted(self._keys, prefix + b"\xff", side="left")
+            best = _top_entries(np, self._key_entry, self._key_weight, lo, hi, limit, dead)
+        return [(float(self._entry_weight[n]), int(n)) for n in best]
+
+    def suggest(self, query: str, limit: int = 10, segments=None) -> List[Suggestion]:
+        """
+        Top completions for a typed prefix, most popular first. With `segments`,
+        imported products are included and replaced or deleted ones left out.
+        """
+        prefix = normalize(query).encode()[:KEY_BYTES]
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        if segments is None or not segments.segment_count:
+            return [self._entry(n) for _, n in self.ranked(prefix, limit)]
+
+        # Best version of each suggestion across parts; equal weights keep the older part's
+        found: Dict[Tuple[str, str], Tuple[float, Suggestion]] = {}
+        for part in segments.current():
+            index = self if part.is_base else part.suggest_index()
+            for weight, n in index.ranked(prefix, limit, part.live):
+                suggestion = index._entry(n)
+                key = (suggestion.kind, normalize(suggestion.text))
+                if key not in found or weight > found[key][0]:
+                    found[key] = (weight, suggestion)
+        best = sorted(found.values(), key=lambda item: -item[0])
+        return [suggestion for _, suggestion in best[:limit]]
+
+
+# Global instance, loaded (or built) on first use or by the startup warm-up
+@lazy_singleton
+def get_suggest_service() -> SuggestIndex:
+    from app.services.data_service import get_data_service
+
+    catalog = get_data_service().catalog
+    if catalog is None:
+        raise RuntimeError("Catalog snapshot is not available")
+    return SuggestIndex(catalog, os.path.join(get_settings().RUNTIME_DIR, "suggest"))
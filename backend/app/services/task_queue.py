@@ -0,0 +1,272 @@
+"""
+Task Queue
+Background work a request shouldn't wait for (warming a freshly imported
+catalog segment, analytics, ...). Endpoints and agent nodes call enqueue() and
+return; a bounded pool of worker coroutines on the server's event loop runs
+the tasks by priority and retries failures with exponential backoff.
+
+Tasks are journaled in <RUNTIME_DIR>/tasks.db before enqueue() returns, so they
+are durable. A task still queued (or running, or waiting for a retry) when its
+worker exits is claimed by the next worker on this host that starts or polls
+for orphans. Shutdown drains the queue for up to TASK_DRAIN_TIMEOUT seconds,
+and whatever is left stays in the journal. Tasks that run out of retries stay
+there too, marked failed with their last error.
+
+Handlers are registered by name with @task and take JSON-serializable keyword
+arguments. Since a task can run again after a crash, handlers must be
+idempotent. Blocking handlers run on a thread, async ones on the event loop.
+"""
+
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_singleton
+
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = 0, 5, 9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id         TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    module     TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    priority   INTEGER NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    owner      INTEGER NOT NULL,
+    status     TEXT NOT NULL DEFAULT 'queued',
+    error      TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_owner ON tasks(status, owner);
+"""
+
+
+class TaskSpec(NamedTuple):
+    fn: Callable
+    retries: int
+    priority: int
+
+
+_HANDLERS: Dict[str, TaskSpec] = {}
+
+
+def task(name: str, retries: Optional[int] = None, priority: int = PRIORITY_NORMAL):
+    """Registers a handler under `name` (retries defaults to TASK_MAX_RETRIES)."""
+    def register(fn):
+        _HANDLERS[name] = TaskSpec(fn, get_settings().TASK_MAX_RETRIES if retries is None else retries, priority)
+        fn.task_name = name
+        return fn
+    return register
+
+
+class _Item(NamedTuple):
+    id: str
+    name: str
+    module: str
+    kwargs: Dict[str, Any]
+    attempts: int
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TaskQueue:
+    def __init__(
+        self,
+        path: str,
+        workers: int = 4,
+        retry_delay: float = 1.0,
+        drain_timeout: float = 10.0,
+        reclaim_interval: float = 60.0,
+    ):
+        self.path = path
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.reclaim_interval = reclaim_interval
+        self.owner = os.getpid()
+        self.counters = {"enqueued": 0, "done": 0, "retried": 0, "failed": 0, "recovered": 0}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()  # FIFO within a priority
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, as in OrderStore
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    # ==========================================
+    # Producers (any thread)
+    # ==========================================
+
+    def enqueue(self, name: str, /, priority: Optional[int] = None, **kwargs) -> str:
+        """Journals a task and hands it to the workers; returns its id. Thread-safe."""
+        spec = _HANDLERS.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown task {name!r}")
+        priority = spec.priority if priority is None else priority
+        item = _Item(uuid.uuid4().hex, name, spec.fn.__module__, kwargs, 0)
+        self._connect().execute(
+            "INSERT INTO tasks (id, name, module, payload, priority, owner, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (item.id, name, item.module, json.dumps(kwargs), priority, self.owner, time.time()),
+        )
+        self.counters["enqueued"] += 1
+        loop = self._loop
+        if loop is not None:
+            # Not started (scripts, tests without lifespan): the next server start runs it
+            loop.call_soon_threadsafe(self._push, priority, item)
+        return item.id
+
+    def _push(self, priority: int, item: _Item):
+        if self._queue is not None:
+            self._queue.put_nowait((priority, next(self._seq), item))
+
+    # ==========================================
+    # Workers (event loop)
+    # ==========================================
+
+    async def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reclaim_periodically()))
+        # Nothing of ours is queued in memory yet, so our own journaled tasks are orphans too
+        await self._reclaim(include_own=True)
+
+    async def stop(self):
+        """Drains queued tasks for up to drain_timeout seconds, then stops the workers."""
+        if self._loop is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Task queue: {self._queue.qsize()} tasks left for the next start")
+        for worker in self._tasks:
+            worker.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._loop, self._queue, self._tasks = None, None, []
+
+    async def _work(self):
+        while True:
+            priority, _, item = await self._queue.get()
+            try:
+                await self._run(priority, item)
+            except Exception as e:  # journal errors; the task stays queued for the next start
+                print(f"Task queue error on {item.name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, priority: int, item: _Item):
+        try:
+            spec = _HANDLERS.get(item.name)
+            if spec is None:
+                importlib.import_module(item.module)  # registers the handler
+                spec = _HANDLERS[item.name]
+            if asyncio.iscoroutinefunction(spec.fn):
+                await spec.fn(**item.kwargs)
+            else:
+                await asyncio.to_thread(spec.fn, **item.kwargs)
+        except Exception as e:
+            attempts = item.attempts + 1
+            retries = spec.retries if item.name in _HANDLERS else 0
+            if attempts > retries:
+                self.counters["failed"] += 1
+                print(f"Task {item.name} failed after {attempts} attempts: {e}")
+                await asyncio.to_thread(self._execute, "UPDATE tasks SET status = 'failed', attempts = ?, error = ? WHERE id = ?", (attempts, repr(e), item.id))
+                return
+            self.counters["retried"] += 1
+            await asyncio.to_thread(self._execute, "UPDATE tasks SET attempts = ? WHERE id = ?", (attempts, item.id))
+            self._loop.call_later(self.retry_delay * 2 ** (attempts - 1), self._push, priority, item._replace(attempts=attempts))
+            return
+        self.counters["done"] += 1
+        await asyncio.to_thread(self._execute, "DELETE FROM tasks WHERE id = ?", (item.id,))
+
+    def _execute(self, sql: str, params=()):
+        self._connect().execute(sql, params)
+
+    def _claim_orphans(self, include_own: bool) -> List[tuple]:
+        """Takes over queued tasks whose worker process has exited."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")  # two workers starting together can't both claim a task
+        try:
+            owners = [row[0] for row in conn.execute("SELECT DISTINCT owner FROM tasks WHERE status = 'queued'")]
+            dead = [owner for owner in owners if (owner == self.owner and include_own) or not (owner == self.owner or _alive(owner))]
+            rows = []
+            for owner in dead:
+                rows += conn.execute(
+                    "SELECT id, name, module, payload, priority, attempts FROM tasks WHERE status = 'queued' AND owner = ?", (owner,)
+                ).fetchall()
+                conn.execute("UPDATE tasks SET owner = ? WHERE status = 'queued' AND owner = ?", (self.owner, owner))
+            conn.execute("COMMIT")
+            return rows
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _reclaim(self, include_own: bool = False):
+        try:
+            rows = await asyncio.to_thread(self._claim_orphans, include_own)
+        except sqlite3.Error as e:
+            print(f"Task queue: could not reclaim orphaned tasks: {e}")
+            return
+        for task_id, name, module, payload, priority, attempts in rows:
+            self._push(priority, _Item(task_id, name, module, json.loads(payload), attempts))
+        if rows:
+            self.counters["recovered"] += len(rows)
+            print(f"Task queue: recovered {len(rows)} journaled tasks")
+
+    async def _reclaim_periodically(self):
+        while True:
+            await asyncio.sleep(self.reclaim_interval)
+            await self._reclaim()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "queued": self._queue.qsize() if self._queue is not None else 0, "workers": self.workers}
+
+
+# Global instance, started and drained by the app lifespan
+@lazy_singleton
+def get_task_queue() -> TaskQueue:
+    settings = get_settings()
+    return TaskQueue(
+        os.path.join(settings.RUNTIME_DIR, "tasks.db"),
+        workers=settings.TASK_WORKERS,
+        retry_delay=settings.TASK_RETRY_DELAY,
+        drain_timeout=settings.TASK_DRAIN_TIMEOUT,
+    )
+
+
+def enqueue(name: str, /, priority: Optional[int] = None, **kwargs) -> str:
+    """Queues follow-up work and returns immediately (see TaskQueue.enqueue)."""
+    return get_task_queue().enqueue(name, priority=priority, **kwargs)
@@ -0,0 +1,171 @@
+"""
+Vector Index
+The FAISS index behind product vector search. Vectors are unit length and the
+metric is inner product (= cosine similarity); ids are insertion order, i.e.
+snapshot rows. Index types:
+
+    flat    exact scan, O(N) per query. Best below ~50k vectors.
+    hnsw    graph search, ~log N per query; efSearch trades recall for latency.
+            Memory is the raw vectors plus ~hnsw_m * 8 bytes of links each.
+    ivf     k-means inverted lists; a query scans nprobe of nlist lists.
+    ivfpq   ivf over product-quantized vectors (pq_m bytes each instead of
+            dim * 4), for catalogs too big to keep raw vectors in memory.
+    auto    flat below AUTO_FLAT_MAX vectors, hnsw below AUTO_HNSW_MAX, else ivfpq.
+
+Filtered searches hand FAISS an ID selector. A selector that allows only a few
+rows starves the approximate indexes (most probed lists / graph neighbours are
+filtered out), so filters allowing at most EXACT_FILTER_ROWS rows are scored
+exactly over those rows instead.
+"""
+
+import math
+from typing import Optional
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+AUTO_FLAT_MAX = 50_000
+AUTO_HNSW_MAX = 2_000_000
+EXACT_FILTER_ROWS = 10_000
+# IVF/PQ training sample: enough points per centroid, capped to keep training time bounded
+TRAIN_POINTS_PER_LIST = 64
+MAX_TRAIN_POINTS = 200_000
+# PQ trains 256 centroids per sub-quantizer; below this many vectors ivfpq falls back to ivf
+MIN_PQ_POINTS = 256 * 39
+
+
+class VectorIndexConfig:
+    def __init__(
+        self,
+        index_type: str = "auto",
+        nlist: int = 0,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        ef_search: int = 64,
+        pq_m: int = 32,
+    ):
+        if index_type != "auto" and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type {index_type!r} (expected auto or one of {', '.join(INDEX_TYPES)})")
+        self.index_type = index_type
+        self.nlist = nlist  # 0 = ~4 * sqrt(N)
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+
+    @classmethod
+    def from_settings(cls, settings) -> "VectorIndexConfig":
+        return cls(
+            index_type=settings.VECTOR_INDEX,
+            nlist=settings.VECTOR_IVF_NLIST,
+            nprobe=settings.VECTOR_IVF_NPROBE,
+            hnsw_m=settings.VECTOR_HNSW_M,
+            ef_construction=settings.VECTOR_HNSW_EF_CONSTRUCTION,
+            ef_search=settings.VECTOR_HNSW_EF_SEARCH,
+            pq_m=settings.VECTOR_PQ_M,
+        )
+
+    def resolve(self, n: int) -> str:
+        if self.index_type != "auto":
+            return self.index_type
+        if n < AUTO_FLAT_MAX:
+            return "flat"
+        return "hnsw" if n < AUTO_HNSW_MAX else "ivfpq"
+
+    def lists_for(self, n: int) -> int:
+        # FAISS wants >= 39 training points per centroid
+        return max(1, min(self.nlist or int(4 * math.sqrt(n)), n // 39))
+
+
+class VectorIndex:
+    def __init__(self, vectors: "np.ndarray", config: Optional[VectorIndexConfig] = None):
+        import faiss  # type: ignore
+        import numpy as np
+
+        self._faiss = faiss
+        self._np = np
+        self.config = config or VectorIndexConfig()
+        n, dim = vectors.shape
+        self.kind = self.config.resolve(n)
+        if self.kind == "ivfpq" and n < MIN_PQ_POINTS:
+            self.kind = "ivf"
+
+        if self.kind == "flat":
+            self.index = faiss.IndexFlatIP(dim)
+        elif self.kind == "hnsw":
+            self.index = faiss.IndexHNSWFlat(dim, self.config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = self.config.ef_construction
+        else:
+            nlist = self.config.lists_for(n)
+            spec = f"IVF{nlist},Flat" if self.kind == "ivf" else f"IVF{nlist},PQ{self.config.pq_m}"
+            self.index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+            if self.kind == "ivfpq":
+                # Polysemous codes only help Hamming-distance filtering, which we don't use, and dominate training time
+                self.index.do_polysemous_training = False
+            sample = min(n, max(nlist * TRAIN_POINTS_PER_LIST, MIN_PQ_POINTS), MAX_TRAIN_POINTS)
+            rows = np.random.default_rng(0).choice(n, sample, replace=False) if sample < n else slice(None)
+            self.index.train(np.ascontiguousarray(vectors[rows]))
+        self.index.add(vectors)
+        if self.kind in ("ivf", "ivfpq"):
+            # Lets small filtered searches reconstruct their rows (see EXACT_FILTER_ROWS)
+            faiss.extract_index_ivf(self.index).make_direct_map()
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def _params(self, k: int, selector):
+        faiss = self._faiss
+        if self.kind == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.config.ef_search, k))
+        if self.kind in ("ivf", "ivfpq"):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.config.nprobe)
+        return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+    def _search_exact(self, queries: "np.ndarray", k: int, rows: "np.ndarray"):
+        np = self._np
+        scores = queries @ self.index.reconstruct_batch(rows).T
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < len(rows) else np.tile(np.arange(len(rows)), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_scores, order, axis=1), rows[np.take_along_axis(top, order, axis=1)]
+
+    def search(self, queries: "np.ndarray", k: int, allowed=None):
+        """
+        (scores, rows) of the k best rows per query, like faiss Index.search
+        (rows are -1 where fewer than k matched). `allowed` is an optional
+        Bitmap of rows to consider.
+        """
+        faiss = self._faiss
+        k = min(k, self.ntotal)
+        selector = None
+        if allowed is not None:
+            if self.kind != "flat" and allowed.count() <= EXACT_FILTER_ROWS:
+                rows = self._np.asarray(allowed.to_rows(), dtype=self._np.int64)
+                if not len(rows):
+                    return self._np.zeros((len(queries), 0), "float32"), self._np.zeros((len(queries), 0), "int64")
+                return self._search_exact(queries, k, rows)
+            bits = allowed.to_bytes()
+            selector = faiss.IDSelectorBitmap(allowed.size, faiss.swig_ptr(bits))
+        return self.index.search(queries, k, params=self._params(k, selector))
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate resident size, from the index's own structures (nbytes serializes a copy)."""
+        index, n = self.index, self.index.ntotal
+        if self.kind == "flat":
+            return n * index.sa_code_size()
+        if self.kind == "hnsw":
+            hnsw = index.hnsw
+            return n * index.storage.sa_code_size() + 4 * hnsw.neighbors.size() + 4 * hnsw.levels.size() + 8 * hnsw.offsets.size()
+        ivf = self._faiss.extract_index_ivf(index)
+        size = n * (ivf.code_size + 8 + 8) + 4 * ivf.nlist * index.d  # codes, ids and direct map; coarse centroids
+        if self.kind == "ivfpq":
+            size += 4 * 256 * index.d  # PQ codebooks
+        return size
+
+    @property
+    def nbytes(self) -> int:
+        """Serialized index size, a close proxy for its resident memory."""
+        return len(self._faiss.serialize_index(self.index))
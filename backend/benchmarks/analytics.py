@@ -0,0 +1,80 @@
+"""
+Storefront analytics throughput (app/services/analytics.py).
+
+Replays a synthetic storefront stream through one Analytics instance and
+reports recorded events per second and the p99 cost of one record call. The
+stream has views (a Zipf-like product popularity over --products ids) and
+searches, spread over --sessions sessions. A third of the events also carry a
+user id, and --anonymous of the events carry neither. Accuracy is checked
+against exact counts: the mean and maximum overcount of the top products'
+sketch estimates, and how many of the true top 10 show up as trending.
+
+Usage (from backend/):
+    python -m benchmarks.analytics [--events 500000] [--products 50000] [--sessions 50000] [--anonymous 0.5]
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+
+from app.services.analytics import Analytics
+
+QUERIES = ["boots", "hiking boots", "waterproof jacket", "tent", "hikng", "parka", "sneakers", "headlamp"]
+
+
+def make_stream(n: int, products: int, sessions: int, anonymous: float):
+    rng = random.Random(0)
+    stream = []
+    for _ in range(n):
+        session = None if rng.random() < anonymous else f"sess_{rng.randrange(sessions):06d}"
+        user = f"user_{rng.randrange(sessions // 3 + 1):06d}" if session and rng.random() < 1 / 3 else None
+        if rng.random() < 0.8:
+            product = int(rng.paretovariate(1.1)) % products
+            stream.append(("view", f"prod_{product:07d}", session, user))
+        else:
+            stream.append(("search", rng.choice(QUERIES), session, user))
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--anonymous", type=float, default=0.5)
+    args = parser.parse_args()
+
+    stream = make_stream(args.events, args.products, args.sessions, args.anonymous)
+    analytics = Analytics()
+    samples = []
+    start = time.perf_counter()
+    for i, (kind, key, session, user) in enumerate(stream):
+        record = analytics.record_view if kind == "view" else analytics.record_search
+        if i % 100:
+            record(key, session_id=session, user_id=user)
+        else:
+            sample_start = time.perf_counter()
+            record(key, session_id=session, user_id=user)
+            samples.append(time.perf_counter() - sample_start)
+    elapsed = time.perf_counter() - start
+
+    exact = Counter(key for kind, key, _, _ in stream if kind == "view")
+    top = [key for key, _ in exact.most_common(100)]
+    errors = [estimate - exact[key] for key, estimate in zip(top, analytics.counts("view", top))]
+    trending = {key for key, _ in analytics.trending("view", 10)}
+    samples.sort()
+    print(json.dumps({
+        "events": args.events,
+        "events_per_s": round(args.events / elapsed),
+        "record_p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 1),
+        "top100_mean_overcount": round(sum(errors) / len(errors), 2),
+        "top100_max_overcount": max(errors),
+        "trending_top10_recall": len(trending & set(top[:10])) / 10,
+        **analytics.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
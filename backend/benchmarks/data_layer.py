@@ -0,0 +1,219 @@
+"""
+Data-layer micro-benchmarks at several catalog scales.
+
+For each scale (default 1k, 100k and 1M products, with an order history of
+the same size) a fresh process generates the catalog and orders (see
+benchmarks.facets.write_catalog), builds the snapshot and indexes, then times
+the operations behind every request and agent tool call:
+
+    startup             DataService() attaching to an existing snapshot + order DB
+    get_product_by_id   /products/{id}, get_product_details
+    get_product_by_slug /products/slug/{slug}
+    get_products        /products?category= (materializes the whole category)
+    products_search     /products?search= (substring scan over the catalog columns)
+    search_products     search_products tool (word/synonym scan, typo fallback for unmatched words)
+    hybrid_search       /products/search (token index + vectors, RRF)
+    vector_search       ProductService vector search + materialize
+    create_order        DataService.create_order (SQLite insert + aggregates)
+    get_orders          /orders/{user_id}
+    order_summary       /orders/{user_id}/summary, get_order_summary
+
+Each operation reports ops/sec, p50/p99 latency and the peak Python allocation
+of one call (tracemalloc); each scale reports its setup times and peak RSS.
+Results are compared with the stored baseline (p50 per operation and scale).
+
+Usage (from backend/):
+    python -m benchmarks.data_layer [--scales 1000,100000,1000000] [--budget 1.0]
+    python -m benchmarks.data_layer --update-baseline
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BASELINE = Path(__file__).parent / "baselines" / "data_layer.json"
+
+SEARCH_TERMS = ["boots", "hiking boots", "waterproof jacket", "tent", "hikng", "parka", "sneakers", "headlamp"]
+STATUSES = ["pending", "processing", "shipped", "delivered", "returned"]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def write_orders(data_dir: str, n: int, product_ids: List[str], users: int):
+    rng = random.Random(0)
+    orders = []
+    for i in range(n):
+        quantity = rng.randint(1, 3)
+        price = round(rng.uniform(10, 500), 2)
+        orders.append({
+            "id": f"order_{i:08d}",
+            "user_id": f"user_{rng.randrange(users):06d}",
+            "status": rng.choice(STATUSES),
+            "items": [{"product_id": rng.choice(product_ids), "quantity": quantity, "price_at_purchase": price}],
+            "total": round(price * quantity, 2),
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+        })
+    with open(os.path.join(data_dir, "orders.json"), "w") as f:
+        json.dump(orders, f)
+
+
+def measure(fn: Callable, inputs: Callable, budget: float, max_iter: int = 100_000) -> Dict:
+    """Calls fn(inputs()) repeatedly for ~budget seconds (at least 5 times)."""
+    fn(inputs())  # warm caches
+    tracemalloc.start()
+    fn(inputs())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_iter and (len(samples) < 5 or time.perf_counter() - start < budget):
+        arg = inputs()
+        t = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    return {
+        "ops_per_s": round(len(samples) / (sum(samples) / 1_000_000), 1),
+        "p50_us": round(percentile(samples, 50), 1),
+        "p99_us": round(percentile(samples, 99), 1),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "iterations": len(samples),
+    }
+
+
+def run_scale(n: int, budget: float, vector_index: str) -> Dict:
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    os.environ.setdefault("JWT_SECRET", "bench")
+    import resource
+
+    from app.agents.tools import search_catalog
+    from app.services.search_index import SearchIndex
+    from app.core.models import Order
+    from app.services.data_service import DataService
+    from app.services.facet_service import CatalogFacets, FacetIndex
+    from app.services.product_service import ProductService
+    from app.services.retrieval_service import RetrievalService
+    from app.services.vector_index import VectorIndexConfig
+    from benchmarks.facets import write_catalog
+
+    rng = random.Random(1)
+    setup = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        t = time.perf_counter()
+        write_catalog(tmp, n)
+        with open(os.path.join(tmp, "products.json")) as f:
+            products = json.load(f)
+        ids = [p["id"] for p in products]
+        slugs = [p["slug"] for p in products]
+        del products
+        with open(os.path.join(tmp, "categories.json")) as f:
+            categories = [c["slug"] for c in json.load(f)]
+        users = max(10, n // 5)
+        write_orders(tmp, n, ids, users)
+        setup["generate_s"] = round(time.perf_counter() - t, 1)
+
+        runtime = os.path.join(tmp, "var")
+        t = time.perf_counter()
+        data = DataService(data_dir=tmp, runtime_dir=runtime)
+        setup["snapshot_and_orders_build_s"] = round(time.perf_counter() - t, 1)
+
+        t = time.perf_counter()
+        index = SearchIndex(data.catalog, os.path.join(runtime, "search"))
+        facets = CatalogFacets(FacetIndex(data.catalog, index), data)
+        setup["search_and_facet_index_build_s"] = round(time.perf_counter() - t, 1)
+
+        t = time.perf_counter()
+        vectors = ProductService(data.catalog, index_config=VectorIndexConfig(vector_index))
+        setup["vector_index_build_s"] = round(time.perf_counter() - t, 1)
+        setup["vector_index"] = vectors.index.kind
+        retrieval = RetrievalService(index, vectors, facets, data)
+
+        order_seq = iter(range(10**9))
+
+        def new_order(_):
+            i = next(order_seq)
+            data.create_order(Order(
+                id=f"bench_{i:09d}", user_id=f"user_{rng.randrange(users):06d}", status="pending",
+                items=[{"product_id": rng.choice(ids), "quantity": 1, "price_at_purchase": 99.0}], total=99.0,
+            ))
+
+        ops = {
+            "startup": (lambda _: DataService(data_dir=tmp, runtime_dir=runtime), lambda: None),
+            "get_product_by_id": (data.get_product_by_id, lambda: rng.choice(ids)),
+            "get_product_by_slug": (data.get_product_by_slug, lambda: rng.choice(slugs)),
+            "get_products": (data.get_products, lambda: rng.choice(categories)),
+            "products_search": (data.filter_by_text, lambda: rng.choice(SEARCH_TERMS)),
+            "search_products": (lambda q: search_catalog(data, q, retrieval=lambda: retrieval), lambda: rng.choice(SEARCH_TERMS)),
+            "hybrid_search": (lambda q: retrieval.retrieve(q, limit=10), lambda: rng.choice(SEARCH_TERMS)),
+            "vector_search": (lambda q: data.get_products_at(vectors.search_rows([q], 10)[0]), lambda: rng.choice(SEARCH_TERMS)),
+            "create_order": (new_order, lambda: None),
+            "get_orders": (data.get_orders, lambda: f"user_{rng.randrange(users):06d}"),
+            "order_summary": (data.get_order_summary, lambda: f"user_{rng.randrange(users):06d}"),
+        }
+        results = {}
+        for name, (fn, inputs) in ops.items():
+            results[name] = measure(fn, inputs, budget)
+            print(f"  {n:>9,} {name:<20} {results[name]['ops_per_s']:>10} ops/s  "
+                  f"p50 {results[name]['p50_us']:>10} us  p99 {results[name]['p99_us']:>10} us  "
+                  f"peak {results[name]['peak_alloc_kb']:>9} KB", flush=True)
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2)
+    return {"products": n, "orders": n, "setup": setup, "peak_rss_mb": round(peak_rss, 1), "ops": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,100000,1000000", help="Comma-separated catalog sizes")
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds spent timing each operation")
+    # auto would pick HNSW at 1M, whose single-core build alone takes several minutes
+    parser.add_argument("--vector-index", default="ivf", help="Vector index type (see VECTOR_INDEX)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed p50 slowdown vs baseline (0.5 = +50%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    # One fresh process per scale, so peak RSS and caches don't leak between scales
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for n in scales:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_scale, (n, args.budget, args.vector_index)))
+    report = {"vector_index": args.vector_index, "scales": results}
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+        return
+
+    if BASELINE.exists():
+        baseline = {s["products"]: s for s in json.loads(BASELINE.read_text())["scales"]}
+        failures = []
+        for result in results:
+            before = baseline.get(result["products"])
+            if not before:
+                continue
+            for name, op in result["ops"].items():
+                old = before["ops"].get(name)
+                if old and op["p50_us"] > old["p50_us"] * (1 + args.tolerance):
+                    failures.append(f"{name} @ {result['products']:,}: p50 {op['p50_us']}us (baseline {old['p50_us']}us)")
+        if failures:
+            print("\n".join(f"REGRESSION: {f}" for f in failures))
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
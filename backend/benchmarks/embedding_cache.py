@@ -0,0 +1,72 @@
+"""
+Vector index build cost with the on-disk embedding store.
+
+Builds a synthetic --products catalog in a temp dir and times ProductService
+index builds:
+  cold     empty store, every product is embedded
+  warm     restart with the same catalog, nothing is embedded
+  edited   --edit-percent of product descriptions changed, only those are embedded
+
+Usage (from backend/):
+    python -m benchmarks.embedding_cache [--products 100000] [--edit-percent 1]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.facets import write_catalog
+from app.services.catalog_store import SharedCatalog
+from app.services.embedding_store import EmbeddingStore
+from app.services.product_service import HashingEmbedder, ProductService
+
+
+def build(tmp: str, batch_size: int, workers: int):
+    runtime = os.path.join(tmp, "var")
+    catalog = SharedCatalog(tmp, os.path.join(runtime, "catalog.bin"))
+    embedder = HashingEmbedder()
+    store = EmbeddingStore(os.path.join(runtime, "embeddings"), embedder, batch_size=batch_size, workers=workers)
+    start = time.perf_counter()
+    ProductService(catalog, embedder, store)
+    return {"seconds": round(time.perf_counter() - start, 2), "embedded": store.last_embedded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--edit-percent", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalog(tmp, args.products)
+        path = os.path.join(tmp, "products.json")
+        with open(path) as f:
+            products = json.load(f)
+        # Cloned products share their text (and so their embedding); make every one distinct
+        for i, product in enumerate(products):
+            product["description"] += f" Lot {i}."
+        with open(path, "w") as f:
+            json.dump(products, f)
+
+        results = {
+            "cold": build(tmp, args.batch_size, args.workers),
+            "warm": build(tmp, args.batch_size, args.workers),
+        }
+
+        rng = random.Random(1)
+        for i in rng.sample(range(len(products)), int(len(products) * args.edit_percent / 100)):
+            products[i]["description"] += " Now with recycled materials."
+        with open(path, "w") as f:
+            json.dump(products, f)
+        results["edited"] = build(tmp, args.batch_size, args.workers)
+
+    print(json.dumps({"products": args.products, "edit_percent": args.edit_percent, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Facet count latency over a synthetic catalog.
+
+Builds a snapshot of --products products (cloned from app/data with varied
+prices, ratings and stock) in a temp dir, then times FacetIndex.facets() for
+typical storefront filter combinations.
+
+Usage (from backend/):
+    python -m benchmarks.facets [--products 1000000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.services.catalog_store import SharedCatalog
+from app.services.data_service import DATA_DIR
+from app.services.facet_service import FacetIndex
+from app.services.search_index import SearchIndex
+
+QUERIES = [
+    {},
+    {"category": "footwear"},
+    {"search": "boots"},
+    {"min_price": 50, "max_price": 300},
+    {"category": "footwear", "search": "hiking boots", "min_price": 50, "max_price": 300},
+]
+
+
+def write_catalog(data_dir: str, n: int):
+    with open(os.path.join(DATA_DIR, "products.json")) as f:
+        source = json.load(f)
+    rng = random.Random(0)
+    products = []
+    for i in range(n):
+        p = dict(source[i % len(source)])
+        p.update(
+            id=f"prod_{i:07d}",
+            slug=f"{p['slug']}-{i}",
+            price=round(rng.uniform(10, 1200), 2),
+            rating=round(rng.uniform(2.5, 5), 1),
+            stock=rng.randint(0, 50),
+        )
+        products.append(p)
+    with open(os.path.join(data_dir, "products.json"), "w") as f:
+        json.dump(products, f)
+    shutil.copy(os.path.join(DATA_DIR, "categories.json"), data_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalog(tmp, args.products)
+        catalog = SharedCatalog(tmp, os.path.join(tmp, "var", "catalog.bin"))
+        index = SearchIndex(catalog, os.path.join(tmp, "var", "search"))
+
+        start = time.perf_counter()
+        facets = FacetIndex(catalog, index)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for query in QUERIES:
+            facets.facets(**query)
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                total = facets.facets(**query).total
+                samples.append((time.perf_counter() - start) * 1000)
+            results.append({"filters": query, "matches": total, "median_ms": round(statistics.median(samples), 2)})
+
+    print(json.dumps({
+        "products": args.products,
+        "build_ms": round(build_ms, 1),
+        "bitmap_bytes": facets.size_bytes,
+        "queries": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Hybrid search latency (lexical + vector, fused with RRF) over a synthetic catalog.
+
+Builds a snapshot of --products products in a temp dir, then times:
+  single   one RetrievalService.retrieve_rows call per query (p50 / p99 / max)
+  batch    --batch-size queries per call (one FAISS search), reported per query
+with a mix of plain, misspelled and filtered queries.
+
+Usage (from backend/):
+    python -m benchmarks.hybrid_search [--products 100000] [--queries 500] [--update-baseline]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.facets import write_catalog
+from app.services.data_service import DataService
+from app.services.facet_service import CatalogFacets, FacetIndex
+from app.services.product_service import ProductService
+from app.services.retrieval_service import RetrievalService
+from app.services.search_index import SearchIndex
+
+BASELINE = Path(__file__).parent / "baselines" / "hybrid_search.json"
+
+QUERIES = [
+    "hiking boots", "waterproof jacket", "tent", "solar charger", "headlamp",
+    "warm winter parka", "lightweight trail runners", "sleeping bag", "binoculars",
+    "hikng boots", "parkka", "waterprof shell", "backpack", "gloves", "smart watch",
+]
+FILTERS = [{}, {}, {"in_stock": True}, {"category": "footwear"}, {"category": "outdoor", "in_stock": True}]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    workload = [(rng.choice(QUERIES), rng.choice(FILTERS)) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalog(tmp, args.products)
+        runtime = os.path.join(tmp, "var")
+        data = DataService(data_dir=tmp, runtime_dir=runtime)
+        catalog = data.catalog
+        start = time.perf_counter()
+        search = SearchIndex(catalog, os.path.join(runtime, "search"))
+        retrieval = RetrievalService(
+            search, ProductService(catalog), CatalogFacets(FacetIndex(catalog, search), data), data,
+        )
+        build_s = time.perf_counter() - start
+
+        for query, filters in workload[:20]:  # warm caches
+            retrieval.retrieve_rows([query], limit=args.limit, **filters)
+
+        single = []
+        for query, filters in workload:
+            start = time.perf_counter()
+            retrieval.retrieve_rows([query], limit=args.limit, **filters)
+            single.append((time.perf_counter() - start) * 1000)
+
+        batch_start = time.perf_counter()
+        for i in range(0, len(workload), args.batch_size):
+            retrieval.retrieve_rows([q for q, _ in workload[i:i + args.batch_size]], limit=args.limit)
+        batch_per_query = (time.perf_counter() - batch_start) * 1000 / len(workload)
+
+    result = {
+        "products": args.products,
+        "queries": len(workload),
+        "index_build_s": round(build_s, 1),
+        "single_ms": {
+            "p50": round(percentile(single, 50), 2),
+            "p99": round(percentile(single, 99), 2),
+            "max": round(max(single), 2),
+        },
+        f"batch_of_{args.batch_size}_ms_per_query": round(batch_per_query, 2),
+    }
+    print(json.dumps(result, indent=2))
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time profile of app.main (worker boot cost).
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters,
+reports the cumulative import time and the slowest top-level packages, and
+checks that heavy optional modules stay out of the import path.
+
+Usage (from backend/):
+    python -m benchmarks.import_time                 # report + compare to baseline
+    python -m benchmarks.import_time --update-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "import_time.json"
+
+# Modules that must only be loaded on first use, never by importing app.main
+DEFERRED_MODULES = ["langchain_core", "langchain_openai", "langgraph", "faiss", "numpy", "stripe"]
+
+def profile_once(module: str = "app.main"):
+    env = {
+        **os.environ,
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "bench"),
+        "JWT_SECRET": os.environ.get("JWT_SECRET", "bench"),
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    timings = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        top = name.split(".")[0]
+        timings[top] = timings.get(top, 0) + int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us, timings
+
+def run(repeat: int):
+    totals = []
+    timings = {}
+    for _ in range(repeat):
+        total_us, timings = profile_once()
+        totals.append(total_us)
+    return {
+        "import_app_main_ms": round(statistics.median(totals) / 1000, 1),
+        "slowest_packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(timings.items(), key=lambda kv: kv[1], reverse=True)[:10]
+        },
+        "deferred_modules_loaded": [m for m in DEFERRED_MODULES if m in timings],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (0.5 = +50%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(json.dumps(result, indent=2))
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return
+
+    failures = []
+    if result["deferred_modules_loaded"]:
+        failures.append(f"Heavy modules imported eagerly: {result['deferred_modules_loaded']}")
+    if BASELINE_FILE.exists():
+        baseline = json.loads(BASELINE_FILE.read_text())
+        limit = baseline["import_app_main_ms"] * (1 + args.tolerance)
+        if result["import_app_main_ms"] > limit:
+            failures.append(
+                f"import app.main took {result['import_app_main_ms']}ms (baseline {baseline['import_app_main_ms']}ms, limit {limit:.1f}ms)"
+            )
+
+    if failures:
+        print("\n".join(f"REGRESSION: {f}" for f in failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Inventory reservation contention benchmark.
+
+Several processes (uvicorn workers), each with many threads, hammer a small
+set of hot SKUs (flash-sale traffic) with single- and multi-item reservations
+on one shared stock database, then commit or release them. Reports throughput
+and latency percentiles and checks that no stock was oversold and that every
+committed unit is accounted for.
+
+Usage (from backend/):
+    python -m benchmarks.inventory_contention [--processes 4] [--threads 8] [--ops 1000] [--hot-skus 10] [--fsync]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app.services.inventory_service import InventoryEngine, InventoryError
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def catalog(args):
+    return {f"prod_{i}": args.stock for i in range(args.catalog)}
+
+
+def run_worker(args, path: str, worker: int, start_at: float):
+    """One worker process: its own engine on the shared database, args.threads threads."""
+    engine = InventoryEngine(catalog(args), path=path, fsync=args.fsync)
+    hot = [f"prod_{i}" for i in range(args.hot_skus)]
+    latencies, rejected, committed = [], [0], {}
+    lock = threading.Lock()
+
+    def thread(seed):
+        rng = random.Random(seed)
+        local_latencies, local_rejected, local_committed = [], 0, {}
+        for _ in range(args.ops):
+            # 70% single hot item, 30% multi-item cart mixing hot and long-tail SKUs
+            if rng.random() < 0.7:
+                items = {rng.choice(hot): rng.randint(1, 2)}
+            else:
+                items = {rng.choice(hot): 1, f"prod_{rng.randrange(args.catalog)}": rng.randint(1, 3)}
+            start = time.perf_counter()
+            try:
+                reservation_id = engine.reserve(items)
+            except InventoryError:
+                local_rejected += 1
+                continue
+            if rng.random() < 0.8:
+                engine.commit(reservation_id)
+                for pid, qty in items.items():
+                    local_committed[pid] = local_committed.get(pid, 0) + qty
+            else:
+                engine.release(reservation_id)
+            local_latencies.append((time.perf_counter() - start) * 1_000_000)
+        with lock:
+            latencies.extend(local_latencies)
+            rejected[0] += local_rejected
+            for pid, qty in local_committed.items():
+                committed[pid] = committed.get(pid, 0) + qty
+
+    threads = [threading.Thread(target=thread, args=(worker * 1000 + n,)) for n in range(args.threads)]
+    time.sleep(max(0.0, start_at - time.time()))  # start every process together
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, rejected[0], committed, time.time()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes sharing the stock database")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per process")
+    parser.add_argument("--ops", type=int, default=1000, help="Reservations per thread")
+    parser.add_argument("--hot-skus", type=int, default=10)
+    parser.add_argument("--catalog", type=int, default=10_000)
+    parser.add_argument("--stock", type=int, default=20_000, help="Initial stock per SKU")
+    parser.add_argument("--fsync", action="store_true", help="fsync every stock transaction")
+    args = parser.parse_args()
+
+    stock = catalog(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.db")
+        InventoryEngine(stock, path=path).close()  # load the catalog once, as the first worker would
+        start_at = time.time() + 2.0  # after every process has imported the app and opened the database
+        with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+            results = pool.starmap(run_worker, [(args, path, n, start_at) for n in range(args.processes)])
+        elapsed = max(finished_at for *_, finished_at in results) - start_at
+
+        latencies, rejected, committed = [], 0, {}
+        for worker_latencies, worker_rejected, worker_committed, _ in results:
+            latencies.extend(worker_latencies)
+            rejected += worker_rejected
+            for pid, qty in worker_committed.items():
+                committed[pid] = committed.get(pid, 0) + qty
+
+        engine = InventoryEngine(stock, path=path)
+        oversold = [pid for pid in stock if engine.available(pid) < 0 or engine.on_hand(pid) < 0]
+        mismatched = [pid for pid, qty in committed.items() if engine.on_hand(pid) != stock[pid] - qty]
+        leaked = engine.active_reservations
+        engine.close()
+
+    total = len(latencies) + rejected
+    print(json.dumps({
+        "processes": args.processes,
+        "threads_per_process": args.threads,
+        "reservations": total,
+        "rejected": rejected,
+        "reservations_per_sec": round(total / elapsed),
+        "reserve_plus_finish_us": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies), 1),
+        },
+        "oversold_skus": oversold,
+        "counter_mismatches": mismatched,
+        "open_reservations_left": leaked,
+    }, indent=2))
+    if oversold or mismatched or leaked:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+HTTP load test for the whole app.
+
+Spawns a local uvicorn instance of app.main (fresh RUNTIME_DIR) wired to the
+offline stand-ins (scripts/llm_stub.py for the LLM, scripts/stripe_stub.py
+for Stripe), or targets an already running server with --target. Virtual
+users then loop over weighted scenarios for --duration seconds:
+
+    browse     categories, category listing, product page, similar products
+    search     /products?search=, /products/search, autocomplete, facets
+    slug       product-by-slug page
+    order      POST /orders (409 when stock runs out counts as expected)
+    checkout   Stripe checkout session
+    chat       multi-turn /chat/message session: discovery, then "buy" (the
+               transactional agent interrupts for approval), then "yes"
+               (resume) which must end in an ap2_receipt
+
+Reports throughput, error rate and latency percentiles per endpoint and
+writes them as JSON (tagged with the git commit) to compare across commits.
+
+Usage (from backend/):
+    python -m benchmarks.load_test [--users 50] [--duration 30] [--mix mixed]
+    python -m benchmarks.load_test --target http://localhost:8000 --mix storefront
+    python -m benchmarks.load_test --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Scenario weights per traffic mix
+MIXES = {
+    "storefront": {"browse": 45, "search": 30, "slug": 15, "order": 7, "checkout": 3},
+    "chat": {"chat": 80, "browse": 10, "search": 10},
+    "mixed": {"browse": 30, "search": 25, "slug": 10, "order": 10, "checkout": 5, "chat": 20},
+}
+
+SEARCH_TERMS = ["boots", "hiking boots", "waterproof jacket", "tent", "parka", "hikng", "headlamp", "gloves"]
+CHAT_OPENERS = ["Show me waterproof hiking boots", "I need a warm parka", "Any tents for two people?"]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def add(self, name: str, ms: float, status: str, error: bool):
+        self.samples.setdefault(name, []).append(ms)
+        self.statuses.setdefault(name, {})
+        self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+        if error:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        endpoints = {}
+        for name in sorted(self.samples):
+            samples = self.samples[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 2),
+                "errors": self.errors.get(name, 0),
+                "error_rate": round(self.errors.get(name, 0) / len(samples), 4),
+                "p50_ms": round(percentile(samples, 50), 1),
+                "p90_ms": round(percentile(samples, 90), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+                "max_ms": round(max(samples), 1),
+                "statuses": self.statuses[name],
+            }
+        return endpoints
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, catalog: Dict, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.catalog = catalog
+        self.rng = rng
+
+    async def call(self, name: str, method: str, url: str, ok=(200,), **kwargs) -> Optional[httpx.Response]:
+        """One timed request; statuses outside `ok` (and transport failures) count as errors."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(name, (time.perf_counter() - start) * 1000, type(e).__name__, True)
+            return None
+        self.recorder.add(name, (time.perf_counter() - start) * 1000, str(response.status_code), response.status_code not in ok)
+        return response
+
+    def product(self) -> Dict:
+        return self.rng.choice(self.catalog["products"])
+
+    async def browse(self):
+        await self.call("GET /categories", "GET", "/api/v1/categories/")
+        category = self.rng.choice(self.catalog["categories"])
+        await self.call("GET /products?category=", "GET", "/api/v1/products/", params={"category": category})
+        product = self.product()
+        await self.call("GET /products/{id}", "GET", f"/api/v1/products/{product['id']}")
+        await self.call("GET /products/{id}/similar", "GET", f"/api/v1/products/{product['id']}/similar")
+
+    async def search(self):
+        term = self.rng.choice(SEARCH_TERMS)
+        await self.call("GET /products/suggest", "GET", "/api/v1/products/suggest", params={"q": term[:3]})
+        await self.call("GET /products?search=", "GET", "/api/v1/products/", params={"search": term})
+        await self.call("GET /products/search", "GET", "/api/v1/products/search", params={"q": term})
+        await self.call("GET /products/facets", "GET", "/api/v1/products/facets", params={"search": term})
+
+    async def slug(self):
+        await self.call("GET /products/slug/{slug}", "GET", f"/api/v1/products/slug/{self.product()['slug']}")
+
+    async def order(self):
+        product = self.product()
+        quantity = self.rng.randint(1, 2)
+        await self.call("POST /orders", "POST", "/api/v1/orders/", ok=(200, 409), json={
+            "id": f"load_{uuid.uuid4().hex[:12]}",
+            "user_id": f"load_user_{self.rng.randrange(100)}",
+            "status": "pending",
+            "items": [{"product_id": product["id"], "quantity": quantity, "price_at_purchase": product["price"]}],
+            "total": round(product["price"] * quantity, 2),
+        })
+
+    async def checkout(self):
+        product = self.product()
+        await self.call("POST /checkout/create-checkout-session", "POST", "/api/v1/checkout/create-checkout-session", ok=(200, 409), json={
+            "items": [{"id": product["id"], "name": product["name"], "price": product["price"], "quantity": 1}],
+            "success_url": "http://localhost/success",
+            "cancel_url": "http://localhost/cancel",
+        })
+
+    async def chat(self):
+        session = {"session_id": f"load_{uuid.uuid4().hex}"}
+        await self.call("POST /chat/message (discover)", "POST", "/api/v1/chat/message",
+                        json={"message": self.rng.choice(CHAT_OPENERS), **session})
+        await self.call("POST /chat/message (buy)", "POST", "/api/v1/chat/message",
+                        json={"message": "I want to buy the first one", **session})
+        response = await self.call("POST /chat/message (resume)", "POST", "/api/v1/chat/message",
+                                   json={"message": "yes", **session})
+        if response is not None and response.status_code == 200 and response.json().get("type") != "ap2_receipt":
+            # The interrupt/resume round trip didn't complete the transaction
+            self.recorder.add("chat flow: receipt check", 0.0, "no_receipt", True)
+        await self.call("POST /chat/clear", "POST", "/api/v1/chat/clear", json=session)
+
+    async def run(self, mix: Dict[str, int], deadline: float):
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+
+
+async def load_catalog(client: httpx.AsyncClient) -> Dict:
+    products = (await client.get("/api/v1/products/")).json()
+    categories = (await client.get("/api/v1/categories/")).json()
+    return {"products": products, "categories": [c["slug"] for c in categories]}
+
+
+async def run_load(target: str, mix_name: str, users: int, duration: float, timeout: float) -> Dict:
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        catalog = await load_catalog(client)
+        mix = MIXES[mix_name]
+
+        # One untimed pass over every scenario so lazy services are built before measuring
+        warmup = VirtualUser(client, Recorder(), catalog, random.Random(-1))
+        for scenario in mix:
+            await getattr(warmup, scenario)()
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            VirtualUser(client, recorder, catalog, random.Random(n)).run(mix, deadline) for n in range(users)
+        ))
+        elapsed = time.perf_counter() - start
+
+    endpoints = recorder.report(elapsed)
+    total = sum(e["requests"] for e in endpoints.values())
+    errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server for {url} did not become ready within {timeout:.0f}s")
+
+
+@contextmanager
+def local_stack(port: int, workers: int, llm_latency: float, stripe_latency: float):
+    """uvicorn app.main plus the LLM and Stripe stubs, with a throwaway runtime dir."""
+    llm_port, stripe_port = port + 1, port + 2
+    processes = []
+    with tempfile.TemporaryDirectory() as runtime_dir:
+        env = {
+            **os.environ,
+            "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "stub"),
+            "OPENROUTER_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+            "JWT_SECRET": os.environ.get("JWT_SECRET", "load-test"),
+            "STRIPE_SECRET_KEY": "sk_test_stub",
+            "STRIPE_API_BASE": f"http://127.0.0.1:{stripe_port}",
+            "STRIPE_WEBHOOK_SECRET": "whsec_load_test",
+            "STRIPE_STUB_WEBHOOK_SECRET": "whsec_load_test",
+            "STRIPE_STUB_WEBHOOK_URL": f"http://127.0.0.1:{port}/api/v1/checkout/webhook",
+            "RUNTIME_DIR": runtime_dir,
+            "LLM_STUB_LATENCY": str(llm_latency),
+            "STRIPE_STUB_LATENCY": str(stripe_latency),
+        }
+
+        def spawn(module: str, at: int, *extra: str):
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(at), "--log-level", "warning", *extra],
+                cwd=BACKEND_DIR, env=env,
+            )
+            processes.append(process)
+            return process
+
+        try:
+            _wait_ready(f"http://127.0.0.1:{llm_port}/_stats", spawn("scripts.llm_stub:app", llm_port))
+            _wait_ready(f"http://127.0.0.1:{stripe_port}/_stats", spawn("scripts.stripe_stub:app", stripe_port))
+            _wait_ready(f"http://127.0.0.1:{port}/health", spawn("app.main:app", port, "--workers", str(workers)))
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old: Dict, new: Dict):
+    """Per-endpoint p99 / throughput / error-rate deltas against an earlier result file."""
+    print(f"\nvs {old.get('commit', '?')} ({old.get('timestamp', '?')}):")
+    for name, now in new["endpoints"].items():
+        before = old.get("endpoints", {}).get(name)
+        if not before:
+            print(f"  {name}: new endpoint")
+            continue
+        p99 = (now["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100 if before["p99_ms"] else 0.0
+        rps = (now["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        print(f"  {name}: p99 {before['p99_ms']} -> {now['p99_ms']} ms ({p99:+.0f}%), "
+              f"rps {before['rps']} -> {now['rps']} ({rps:+.0f}%), "
+              f"errors {before['error_rate']:.2%} -> {now['error_rate']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of a running server (default: spawn a local stack)")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the spawned app (stubs use the next two)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned app")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds the LLM stub waits per completion")
+    parser.add_argument("--stripe-latency", type=float, default=0.2, help="Seconds the Stripe stub waits per call")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load_test-<mix>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to diff against")
+    args = parser.parse_args()
+
+    if args.target:
+        result = asyncio.run(run_load(args.target, args.mix, args.users, args.duration, args.timeout))
+    else:
+        with local_stack(args.port, args.workers, args.llm_latency, args.stripe_latency) as target:
+            result = asyncio.run(run_load(target, args.mix, args.users, args.duration, args.timeout))
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "target": args.target or "local", "mix": args.mix, "users": args.users, "duration_s": args.duration,
+            "workers": args.workers, "llm_latency_s": args.llm_latency, "stripe_latency_s": args.stripe_latency,
+        },
+        **result,
+    }
+
+    width = max(len(name) for name in result["endpoints"])
+    print(f"{'endpoint':<{width}}  {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<{width}}  {e['requests']:>6} {e['rps']:>7} {e['error_rate'] * 100:>5.1f}% "
+              f"{e['p50_ms']:>8} {e['p90_ms']:>8} {e['p99_ms']:>8}")
+    print(f"\ntotal: {result['requests']} requests, {result['rps']} req/s, {result['error_rate']:.2%} errors")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_test-{args.mix}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Response encoding benchmark for a 10k-product listing.
+
+Compares, in-process, the cost of turning a list of already-validated Product
+instances into response bytes:
+
+  response_model_legacy   FastAPI < 0.130 (allowed by requirements.txt): re-validate,
+                          serialize to Python dicts, then json.dumps in JSONResponse
+  response_model_current  the installed FastAPI's own response_model path
+  model_response          app.core.responses.model_response (no re-validation,
+                          pydantic-core straight to bytes)
+
+All three outputs are checked for equality before timing.
+
+Usage (from backend/):
+    python -m benchmarks.response_encoding [--products 10000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import fastapi
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.models import Product
+from app.core.responses import model_response
+
+
+def make_products(n: int) -> List[Product]:
+    return [
+        Product(
+            id=f"prod_{i:07d}",
+            name=f"Benchmark Product {i}",
+            slug=f"benchmark-product-{i}",
+            description="Lightweight durability meets premium design. " * 3,
+            price=round(10 + (i % 500) * 0.99, 2),
+            category_id=f"cat_{i % 4}",
+            stock=i % 100,
+            images=[f"https://example.com/img/{i}.jpg"],
+            features=["Premium Quality", "Durable", "Eco-friendly", "Warranty"],
+            rating=4.0 + (i % 10) / 10,
+            reviews_count=i % 500,
+            ai_tags=["outdoor", "bench"],
+        )
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    field = create_model_field(name="Response", type_=List[Product], mode="serialization")
+
+    async def legacy():
+        value, _ = field.validate(products, {}, loc=("response",))
+        content = field.serialize(value, mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+    async def current():
+        return await serialize_response(field=field, response_content=products, is_coroutine=False, dump_json=True)
+
+    async def fast():
+        return model_response(products, List[Product]).body
+
+    async def run():
+        paths = {"response_model_legacy": legacy, "response_model_current": current, "model_response": fast}
+        reference = json.loads(await fast())
+        results = {}
+        for name, encode in paths.items():
+            assert json.loads(await encode()) == reference, name
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await encode()
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2)}
+        return results
+
+    results = asyncio.run(run())
+    fast_ms = results["model_response"]["median_ms"]
+    for name in ("response_model_legacy", "response_model_current"):
+        results[name]["speedup"] = round(results[name]["median_ms"] / fast_ms, 2)
+    print(json.dumps({"fastapi": fastapi.__version__, "products": args.products, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
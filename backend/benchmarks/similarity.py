@@ -0,0 +1,102 @@
+"""
+Similar-products table: full build vs incremental update, plus correctness checks.
+
+Builds a synthetic --products catalog in a temp dir, then times
+  build      the whole neighbour table from the snapshot
+  edit       SimilarityIndex.update with one product moved to another category
+  import     an update adding --added products and removing --removed ones
+
+and checks that the edited product's neighbours change (and now come from its
+new category), that a second instance (another worker) serves the updated
+lists without a restart, that removed products vanish from every list and that
+added products get neighbours. Exits non-zero if a check fails.
+
+Usage (from backend/):
+    python -m benchmarks.similarity [--products 20000] [--added 500] [--removed 100]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.facets import write_catalog
+from app.services.catalog_store import SharedCatalog
+from app.services.similarity_service import FEATURE_FIELDS, SimilarityIndex
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--added", type=int, default=500)
+    parser.add_argument("--removed", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalog(tmp, args.products)
+        with open(os.path.join(tmp, "products.json")) as f:
+            products = json.load(f)
+        catalog = SharedCatalog(tmp, os.path.join(tmp, "var", "catalog.bin"))
+        path = os.path.join(tmp, "var", "similar")
+
+        start = time.perf_counter()
+        index = SimilarityIndex(catalog, path, k=args.k)
+        results = {"products": args.products, "build_seconds": round(time.perf_counter() - start, 2)}
+        other = SimilarityIndex(catalog, path, k=args.k)  # another worker, mapping the stored table
+
+        # Move the first product to the category of some product it is not similar to
+        edited = dict(products[0])
+        before = [pid for pid, _ in index.similar(edited["id"])]
+        by_id = {p["id"]: p for p in products}
+        target = next(p for p in products if p["category_id"] != edited["category_id"])
+        edited.update({field: target.get(field) for field in FEATURE_FIELDS})
+        results["edit_seconds"] = timed(lambda: index.update([edited]))
+        after = [pid for pid, _ in index.similar(edited["id"])]
+        other_sees_edit = [pid for pid, _ in other.similar(edited["id"])] == after
+        same_category = sum(by_id[pid]["category_id"] == edited["category_id"] for pid in after)
+
+        added = []
+        for i in range(args.added):
+            product = dict(products[(i * 7919) % len(products)])
+            product.update(id=f"new_{i:06d}", slug=f"{product['slug']}-new-{i}")
+            added.append(product)
+        removed = [p["id"] for p in products[1:1 + args.removed]]
+        results["import_seconds"] = timed(lambda: index.update(added, removed))
+
+        lists = [index.similar(p["id"]) for p in products] + [index.similar(p["id"]) for p in added]
+        gone = set(removed)
+        checks = {
+            "edited_neighbours_changed": after != before,
+            "edited_neighbours_in_new_category": f"{same_category}/{len(after)}",
+            "other_worker_sees_edit": other_sees_edit,
+            "other_worker_sees_import": all(other.similar(p["id"]) == index.similar(p["id"]) for p in added[:50]),
+            "removed_in_lists": sum(pid in gone for neighbours in lists for pid, _ in neighbours),
+            "removed_with_lists": sum(bool(index.similar(pid)) for pid in removed),
+            "added_without_neighbours": sum(not index.similar(p["id"]) for p in added),
+        }
+        results["checks"] = checks
+
+    print(json.dumps(results, indent=2))
+    failed = (
+        not checks["edited_neighbours_changed"]
+        or same_category < len(after) // 2
+        or not checks["other_worker_sees_edit"]
+        or not checks["other_worker_sees_import"]
+        or checks["removed_in_lists"]
+        or checks["removed_with_lists"]
+        or checks["added_without_neighbours"]
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
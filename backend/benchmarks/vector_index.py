@@ -0,0 +1,95 @@
+"""
+Vector index trade-offs: recall@k against the exact flat index, query latency
+and memory for each index type and search-time setting.
+
+Vectors are synthetic but clustered (like real embeddings, unlike uniform
+noise, which no ANN index can shortcut): --vectors unit vectors drawn around
+--clusters centres, queried with --queries held-out points from the same
+distribution.
+
+Usage (from backend/):
+    python -m benchmarks.vector_index [--vectors 100000] [--k 10] [--update-baseline]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.product_service import EMBEDDING_DIM
+from app.services.vector_index import VectorIndex, VectorIndexConfig
+
+BASELINE = Path(__file__).parent / "baselines" / "vector_index.json"
+
+# (index type, search-time setting name, values to sweep)
+SWEEPS = [
+    ("flat", None, [None]),
+    ("hnsw", "ef_search", [16, 64, 256]),
+    ("ivf", "nprobe", [4, 16, 64]),
+    ("ivfpq", "nprobe", [4, 16, 64]),
+]
+
+
+def clustered(rng, n: int, centres: np.ndarray, spread: float = 1.5) -> np.ndarray:
+    x = centres[rng.integers(0, len(centres), n)] + rng.standard_normal((n, centres.shape[1]), dtype=np.float32) * spread / np.sqrt(centres.shape[1])
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--clusters", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((args.clusters, EMBEDDING_DIM), dtype=np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    vectors = clustered(rng, args.vectors, centres)
+    queries = clustered(rng, args.queries, centres)
+
+    truth = None
+    results = []
+    for kind, knob, values in SWEEPS:
+        start = time.perf_counter()
+        index = VectorIndex(vectors, VectorIndexConfig(kind))
+        build_s = time.perf_counter() - start
+        memory = index.nbytes
+        for value in values:
+            if knob:
+                setattr(index.config, knob, value)
+            found = []
+            latencies = []
+            for q in queries:
+                start = time.perf_counter()
+                _, rows = index.search(q[None, :], args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(rows[0])
+            found = np.array(found)
+            if truth is None:
+                truth = found  # the flat index is exact
+            recall = np.mean([len(np.intersect1d(f, t)) / args.k for f, t in zip(found, truth)])
+            latencies.sort()
+            results.append({
+                "index": kind,
+                **({knob: value} if knob else {}),
+                f"recall@{args.k}": round(float(recall), 3),
+                "p50_ms": round(latencies[len(latencies) // 2], 3),
+                "p99_ms": round(latencies[int(len(latencies) * 0.99)], 3),
+                "build_s": round(build_s, 1),
+                "memory_mb": round(memory / 2**20, 1),
+            })
+            print(json.dumps(results[-1]))
+
+    report = {"vectors": args.vectors, "dim": EMBEDDING_DIM, "queries": args.queries, "results": results}
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compiles app/data/*.json into the binary catalog snapshot that workers memory-map,
+then precomputes the search, autocomplete and similar-products indexes from it.
+
+Workers build the snapshot themselves when it is missing or stale, but running
+this as a deploy/build step means no worker ever pays the compile cost at boot.
+
+Usage (from backend/):
+    python -m scripts.build_catalog_snapshot [--data-dir app/data] [--out var/catalog.bin] [--k 20] [--skip-similar]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.catalog_store import SharedCatalog, compile_catalog  # noqa: E402
+from app.services.data_service import DATA_DIR  # noqa: E402
+from app.services.search_index import SearchIndex  # noqa: E402
+from app.services.similarity_service import SimilarityIndex  # noqa: E402
+from app.services.suggest_service import SuggestIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the binary catalog snapshot")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=str(BACKEND_DIR / "var" / "catalog.bin"))
+    parser.add_argument("--k", type=int, default=int(os.getenv("SIMILAR_PRODUCTS_K", "20")),
+                        help="Neighbours per product (must match the app's SIMILAR_PRODUCTS_K)")
+    parser.add_argument("--skip-similar", action="store_true", help="Don't build the similar-products table")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    start = time.perf_counter()
+    compile_catalog(args.data_dir, args.out)
+    elapsed = time.perf_counter() - start
+
+    catalog = SharedCatalog(args.data_dir, args.out)
+    counts = ", ".join(f"{name}={len(table)}" for name, table in catalog.tables.items())
+    print(f"Wrote {args.out} ({catalog.size_bytes / 1024:.1f} KiB, {counts}) in {elapsed:.2f}s")
+
+    start = time.perf_counter()
+    SearchIndex(catalog, os.path.join(os.path.dirname(args.out), "search"))
+    SuggestIndex(catalog, os.path.join(os.path.dirname(args.out), "suggest"))
+    print(f"Search and autocomplete indexes ready in {time.perf_counter() - start:.2f}s")
+
+    if not args.skip_similar:
+        start = time.perf_counter()
+        # Rebuilds only if the stored table doesn't match this snapshot
+        index = SimilarityIndex(catalog, os.path.join(os.path.dirname(args.out), "similar"), k=args.k)
+        print(f"Similar-products table ready (k={index.k}, {index.size_bytes / 1024:.1f} KiB) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
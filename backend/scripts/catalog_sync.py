@@ -0,0 +1,141 @@
+"""
+Bulk NDJSON sync of the catalog and order history, without going through the API.
+
+    export products|orders [--out FILE] [--user-id ID]   stream records to FILE (default stdout)
+    import products|orders FILE [--dry-run]              FILE may be - for stdin
+    compact                                              fold imported segments into the products source
+
+Product imports publish catalog segments under RUNTIME_DIR/segments, which
+running workers pick up on their next request; memory stays bounded by one
+segment (CATALOG_SEGMENT_ROWS products) whatever the file size. Each segment's
+products are also applied to the similar-products table. Order imports
+write straight to the shared order database.
+
+Compaction rewrites <data-dir>/products.json from the live catalog and drops
+the segments. Run it at deploy time and restart the workers afterwards: they
+rebuild the snapshot from the new sources.
+
+Usage (from backend/):
+    python -m scripts.catalog_sync export products --out products.ndjson
+    python -m scripts.catalog_sync import products products.ndjson
+    python -m scripts.catalog_sync compact
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+# Only storage settings are used here; the LLM/auth secrets the app requires are not
+os.environ.setdefault("OPENROUTER_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.core.config import get_settings  # noqa: E402
+from app.services.catalog_sync import OrderImporter, ProductImporter, ndjson, warm_segment  # noqa: E402
+from app.services.data_service import DATA_DIR, DataService  # noqa: E402
+from app.services.similarity_service import SimilarityIndex  # noqa: E402
+
+
+def export(data: DataService, kind: str, out: str, user_id=None):
+    records = data.iter_products() if kind == "products" else data.iter_orders_json(user_id)
+    target = sys.stdout.buffer if out == "-" else open(out, "wb")
+    count = 0
+    try:
+        for chunk in ndjson(records):
+            target.write(chunk)
+            count += chunk.count(b"\n")
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+    print(f"Exported {count} {kind}", file=sys.stderr)
+
+
+def import_file(data: DataService, kind: str, path: str, dry_run: bool):
+    settings = get_settings()
+    if kind == "products":
+        similarity = None
+
+        def published(name):
+            nonlocal similarity
+            if similarity is None:
+                similarity = SimilarityIndex(
+                    data.catalog, os.path.join(settings.RUNTIME_DIR, "similar"),
+                    k=settings.SIMILAR_PRODUCTS_K, overlay=data.segments.changes,
+                )
+            warm_segment(data.segments, name, similarity)
+            print(f"  published segment {name}", file=sys.stderr)
+
+        importer = ProductImporter(
+            data.segments, chunk_size=settings.CATALOG_IMPORT_CHUNK_SIZE,
+            segment_rows=settings.CATALOG_SEGMENT_ROWS, dry_run=dry_run, on_segment=published,
+        )
+    else:
+        importer = OrderImporter(data, chunk_size=settings.CATALOG_IMPORT_CHUNK_SIZE, dry_run=dry_run)
+
+    start = time.perf_counter()
+    source = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        importer.add_lines(source)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    result = importer.finish()
+    print(result.model_dump_json(indent=2))
+    print(f"Imported {result.imported} {kind} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def compact(data: DataService):
+    if not data.segments or not data.segments.segment_count:
+        print("No imported segments to compact", file=sys.stderr)
+        return
+    path = os.path.join(data.data_dir, "products.json")
+    count = 0
+    # Written record by record, so compaction doesn't hold the catalog in memory either
+    with open(path + ".tmp", "w") as f:
+        f.write("[")
+        for record in data.iter_products():
+            f.write(",\n" if count else "\n")
+            json.dump(record, f)
+            count += 1
+        f.write("\n]\n")
+    os.replace(path + ".tmp", path)
+    data.segments.clear()
+    print(f"Wrote {count} products to {path}; restart the workers to rebuild the snapshot", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--runtime-dir", default=None, help="Defaults to RUNTIME_DIR")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("kind", choices=["products", "orders"])
+    export_parser.add_argument("--out", default="-")
+    export_parser.add_argument("--user-id", default=None, help="Orders of one user only")
+
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("kind", choices=["products", "orders"])
+    import_parser.add_argument("file")
+    import_parser.add_argument("--dry-run", action="store_true", help="Validate only")
+
+    commands.add_parser("compact")
+    args = parser.parse_args()
+
+    if args.runtime_dir:
+        os.environ["RUNTIME_DIR"] = args.runtime_dir  # also where the embedding cache lives
+    data = DataService(data_dir=args.data_dir)
+    if args.command == "export":
+        export(data, args.kind, args.out, args.user_id)
+    elif args.command == "import":
+        import_file(data, args.kind, args.file, args.dry_run)
+    else:
+        compact(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Local OpenAI-compatible LLM stand-in for development and load testing.
+
+Implements /v1/chat/completions well enough to drive every agent offline:
+structured-output routing (json_schema response format or a forced function
+call) picks an agent from keywords in the last user message, tool-enabled
+calls request search_products / get_order_summary once, the researcher's
+comparison prompt gets a product_carousel built from its inventory, and
+everything else gets a short canned answer. Latency can be injected to simulate
+a slow model, or a slow primary tier model (LLM_STUB_SLOW_MODELS) to exercise
+the fallbacks. Streamed requests get SSE chunks of a few characters, one every
+LLM_STUB_TOKEN_LATENCY seconds.
+
+Usage (from backend/):
+    uvicorn scripts.llm_stub:app --port 12112
+    OPENROUTER_BASE_URL=http://localhost:12112/v1 uvicorn app.main:app
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY", "0.3"))
+# Comma-separated models that answer after LLM_STUB_SLOW_SECONDS instead
+SLOW_MODELS = {m for m in os.getenv("LLM_STUB_SLOW_MODELS", "").split(",") if m}
+SLOW_SECONDS = float(os.getenv("LLM_STUB_SLOW_SECONDS", "30"))
+TOKEN_LATENCY = float(os.getenv("LLM_STUB_TOKEN_LATENCY", "0.01"))
+CHUNK_CHARS = 4
+
+app = FastAPI(title="LLM Stub")
+
+stats = {"requests": 0, "routes": {}, "tool_calls": 0, "models": {}, "streams": 0, "streams_closed_early": 0}
+
+ROUTES = [
+    ("transactional", re.compile(r"\b(buy|checkout|add to cart|purchase)\b")),
+    ("support", re.compile(r"\b(order|orders|return|refund|shipping|shipped)\b")),
+    ("researcher", re.compile(r"\b(compare|better than|vs|versus)\b")),
+]
+
+
+def _text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _route(messages: List[Dict[str, Any]]) -> str:
+    users = [_text(m) for m in messages if m.get("role") == "user"]
+    text = users[-1].lower() if users else ""
+    return next((name for name, pattern in ROUTES if pattern.search(text)), "concierge")
+
+
+def _completion(body: Dict[str, Any], message: Dict[str, Any], finish_reason: str = "stop") -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", **message}, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    stats["tool_calls"] += 1
+    return {
+        "content": None,
+        "tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)},
+        }],
+    }
+
+
+def _carousel(prompt: str) -> str:
+    """The researcher's comparison: our inventory from the prompt plus one competitor, in a code fence."""
+    inventory = prompt.split("===\n", 1)[-1].split("=== EXTERNAL MARKET DATA", 1)[0] if "=== OUR INTERNAL INVENTORY" in prompt else "[]"
+    try:
+        products = json.loads(inventory)
+    except ValueError:
+        products = []
+    data = [{"id": "competitor_1", "name": "Summit Trekker", "price": 149.99, "description": "Heavier, cheaper", "url": ""}]
+    data += [{"id": p["id"], "name": p["name"], "price": p["price"], "description": "Our advantage", "slug": p["slug"]} for p in products[:3]]
+    answer = {"content": f"We carry {len(products)} matching products.", "type": "product_carousel", "data": data}
+    return "```json\n" + json.dumps(answer, indent=2) + "\n```"
+
+
+def _sse(body: Dict[str, Any], completion: Dict[str, Any]) -> StreamingResponse:
+    """Sends a completion as chat.completion.chunk events, a few characters at a time."""
+    stats["streams"] += 1
+    choice = completion["choices"][0]
+    message = choice["message"]
+
+    def event(delta: Dict[str, Any], finish_reason=None) -> str:
+        chunk = {
+            "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+            "model": completion["model"], "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def events():
+        finished = False
+        try:
+            yield event({"role": "assistant", "content": ""})
+            for call in message.get("tool_calls") or []:
+                yield event({"tool_calls": [{"index": 0, **call}]})
+            content = message.get("content") or ""
+            for start in range(0, len(content), CHUNK_CHARS):
+                await asyncio.sleep(TOKEN_LATENCY)
+                yield event({"content": content[start:start + CHUNK_CHARS]})
+            yield event({}, choice["finish_reason"])
+            yield "data: [DONE]\n\n"
+            finished = True
+        finally:
+            if not finished:
+                stats["streams_closed_early"] += 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    completion = await _respond(body)
+    return _sse(body, completion) if body.get("stream") else completion
+
+
+async def _respond(body: Dict[str, Any]) -> Dict[str, Any]:
+    stats["requests"] += 1
+    model = body.get("model", "stub")
+    stats["models"][model] = stats["models"].get(model, 0) + 1
+    await asyncio.sleep(SLOW_SECONDS if model in SLOW_MODELS else LATENCY_SECONDS)
+    messages = body.get("messages", [])
+    tools = {t["function"]["name"]: t["function"] for t in body.get("tools", []) if t.get("type") == "function"}
+
+    # Routing: structured output as a JSON schema, or as a forced call of the schema's function
+    response_format = body.get("response_format") or {}
+    forced = (body.get("tool_choice") or {}).get("function", {}).get("name") if isinstance(body.get("tool_choice"), dict) else None
+    if response_format.get("type") in ("json_schema", "json_object") or forced == "RouteDecision":
+        route = _route(messages)
+        stats["routes"][route] = stats["routes"].get(route, 0) + 1
+        decision = {"next_node": route, "reason": "Keywords in the last user message"}
+        if forced:
+            return _completion(body, _tool_call(forced, decision), "tool_calls")
+        return _completion(body, {"content": json.dumps(decision)})
+
+    # Agent tool loop: call one tool, then answer once its result comes back
+    if tools and (not messages or messages[-1].get("role") != "tool"):
+        query = _text(messages[-1]) if messages else ""
+        if "search_products" in tools:
+            return _completion(body, _tool_call("search_products", {"query": query, "limit": 5}), "tool_calls")
+        if "get_order_summary" in tools:
+            return _completion(body, _tool_call("get_order_summary", {"user_id": "user_123"}), "tool_calls")
+
+    if messages and "product comparison analyst" in _text(messages[-1]):
+        return _completion(body, {"content": _carousel(_text(messages[-1]))})
+
+    if messages and messages[-1].get("role") == "tool":
+        return _completion(body, {"content": f"Here is what I found: {_text(messages[-1])[:200]}"})
+    return _completion(body, {"content": "hiking, boots"})
+
+
+@app.get("/_stats")
+def get_stats():
+    return stats
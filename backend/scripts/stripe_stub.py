@@ -0,0 +1,167 @@
+"""
+Local Stripe stand-in for development and load testing.
+
+Implements the small slice of the Stripe API used by the checkout endpoints
+(checkout sessions and payment intents), honours Idempotency-Key headers like
+Stripe does (a replayed key returns the original response, and is rejected if
+its parameters changed) and can inject latency to simulate a slow upstream.
+Sessions are paid as soon as they are created. With STRIPE_STUB_WEBHOOK_URL
+set, each one is also announced with a signed checkout.session.completed event.
+
+Usage (from backend/):
+    uvicorn scripts.stripe_stub:app --port 12111
+    STRIPE_SECRET_KEY=sk_test_stub STRIPE_API_BASE=http://localhost:12111 uvicorn app.main:app
+
+    # with webhooks
+    STRIPE_STUB_WEBHOOK_URL=http://localhost:8000/api/v1/checkout/webhook STRIPE_STUB_WEBHOOK_SECRET=whsec_stub \
+        uvicorn scripts.stripe_stub:app --port 12111
+    STRIPE_WEBHOOK_SECRET=whsec_stub STRIPE_SECRET_KEY=sk_test_stub STRIPE_API_BASE=http://localhost:12111 uvicorn app.main:app
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, Tuple
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_SECONDS = float(os.getenv("STRIPE_STUB_LATENCY", "0.2"))
+WEBHOOK_URL = os.getenv("STRIPE_STUB_WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("STRIPE_STUB_WEBHOOK_SECRET", "whsec_stub")
+
+app = FastAPI(title="Stripe Stub")
+
+_sessions: Dict[str, Dict[str, Any]] = {}
+_idempotent_responses: Dict[str, Tuple[str, Dict[str, str], Dict[str, Any]]] = {}  # key -> (path, params, response)
+stats = {"requests": 0, "idempotent_replays": 0, "idempotency_errors": 0, "webhooks_sent": 0, "webhooks_failed": 0}
+_webhook_tasks = set()
+
+
+def _error(message: str, error_type: str = "invalid_request_error") -> JSONResponse:
+    return JSONResponse(status_code=400, content={"error": {"type": error_type, "message": message}})
+
+
+async def _send_webhook(event_type: str, obj: Dict[str, Any]):
+    """Delivers an event signed the way Stripe signs them (Stripe-Signature: t=...,v1=HMAC-SHA256)."""
+    payload = json.dumps({
+        "id": f"evt_{uuid.uuid4().hex[:24]}", "object": "event", "type": event_type,
+        "created": int(time.time()), "data": {"object": obj},
+    })
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.post(
+                WEBHOOK_URL, content=payload,
+                headers={"Content-Type": "application/json", "Stripe-Signature": f"t={timestamp},v1={signature}"},
+            )
+        stats["webhooks_sent" if response.status_code < 300 else "webhooks_failed"] += 1
+    except httpx.HTTPError:
+        stats["webhooks_failed"] += 1
+
+
+def _line_items_total(form: Dict[str, str]) -> int:
+    """Sum unit_amount * quantity over form-encoded line_items[i][...] fields."""
+    totals: Dict[str, Dict[str, int]] = {}
+    for key, value in form.items():
+        match = re.match(r"line_items\[(\d+)\]\[(?:price_data\]\[)?(unit_amount|quantity)\]", key)
+        if match:
+            totals.setdefault(match.group(1), {})[match.group(2)] = int(value)
+    return sum(item.get("unit_amount", 0) * item.get("quantity", 1) for item in totals.values())
+
+
+async def _handle(request: Request, create):
+    stats["requests"] += 1
+    await asyncio.sleep(LATENCY_SECONDS)
+
+    key = request.headers.get("Idempotency-Key")
+    form = dict(await request.form())
+    if key and key in _idempotent_responses:
+        path, params, body = _idempotent_responses[key]
+        if path != request.url.path or params != form:
+            stats["idempotency_errors"] += 1
+            return _error(
+                "Keys for idempotent requests can only be used with the same parameters they were first used with.",
+                "idempotency_error",
+            )
+        stats["idempotent_replays"] += 1
+        return JSONResponse(body)
+
+    body = create(form)
+    if isinstance(body, JSONResponse):
+        return body  # rejected
+    if key:
+        _idempotent_responses[key] = (request.url.path, form, body)
+    return JSONResponse(body)
+
+
+@app.post("/v1/checkout/sessions")
+async def create_session(request: Request):
+    def create(form):
+        expires_at = int(form.get("expires_at", time.time() + 86400))
+        if not 1800 <= expires_at - time.time() <= 86400:
+            return _error("The `expires_at` timestamp must be between 30 minutes and 24 hours from Checkout Session creation.")
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"http://localhost/pay/{session_id}",
+            "status": "complete",
+            "payment_status": "paid",
+            "amount_total": _line_items_total(form),
+            "customer_details": {"email": "stub@example.com"},
+            "expires_at": expires_at,
+            "metadata": {
+                re.match(r"metadata\[(.+)\]", key).group(1): value
+                for key, value in form.items() if key.startswith("metadata[")
+            },
+        }
+        _sessions[session_id] = session
+        if WEBHOOK_URL:
+            task = asyncio.create_task(_send_webhook("checkout.session.completed", session))
+            _webhook_tasks.add(task)
+            task.add_done_callback(_webhook_tasks.discard)
+        return session
+
+    return await _handle(request, create)
+
+
+@app.get("/v1/checkout/sessions/{session_id}")
+async def retrieve_session(session_id: str):
+    stats["requests"] += 1
+    await asyncio.sleep(LATENCY_SECONDS)
+    session = _sessions.get(session_id)
+    if not session:
+        return JSONResponse(
+            status_code=404,
+            content={"error": {"type": "invalid_request_error", "message": f"No such checkout.session: '{session_id}'"}},
+        )
+    return session
+
+
+@app.post("/v1/payment_intents")
+async def create_payment_intent(request: Request):
+    def create(form):
+        intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+        return {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(form.get("amount", 0)),
+            "currency": form.get("currency", "usd"),
+            "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+            "status": "requires_payment_method",
+        }
+
+    return await _handle(request, create)
+
+
+@app.get("/_stats")
+def get_stats():
+    return stats